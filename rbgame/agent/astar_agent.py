@@ -1,11 +1,18 @@
 from __future__ import annotations
+import heapq
+import itertools
 import random
-import csv
-import queue
 
 import numpy as np
 
 from rbgame.agent.base_agent import BaseAgent
+from rbgame.game.topology import MapTopology, compile_map, NO_NEIGHBOR
+
+# distance to a destination, from which it can't be reached
+UNREACHABLE = 1 << 30
+
+# distance fields by content hash of map and destination
+_DISTANCE_FIELDS: dict[tuple[str, int], tuple[int, ...]] = {}
 
 class Vertex:
     """
@@ -61,10 +68,10 @@ class Vertex:
     def __hash__(self) -> int:
         return hash((self.x, self.y))
 
-    # less than dunder method for puttting a Cell in priority queue
+    # vertices are ordered by coordinate, row by row
     def __lt__(self, vertex: object) -> bool:
         if isinstance(vertex, Vertex):
-            return True
+            return (self.y, self.x) < (vertex.y, vertex.x)
         return NotImplemented
 
     @property
@@ -138,6 +145,7 @@ class Vertex:
 class Graph:
     """
     Similar to :py:class:`Board <rbgame.game.components.Board>`. It is set of :py:class:`Vertex`.
+    Static facts of the graph are shared with boards of the same map by :py:attr:`topology`.
 
     :param colors_map: csv file name for color map. 
                        Each element define :py:attr:`color` of each :py:class:`Vertex`.
@@ -146,8 +154,11 @@ class Graph:
     """
 
     def __init__(self, colors_map: str, targets_map: str) -> None:
-        self.__load_from_file(colors_map, targets_map)
-        self.size = len(self.vertices[0])
+        self.topology: MapTopology = compile_map(colors_map, targets_map)
+        self.__load_from_topology()
+        self.size = self.topology.size
+        # robot shouldn't pass through colored vertices, whoever stands there
+        self.static_blocked: tuple[bool, ...] = tuple(color in ('r', 'y', 'gr', 'b') for color in self.topology.colors)
 
         self.yellow_vertices = self.__get_vertices_by_color('y')
         self.red_vertices = self.__get_vertices_by_color('r')
@@ -162,56 +173,47 @@ class Graph:
 
     def __get_vertices_by_color(self,
                              color: str) -> list[Vertex]:
-        return [
-            vertex for row_vertex in self.vertices for vertex in row_vertex
-            if vertex.color == color
+        return [self.flat_vertices[v] for v in self.topology.cells(color)]
+
+    def __load_from_topology(self) -> None:
+        topology = self.topology
+        # create vertices with given colors and targets, in order of flat index
+        self.flat_vertices: list[Vertex] = [
+            Vertex(topology.ys[v], topology.xs[v], color=topology.colors[v], target=topology.targets[v])
+            for v in range(topology.num_cells)
+        ]
+        # two dimension list of Vertex
+        self.vertices: list[list[Vertex]] = [
+            self.flat_vertices[i*topology.size:(i + 1)*topology.size] for i in range(topology.size)
         ]
-
-    def __load_from_file(self, colors_map: str, targets_map: str) -> None:
-
-        # two dimension list of Cell
-        self.vertices: list[list[Vertex]] = []
-
-        colors_map_file = open(colors_map, mode='r', encoding="utf-8")
-        targets_map_file = open(targets_map, mode='r', encoding="utf-8")
-
-        color_matrix = csv.reader(colors_map_file)
-        target_matrix = csv.reader(targets_map_file)
-
-        # create vertices with given colors and targets in csv files
-        for i, (color_row,
-                target_row) in enumerate(zip(color_matrix, target_matrix)):
-            self.vertices.append([])
-            for j, (color, target) in enumerate(zip(color_row, target_row)):
-                self.vertices[-1].append(
-                    Vertex(i,
-                                j,
-                                color=color,
-                                target=int(target)))
-
-        colors_map_file.close()
-        targets_map_file.close()
 
         # set for each vertex its adjacent
-        for i, _ in enumerate(self.vertices):
-            for j, _ in enumerate(self.vertices[i]):
-                if (i - 1) >= 0:
-                    self.vertices[i][j].front = self.vertices[i - 1][j]
-                if (i + 1) < len(self.vertices[i]):
-                    self.vertices[i][j].back = self.vertices[i + 1][j]
-                if (j + 1) < len(self.vertices[i]):
-                    self.vertices[i][j].right = self.vertices[i][j + 1]
-                if (j - 1) >= 0:
-                    self.vertices[i][j].left = self.vertices[i][j - 1]
+        for vertex, neighbors in zip(self.flat_vertices, topology.neighbor_lists):
+            vertex.front, vertex.back, vertex.left, vertex.right = (
+                self.flat_vertices[n] if n != NO_NEIGHBOR else None for n in neighbors
+            )
 
     @property
     def cannot_step(self) -> list[Vertex]:
         return [
-            vertex for vertices in self.vertices for vertex in vertices
-            if (vertex.robot or vertex.color == 'r' or vertex.color == 'y'
-                or vertex.color == 'gr' or vertex.color == 'b')
+            vertex for vertex in self.flat_vertices
+            if vertex.robot or self.static_blocked[self.index(vertex)]
         ]
 
+    def index(self, vertex: Vertex) -> int:
+        """
+        :param vertex: A vertex.
+        :return: Flat index :math:`y \\cdot size + x` of the vertex.
+        """
+        return vertex.y*self.size + vertex.x
+
+    @property
+    def occupied(self) -> set[int]:
+        """
+        Flat indices of vertices, where robots are located.
+        """
+        return {index for index, vertex in enumerate(self.flat_vertices) if vertex.robot}
+
     @staticmethod
     def heuristic(a: Vertex,
                   b: Vertex) -> float:
@@ -219,55 +221,145 @@ class Graph:
 
     def a_star_search(
             self, start: Vertex,
-            goal: Vertex) -> list[Vertex]:
+            goal: Vertex,
+            occupied: set[int]|None = None) -> list[Vertex]:
         """
         A* search for shortest path from :code:`start` to :code:`goal`
         . About algorithm, go `here <https://en.wikipedia.org/wiki/A*_search_algorithm>`_.
+        Path doesn't pass through colored vertices and vertices with robots, except :code:`start` and :code:`goal`.
+        Among vertices with the same priority, the one closer to :code:`goal` and then the earlier found one is expanded first.
 
         :param start: start vertex.
         :param goal: end vertex.
+        :param occupied: Flat indices of vertices with robots. Default to :py:data:`None`, which means :py:attr:`occupied`.
         :return: Path from start vertex to end vertex. Start vertex doesn't includes in found path. 
                  Return to empty :py:class:`list` if path not found.
         """
-        open_set: queue.PriorityQueue = queue.PriorityQueue()
-        open_set.put((0, start))
-
-        came_from: dict[Vertex,
-                        Vertex | None] = {}
-        cost_so_far = {}
-        came_from[start] = None
-        cost_so_far[start] = 0
+        if occupied is None:
+            occupied = self.occupied
+        return [self.flat_vertices[v] for v in self.__search(self.index(start), self.index(goal), occupied)]
+
+    def __search(self, start_index: int, goal_index: int, occupied: set[int]) -> list[int]:
+        # A* search on flat indices, see a_star_search
+        size = self.size
+        neighbor_lists = self.topology.neighbor_lists
+        static_blocked = self.static_blocked
+        goal_x, goal_y = goal_index % size, goal_index // size
+
+        # entries are priority, heuristic, insertion order and flat index of vertex
+        counter = itertools.count()
+        h = abs(start_index % size - goal_x) + abs(start_index // size - goal_y)
+        open_set = [(h, h, next(counter), start_index)]
+        came_from: dict[int, int] = {start_index: -1}
+        cost_so_far: dict[int, int] = {start_index: 0}
 
         i = 0
-        while not open_set.empty():
-            current = open_set.get()[1]
-
-            if current == goal:
+        while open_set:
+            priority, h, _, current = heapq.heappop(open_set)
+            cost = cost_so_far[current]
+            if priority - h > cost:
+                # outdated entry, the vertex has been reached by a cheaper path
+                continue
+
+            if current == goal_index:
                 path = []
-                while current != start:
+                while current != start_index:
                     path.append(current)
                     current = came_from[current]
                 path.reverse()
                 return path
 
-            neighbors = current.neighbors
+            neighbors = neighbor_lists[current]
             # reverse neighbors list if i is odd, change order putting vertex to queue
             # according to that, we don't get vertex from queue over one row or column and search over diagonal
             if i % 2 == 1:
-                neighbors.reverse()
-            for next_vertex in neighbors:
-                new_cost = cost_so_far[current] + 1
-                if (next_vertex not in cost_so_far
-                        or new_cost < cost_so_far[next_vertex]) and (
-                            next_vertex not in self.cannot_step
-                            or next_vertex == start or next_vertex == goal):
-                    cost_so_far[next_vertex] = new_cost
-                    priority = new_cost + self.heuristic(next_vertex, goal)
-                    open_set.put((priority, next_vertex))
-                    came_from[next_vertex] = current
+                neighbors = neighbors[::-1]
+            new_cost = cost + 1
+            for next_index in neighbors:
+                if next_index == NO_NEIGHBOR:
+                    continue
+                if (static_blocked[next_index] or next_index in occupied) \
+                    and next_index != goal_index and next_index != start_index:
+                    continue
+                if new_cost < cost_so_far.get(next_index, new_cost + 1):
+                    cost_so_far[next_index] = new_cost
+                    came_from[next_index] = current
+                    h = abs(next_index % size - goal_x) + abs(next_index // size - goal_y)
+                    heapq.heappush(open_set, (new_cost + h, h, next(counter), next_index))
             i += 1
         return []
 
+    def distance_field(self, goal: Vertex) -> tuple[int, ...]:
+        """
+        Distances from all vertices to :code:`goal` on the empty board, where path doesn't pass through colored vertices (red, yellow, green and blue).
+        It is computed by breadth-first search once per map and destination and shared by all graphs of the map.
+
+        :param goal: Destination.
+        :return: Distance from each vertex in order of flat index, :py:data:`UNREACHABLE` if there is no path.
+                 Colored vertices except :code:`goal` can't be passed through, so they are :py:data:`UNREACHABLE`.
+        """
+        goal_index = self.index(goal)
+        key = (self.topology.key, goal_index)
+        field = _DISTANCE_FIELDS.get(key)
+        if field is None:
+            distances = [UNREACHABLE]*self.topology.num_cells
+            distances[goal_index] = 0
+            frontier = [goal_index]
+            while frontier:
+                next_frontier = []
+                for current in frontier:
+                    for neighbor in self.topology.neighbor_lists[current]:
+                        if neighbor != NO_NEIGHBOR and not self.static_blocked[neighbor] and distances[neighbor] == UNREACHABLE:
+                            distances[neighbor] = distances[current] + 1
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            field = _DISTANCE_FIELDS[key] = tuple(distances)
+        return field
+
+    def __descend(self, start_index: int, goal: Vertex, occupied: set[int]) -> list[int]|None:
+        """
+        Follow decreasing distances of :py:meth:`distance_field` by looking up neighbors.
+
+        :return: Shortest path of the empty board, which is free of robots, or :py:data:`None` if robots block the corridor.
+        """
+        field = self.distance_field(goal)
+        neighbor_lists = self.topology.neighbor_lists
+        goal_index = self.index(goal)
+        current = start_index
+        # start may be colored, so its distance is taken from its neighbors
+        distance = min(field[n] for n in neighbor_lists[current] if n != NO_NEIGHBOR) + 1
+        path = []
+        while distance < UNREACHABLE and current != goal_index:
+            for neighbor in neighbor_lists[current]:
+                if neighbor != NO_NEIGHBOR and field[neighbor] == distance - 1 \
+                    and (neighbor == goal_index or neighbor not in occupied):
+                    break
+            else:
+                return None
+            path.append(neighbor)
+            current, distance = neighbor, distance - 1
+        return path if current == goal_index else None
+
+    def plan(self, start: Vertex, goal: Vertex, occupied: set[int]|None = None) -> list[Vertex]:
+        """
+        Find a shortest path from :code:`start` to :code:`goal` for the next move. Shortest path of the empty board
+        is followed along :py:meth:`distance_field` by looking up neighbors. If robots block it, :py:meth:`a_star_search` runs.
+
+        :param start: start vertex.
+        :param goal: end vertex.
+        :param occupied: Flat indices of vertices with robots. Default to :py:data:`None`, which means :py:attr:`occupied`.
+        :return: Path from start vertex to end vertex, in the same format as :py:meth:`a_star_search`.
+        """
+        if start == goal:
+            return []
+        if occupied is None:
+            occupied = self.occupied
+        start_index = self.index(start)
+        indices = self.__descend(start_index, goal, occupied)
+        if indices is None:
+            indices = self.__search(start_index, self.index(goal), occupied)
+        return [self.flat_vertices[v] for v in indices]
+
 class VRobot:
     """
     Similar to :py:class:`Robot <rbgame.game.components.Robot>`.
@@ -344,6 +436,25 @@ class AStarAgent(BaseAgent):
         self.max_values_for_robot_attrs = [self.graph.size-1, self.graph.size-1, len(self.graph.yellow_vertices)]
         if maximum_battery is not None:
             self.max_values_for_robot_attrs.append(maximum_battery)
+        self.__compile_arrays()
+
+    def __compile_arrays(self) -> None:
+        # arrays of the map for get_actions, cell with flat index num_cells is a dummy cell standing for missing neighbor,
+        # which has no robot and can't be passed through
+        topology = self.graph.topology
+        num_cells = topology.num_cells
+        self.__neighbors = np.array(topology.neighbor_lists, dtype=np.int64)
+        self.__neighbors[self.__neighbors == NO_NEIGHBOR] = num_cells
+        colors = np.array(topology.colors + ('g',))
+        self.__static_blocked = np.append(np.array(self.graph.static_blocked), True)
+        self.__is_blue, self.__is_green, self.__is_yellow = (colors == 'b'), (colors == 'gr'), (colors == 'y')
+        self.__xs, self.__ys = np.append(topology.xs, 0), np.append(topology.ys, 0)
+        self.__blue_cells = np.array([self.graph.index(vertex) for vertex in self.graph.blue_vertices], dtype=np.int64)
+        self.__green_cells = np.array([self.graph.index(vertex) for vertex in self.graph.green_vertices], dtype=np.int64)
+        # yellow cell of each mail
+        self.__yellow_cells = np.full(max(vertex.target for vertex in self.graph.yellow_vertices) + 1, num_cells, dtype=np.int64)
+        for vertex in self.graph.yellow_vertices:
+            self.__yellow_cells[vertex.target] = self.graph.index(vertex)
     
     def __load_state_from_obs(self, obs: np.ndarray) -> None:
         robot_states = np.split(obs, self.num_robots)
@@ -363,6 +474,120 @@ class AStarAgent(BaseAgent):
             return action
         return action if action_mask[action] else random.choice([act for act in range(5) if action_mask[act]])
         
+    def __nearest(self, cells: np.ndarray, pos_b: np.ndarray, excluded_b_k: np.ndarray|None = None) -> np.ndarray:
+        # the first of nearest cells by heuristic, like min in VRobot.set_destination
+        distances_b_k = np.abs(self.__xs[cells] - self.__xs[pos_b, None]) + np.abs(self.__ys[cells] - self.__ys[pos_b, None])
+        if excluded_b_k is not None:
+            distances_b_k[excluded_b_k] = UNREACHABLE
+        return cells[np.argmin(distances_b_k, axis=1)]
+
+    def __first_steps(self, pos_b: np.ndarray, dest_b: np.ndarray, occupied_b_c: np.ndarray) -> np.ndarray:
+        """
+        Breadth-first search from destinations over stacked occupancy grids of all games, level by level.
+
+        :return: Actions stepping to neighbors with the least distance to destinations, 0 if there is no path.
+                 Among them the neighbor closer to destination by :py:meth:`Graph.heuristic` is chosen, like :py:meth:`Graph.a_star_search`.
+        """
+        neighbors = self.__neighbors
+        num_games, num_cells = pos_b.size, neighbors.shape[0]
+        games = np.arange(num_games)
+        passable_b_c = ~self.__static_blocked[:num_cells] & ~occupied_b_c[:, :num_cells]
+        distances_b_c = np.full((num_games, num_cells + 1), UNREACHABLE, dtype=np.int64)
+        distances_b_c[games, dest_b] = 0
+        start_neighbors_b_a = neighbors[pos_b]
+        for level in range(num_cells):
+            # stop as soon as robots of all games can step towards destination
+            if (distances_b_c[games[:, None], start_neighbors_b_a] < UNREACHABLE).any(axis=1).all():
+                break
+            reached_b_c = (distances_b_c[:, neighbors] == level).any(axis=2) & passable_b_c \
+                & (distances_b_c[:, :num_cells] == UNREACHABLE)
+            if not reached_b_c.any():
+                break
+            distances_b_c[:, :num_cells][reached_b_c] = level + 1
+        next_distances_b_a = distances_b_c[games[:, None], start_neighbors_b_a]
+        # prefer neighbors closer to destination among equally distant ones, heuristic is less than 2*num_cells
+        h_b_a = np.abs(self.__xs[start_neighbors_b_a] - self.__xs[dest_b, None]) \
+            + np.abs(self.__ys[start_neighbors_b_a] - self.__ys[dest_b, None])
+        direction_b = np.argmin(next_distances_b_a*(2*num_cells) + h_b_a, axis=1)
+        return np.where(next_distances_b_a[games, direction_b] < UNREACHABLE, direction_b + 1, 0)
+
+    def get_actions(self, obs_b: np.ndarray, mask_b: np.ndarray|None = None) -> np.ndarray:
+        """
+        Compute actions for many games at once in the same way as :py:meth:`get_action`.
+        Observations are decoded as arrays, destinations are chosen by array operations,
+        then one breadth-first search runs over stacked occupancy grids of all games.
+        Ties between shortest paths are broken by :py:meth:`Graph.heuristic` like in :py:meth:`Graph.a_star_search`,
+        but the chosen path may still differ from :py:meth:`get_action` in rare ties.
+
+        :param obs_b: Batch of observation vectors. Features after robot states, e.g. appended seat, are ignored.
+        :param mask_b: Batch of action masks. Default to :py:data:`None`, which means all actions are legal.
+        :return: Batch of actions.
+        """
+        obs_b = np.asarray(obs_b)
+        num_games, num_cells = obs_b.shape[0], self.graph.topology.num_cells
+        mask_b = np.ones((num_games, 5), dtype=np.uint8) if mask_b is None else np.asarray(mask_b)
+        games = np.arange(num_games)
+
+        # decode robot states, the acting robot is the first one
+        num_attrs = len(self.max_values_for_robot_attrs)
+        states_b_r_a = obs_b[:, :self.num_robots*num_attrs].reshape(num_games, self.num_robots, num_attrs)
+        x_b_r, y_b_r, mail_b_r = ((states_b_r_a[..., i]*self.max_values_for_robot_attrs[i]).astype(np.int64) for i in range(3))
+        if num_attrs > 3:
+            battery_b_r = (states_b_r_a[..., 3]*self.max_values_for_robot_attrs[3]).astype(np.int64)
+        else:
+            battery_b_r = np.full((num_games, self.num_robots), 10, dtype=np.int64)
+        pos_b_r = y_b_r*self.graph.size + x_b_r
+        occupied_b_c = np.zeros((num_games, num_cells + 1), dtype=np.bool_)
+        occupied_b_c[games[:, None], pos_b_r] = True
+        mail_b_c = np.zeros((num_games, num_cells + 1), dtype=np.int64)
+        mail_b_c[games[:, None], pos_b_r] = mail_b_r
+        battery_b_c = np.zeros((num_games, num_cells + 1), dtype=np.int64)
+        battery_b_c[games[:, None], pos_b_r] = battery_b_r
+        pos_b, mail_b, battery_b = pos_b_r[:, 0], mail_b_r[:, 0], battery_b_r[:, 0]
+
+        # blocked cells, see Vertex.is_blocked
+        waiting_b_c_a = occupied_b_c[:, self.__neighbors]
+        blocked_b_c = occupied_b_c[:, :num_cells] & (
+            self.__is_blue[:num_cells] & ((waiting_b_c_a & (battery_b_c[:, self.__neighbors] <= 30)).sum(axis=2) == 1)
+            | self.__is_green[:num_cells] & ((waiting_b_c_a & (mail_b_c[:, self.__neighbors] == 0)).sum(axis=2) == 2)
+            | self.__is_yellow[:num_cells] & ((waiting_b_c_a & (mail_b_c[:, self.__neighbors] != 0)).sum(axis=2) == 2)
+        )
+        blocked_b_c = np.concatenate((blocked_b_c, np.zeros((num_games, 1), dtype=np.bool_)), axis=1)
+
+        # charging robot stays, others choose destination, see VRobot.set_destination
+        stay_b = self.__is_blue[pos_b] & (battery_b < 8)
+        dest_b = np.where(
+            battery_b <= 4,
+            self.__nearest(self.__blue_cells, pos_b),
+            np.where(mail_b != 0, self.__yellow_cells[mail_b],
+                     self.__nearest(self.__green_cells, pos_b)),
+        )
+
+        # when many other robot wait for queue to destination, go to other destination or don't move
+        redirect_b = ~stay_b & blocked_b_c[games, dest_b] & ~(self.__neighbors[dest_b] == pos_b[:, None]).any(axis=1)
+        stay_b |= redirect_b & self.__is_yellow[dest_b]
+        for is_color, cells in ((self.__is_blue, self.__blue_cells), (self.__is_green, self.__green_cells)):
+            redirect_color_b = redirect_b & is_color[dest_b]
+            if not redirect_color_b.any():
+                continue
+            blocked_b_k = blocked_b_c[:, cells]
+            stay_b |= redirect_color_b & blocked_b_k.all(axis=1)
+            redirect_color_b &= ~blocked_b_k.all(axis=1)
+            dest_b = np.where(redirect_color_b, self.__nearest(cells, pos_b, blocked_b_k), dest_b)
+
+        # step towards destination
+        act_b = np.zeros(num_games, dtype=np.int64)
+        moving_b = np.flatnonzero(~stay_b & (dest_b != pos_b))
+        if moving_b.size != 0:
+            act_b[moving_b] = self.__first_steps(pos_b[moving_b], dest_b[moving_b], occupied_b_c[moving_b])
+
+        # apply action mask, see __apply_action_mask
+        illegal_b = mask_b[games, act_b] == 0
+        act_b[illegal_b] = 0
+        for game in np.flatnonzero(illegal_b & (mask_b[:, 0] == 0) & mask_b.any(axis=1)):
+            act_b[game] = random.choice(np.flatnonzero(mask_b[game]).tolist())
+        return act_b
+
     def get_action(self, obs: dict[str, np.ndarray]) -> int:        
         mask = obs.get('action_mask', np.array([1]*5, dtype = np.uint8))
         obs = obs['observation']
@@ -386,8 +611,9 @@ class AStarAgent(BaseAgent):
                     return self.__apply_action_mask(0, mask)
                 acting_robot.set_destination(self.graph, [vertex for vertex in self.graph.green_vertices if vertex.is_blocked])
 
-        # build the path
-        path = self.graph.a_star_search(acting_robot.pos, acting_robot.dest)
+        # find the next vertex of path
+        occupied = {self.graph.index(robot.pos) for robot in self.robots}
+        path = self.graph.plan(acting_robot.pos, acting_robot.dest, occupied)
         if len(path) != 0:
             next = path[0]
             if next is acting_robot.pos.front:
@@ -14,4 +14,21 @@ class BaseAgent(ABC):
 
         :param obs: Observation and action mask from game.
         :return: Action. 
-        """
\ No newline at end of file
+        """
+
+    def get_actions(self, obs_b: np.ndarray, mask_b: np.ndarray|None = None) -> np.ndarray:
+        """
+        Compute actions for batch of observations, e.g. of many games at once, without exploration.
+        By default :py:meth:`get_action` is called for each observation, agents override it to act on the whole batch.
+
+        :param obs_b: Batch of observation vectors.
+        :param mask_b: Batch of action masks. Default to :py:data:`None`, which means all actions are legal.
+        :return: Batch of actions.
+        """
+        obs_b = np.asarray(obs_b)
+        if mask_b is None:
+            return np.array([self.get_action({'observation': obs}) for obs in obs_b], dtype=np.int64)
+        return np.array(
+            [self.get_action({'observation': obs, 'action_mask': mask}) for obs, mask in zip(obs_b, mask_b)],
+            dtype=np.int64,
+        )
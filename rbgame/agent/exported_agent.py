@@ -0,0 +1,58 @@
+from __future__ import annotations
+import json
+
+import numpy as np
+import torch
+
+from rbgame.agent.base_agent import BaseAgent
+
+# name of metadata file stored together with exported policy
+METADATA_FILE = 'agent.json'
+
+class ExportedAgent(BaseAgent):
+    """
+    Agent running a policy exported by :py:meth:`RLAgent.export <rbgame.agent.rl_agent.RLAgent.export>`.
+    Exported policy is a frozen TorchScript module, which masks invalid actions and chooses the greedy one,
+    so the agent needs only torch, tianshou isn't imported.
+
+    :param path: File of exported policy.
+    """
+
+    def __init__(self, path: str) -> None:
+        extra_files = {METADATA_FILE: ''}
+        self.module = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        self.module.eval()
+        metadata = json.loads(extra_files[METADATA_FILE])
+        self.observation_size: int = metadata['observation_size']
+        self.num_actions: int = metadata['num_actions']
+        self.masked_input: bool = metadata['masked_input']
+        # input of get_action, tensors share memory with arrays, which are overwritten in place for every call
+        self.__obs = torch.zeros((1, self.observation_size), dtype=torch.float32)
+        self.__mask = torch.ones((1, self.num_actions), dtype=torch.bool)
+        self.__obs_array = self.__obs.numpy()
+        self.__mask_array = self.__mask.numpy()
+
+    def infer_act(self, obs_b_o: np.ndarray, mask_b: np.ndarray, exploration_noise: bool = False) -> np.ndarray:
+        """
+        Choose actions for batch of observations.
+
+        :param obs_b_o: Batch of observations.
+        :param mask_b: Batch of action masks.
+        :param exploration_noise: Unused, exported policy is always greedy.
+        :return: Batch of actions.
+        """
+        obs = torch.as_tensor(obs_b_o, dtype=torch.float32)
+        mask = torch.as_tensor(np.asarray(mask_b, dtype=np.bool_))
+        with torch.inference_mode():
+            return self.module(obs, mask).numpy()
+
+    def get_actions(self, obs_b: np.ndarray, mask_b: np.ndarray|None = None) -> np.ndarray:
+        if mask_b is None:
+            mask_b = np.ones((len(obs_b), self.num_actions), dtype=np.bool_)
+        return self.infer_act(obs_b, mask_b)
+
+    def get_action(self, obs: dict[str, np.ndarray]) -> int:
+        self.__obs_array[0] = obs['observation']
+        self.__mask_array[0] = obs['action_mask']
+        with torch.inference_mode():
+            return int(self.module(self.__obs, self.__mask)[0])
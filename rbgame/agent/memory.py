@@ -0,0 +1,233 @@
+from __future__ import annotations
+from typing import Any
+
+import numpy as np
+from tianshou.data import Batch, VectorReplayBuffer, PrioritizedVectorReplayBuffer
+
+from rbgame.game.consts import *
+
+class ObservationCodec:
+    """
+    Compact encoding of observations. Each feature of :py:attr:`observation <rbgame.game.components.Robot.observation>`
+    of a robot is a small integer divided by a constant, so it is stored as the integer in one byte,
+    or in half of a byte if observations are packed. Features after observations of robots, e.g. one-hot seat appended
+    by :py:class:`DecentralizedTrainer <rbgame.trainer.DecentralizedTrainer>` with :code:`seat_feature` on,
+    are stored as they are in one byte each, so they must be integers from 0 to 255.
+
+    :param with_battery: Observation of robot includes battery or not.
+    :param packed: Pack two features in one byte. All features must be smaller than 16.
+    :param num_robots: Number of robots, whose observations are at the beginning of observation vector.
+                       Default to :py:data:`None`, which means the whole vector is observations of robots.
+    """
+
+    def __init__(self, with_battery: bool = True, packed: bool = False, num_robots: int|None = None) -> None:
+        # divisors of x, y, mail, battery in robot observation
+        scales = [8, 8, 9, MAXIMUM_ROBOT_BATTERY] if with_battery else [8, 8, 9]
+        self.num_features = len(scales)
+        self.packed = packed
+        self.num_robots = num_robots
+        self.scales = np.array(scales, dtype=np.float32)
+        # decoded value of each code of each feature, computed the same way as robot observation
+        self.tables = np.array([[code/scale for code in range(256)] for scale in scales], dtype=np.float32)
+
+    def __num_robot_features(self, size: int) -> int:
+        if self.num_robots is None:
+            if size % self.num_features:
+                raise ValueError(
+                    f'Observation size {size} is not a multiple of {self.num_features} robot features, '
+                    'please give num_robots if other features, e.g. seat feature, are appended.'
+                )
+            return size
+        num_robot_features = self.num_robots*self.num_features
+        if size < num_robot_features:
+            raise ValueError(f'Observation size {size} is smaller than {num_robot_features} robot features.')
+        return num_robot_features
+
+    def encode(self, obs: np.ndarray) -> np.ndarray:
+        """
+        :param obs: Observations, last axis is observations of robots concatenated, optionally followed by other features.
+        :return: Codes with dtype :code:`uint8`.
+        """
+        obs = np.asarray(obs, dtype=np.float32)
+        num_robot_features = self.__num_robot_features(obs.shape[-1])
+        robot_obs, extra = obs[..., :num_robot_features], obs[..., num_robot_features:]
+        features = robot_obs.reshape(*obs.shape[:-1], -1, self.num_features)
+        codes = np.rint(features*self.scales).astype(np.uint8).reshape(robot_obs.shape)
+        extra_codes = np.rint(extra).astype(np.uint8)
+        if not self.packed:
+            return np.concatenate((codes, extra_codes), axis=-1) if extra.shape[-1] else codes
+        if codes.max(initial=0) > 15:
+            raise ValueError('Features must be smaller than 16 to be packed.')
+        if codes.shape[-1] % 2:
+            codes = np.concatenate((codes, np.zeros((*codes.shape[:-1], 1), dtype=np.uint8)), axis=-1)
+        packed = (codes[..., 0::2] << 4) | codes[..., 1::2]
+        return np.concatenate((packed, extra_codes), axis=-1) if extra.shape[-1] else packed
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        :param codes: Codes returned by :py:meth:`encode`.
+        :return: Observations with dtype :code:`float32`.
+        """
+        if self.num_robots is None:
+            robot_codes, extra_codes = codes, codes[..., :0]
+        else:
+            num_robot_features = self.num_robots*self.num_features
+            num_robot_codes = -(-num_robot_features // 2) if self.packed else num_robot_features
+            robot_codes, extra_codes = codes[..., :num_robot_codes], codes[..., num_robot_codes:]
+        if self.packed:
+            unpacked = np.empty((*robot_codes.shape[:-1], 2*robot_codes.shape[-1]), dtype=np.uint8)
+            unpacked[..., 0::2] = robot_codes >> 4
+            unpacked[..., 1::2] = robot_codes & 15
+            # drop padding feature
+            num_robots = unpacked.shape[-1] // self.num_features if self.num_robots is None else self.num_robots
+            robot_codes = unpacked[..., :num_robots*self.num_features]
+        features = robot_codes.reshape(*robot_codes.shape[:-1], -1, self.num_features)
+        robot_obs = self.tables[np.arange(self.num_features), features].reshape(robot_codes.shape)
+        if extra_codes.shape[-1] == 0:
+            return robot_obs
+        return np.concatenate((robot_obs, extra_codes.astype(np.float32)), axis=-1)
+
+class CompactReplayBufferMixin:
+    """
+    Replay buffer stores observations encoded by :py:class:`ObservationCodec`.
+    Observations of a sampled batch are decoded together when it is read.
+    """
+    codec: ObservationCodec
+
+    def add(self, batch: Batch, buffer_ids: np.ndarray|list[int]|None = None) -> tuple[np.ndarray, ...]:
+        encoded = Batch({key: batch[key] for key in batch.keys()})
+        encoded.obs = self.codec.encode(batch.obs)
+        if 'obs_next' in batch.keys():
+            encoded.obs_next = self.codec.encode(batch.obs_next)
+        return super().add(encoded, buffer_ids=buffer_ids)
+
+    def __getitem__(self, index: Any) -> Batch:
+        batch = super().__getitem__(index)
+        batch.obs = self.codec.decode(batch.obs)
+        batch.obs_next = self.codec.decode(batch.obs_next)
+        return batch
+
+class CompactVectorReplayBuffer(CompactReplayBufferMixin, VectorReplayBuffer):
+    """
+    :class:`VectorReplayBuffer <tianshou.data.VectorReplayBuffer>`, which stores observations encoded.
+
+    :param total_size: Total size of the buffer.
+    :param buffer_num: Number of sub-buffers.
+    :param codec: Encoding of observations.
+    :param kwargs: Other parameters of :class:`VectorReplayBuffer <tianshou.data.VectorReplayBuffer>`.
+    """
+
+    def __init__(self, total_size: int, buffer_num: int, codec: ObservationCodec, **kwargs: Any) -> None:
+        super().__init__(total_size, buffer_num, **kwargs)
+        self.codec = codec
+
+class CompactPrioritizedVectorReplayBuffer(CompactReplayBufferMixin, PrioritizedVectorReplayBuffer):
+    """
+    :class:`PrioritizedVectorReplayBuffer <tianshou.data.PrioritizedVectorReplayBuffer>`, which stores observations encoded.
+
+    :param total_size: Total size of the buffer.
+    :param buffer_num: Number of sub-buffers.
+    :param codec: Encoding of observations.
+    :param kwargs: Other parameters of :class:`PrioritizedVectorReplayBuffer <tianshou.data.PrioritizedVectorReplayBuffer>`.
+    """
+
+    def __init__(self, total_size: int, buffer_num: int, codec: ObservationCodec, **kwargs: Any) -> None:
+        super().__init__(total_size, buffer_num, **kwargs)
+        self.codec = codec
+
+class MemoryView:
+    """
+    View of some sub-buffers of a :class:`VectorReplayBuffer <tianshou.data.VectorReplayBuffer>`.
+    Several learning agents can keep views of one storage, so every transition is stored only once.
+    Sampling draws only from sub-buffers of the view, other attributes come from the storage,
+    so sampled indices are valid indices of the storage and can be used by policies as usual.
+    :py:class:`DecentralizedTrainer <rbgame.trainer.DecentralizedTrainer>` puts transition of agent :math:`a`
+    in enviroment :math:`e` to sub-buffer :math:`e \\cdot num\\_agents + a`. Use :py:func:`make_memory_views` to create views.
+
+    :param buffer: Shared storage.
+    :param buffer_ids: Indices of sub-buffers, which can be sampled through the view.
+    """
+
+    def __init__(self, buffer: VectorReplayBuffer, buffer_ids: np.ndarray) -> None:
+        self.buffer = buffer
+        self.buffer_ids = np.asarray(buffer_ids, dtype=np.int64)
+
+    def __getattr__(self, key: str) -> Any:
+        if key == 'buffer':
+            # not set yet, e.g. while unpickling
+            raise AttributeError(key)
+        return getattr(self.buffer, key)
+
+    def __getitem__(self, index: Any) -> Batch:
+        return self.buffer[index]
+
+    def __len__(self) -> int:
+        return int(self.buffer._lengths[self.buffer_ids].sum())
+
+    def reset(self, keep_statistics: bool = False) -> None:
+        """
+        Clear sub-buffers of the view, the other sub-buffers of the storage are kept.
+
+        :param keep_statistics: Keep episode statistics of sub-buffers or not.
+        """
+        for buffer_id in self.buffer_ids:
+            self.buffer.buffers[buffer_id].reset(keep_statistics=keep_statistics)
+        self.buffer.last_index[self.buffer_ids] = self.buffer._offset[self.buffer_ids]
+        self.buffer._lengths[self.buffer_ids] = 0
+
+    def sample_indices(self, batch_size: int|None) -> np.ndarray:
+        """
+        Sample indices of the storage within sub-buffers of the view, similar to
+        :meth:`sample_indices <tianshou.data.ReplayBuffer.sample_indices>`.
+
+        :param batch_size: Number of indices. Return all available indices if it is 0 or :py:data:`None`.
+        :return: Indices of the storage.
+        """
+        lengths = self.buffer._lengths[self.buffer_ids]
+        if (batch_size is not None and batch_size < 0) or lengths.sum() == 0:
+            return np.array([], int)
+        if batch_size == 0 or batch_size is None or self.buffer.stack_num > 1 \
+            or isinstance(self.buffer, PrioritizedVectorReplayBuffer):
+            all_indices = np.concatenate([
+                self.buffer.buffers[buffer_id].sample_indices(0) + self.buffer._offset[buffer_id]
+                for buffer_id in self.buffer_ids
+            ])
+            if batch_size == 0 or batch_size is None:
+                return all_indices
+            if isinstance(self.buffer, PrioritizedVectorReplayBuffer):
+                # priorities of the storage, restricted to the view
+                weight = self.buffer.weight[all_indices]
+                return np.random.choice(all_indices, batch_size, p=weight/weight.sum())
+            return np.random.choice(all_indices, batch_size)
+        # choose sub-buffers proportionally to their lengths, then sample within them
+        view_idx = np.random.choice(self.buffer_ids.size, batch_size, p=lengths/lengths.sum())
+        sample_num = np.bincount(view_idx, minlength=self.buffer_ids.size)
+        return np.concatenate([
+            self.buffer.buffers[buffer_id].sample_indices(num) + self.buffer._offset[buffer_id]
+            for buffer_id, num in zip(self.buffer_ids, sample_num) if num > 0
+        ])
+
+    def sample(self, batch_size: int|None) -> tuple[Batch, np.ndarray]:
+        """
+        Sample transitions within sub-buffers of the view.
+
+        :param batch_size: Number of transitions. Return all available transitions if it is 0.
+        :return: Sampled transitions and their indices in the storage.
+        """
+        indices = self.sample_indices(batch_size)
+        return self.buffer[indices], indices
+
+def make_memory_views(buffer: VectorReplayBuffer, num_agents: int, own_transitions: bool = False) -> list[MemoryView|VectorReplayBuffer]:
+    """
+    Create memories of all agents, which share one storage.
+    If agents sample transitions of all agents, the storage itself is shared.
+
+    :param buffer: Shared storage, its :code:`buffer_num` must be :code:`num_agents*num_train_envs`.
+    :param num_agents: Number of agents.
+    :param own_transitions: Agent samples only its own transitions or transitions of all agents.
+    :return: Memory of each agent.
+    """
+    assert buffer.buffer_num % num_agents == 0, f'Number of sub-buffers must be multiple of {num_agents}'
+    if own_transitions:
+        return [MemoryView(buffer, np.arange(agent_index, buffer.buffer_num, num_agents)) for agent_index in range(num_agents)]
+    return [buffer for _ in range(num_agents)]
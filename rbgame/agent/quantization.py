@@ -0,0 +1,96 @@
+from __future__ import annotations
+from typing import Any
+import copy
+import warnings
+
+import numpy as np
+import torch
+
+from rbgame.agent.rl_agent import RLAgent
+from rbgame.game.batched_game import BatchedRoboticBoardGame
+
+def sample_states(
+    env_args: dict[str, Any],
+    num_states: int,
+    agent: RLAgent|None = None,
+    num_envs: int = 64,
+    seed: int|None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sample game states by playing games in :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>`.
+
+    :param env_args: Arguments for enviroment.
+    :param num_states: Number of states.
+    :param agent: Agent playing all robots. Default to :py:data:`None`, which means robots take random valid actions.
+    :param num_envs: Number of games played together.
+    :param seed: Seed of games and random actions.
+    :return: Observation vectors and action masks of current agents in sampled states.
+    """
+    env = BatchedRoboticBoardGame(num_envs, auto_reset=True, seed=seed, **env_args)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+    obs_o, action_masks = [], []
+    for _ in range(-(-num_states // num_envs)):
+        obs = env.last()[0]
+        obs_o.append(obs.observation.copy())
+        action_masks.append(obs.action_mask.copy())
+        if agent is None:
+            act = np.argmax(obs.action_mask * rng.random(obs.action_mask.shape), axis=1)
+        else:
+            act = agent.infer_act(obs.observation, obs.action_mask, exploration_noise=False)
+        env.step(act)
+    return np.concatenate(obs_o)[:num_states], np.concatenate(action_masks)[:num_states]
+
+def action_disagreement(agent: RLAgent, reference: RLAgent, obs_b_o: np.ndarray, mask_b: np.ndarray) -> float:
+    """
+    :param agent: Agent to check.
+    :param reference: Reference agent.
+    :param obs_b_o: Batch of observations.
+    :param mask_b: Batch of action masks.
+    :return: Fraction of observations, for which agents choose different actions without exploration.
+    """
+    act = np.asarray(agent.infer_act(obs_b_o, mask_b, exploration_noise=False))
+    reference_act = np.asarray(reference.infer_act(obs_b_o, mask_b, exploration_noise=False))
+    return float(np.mean(act != reference_act))
+
+def quantize_agent(
+    agent: RLAgent,
+    env_args: dict[str, Any]|None = None,
+    num_check_states: int = 1000,
+    tolerance: float = 0.01,
+    seed: int|None = None,
+) -> RLAgent:
+    """
+    Create a copy of agent for CPU inference, whose policy has linear layers dynamically quantized to int8.
+    Copy has no memory and can be used anywhere the agent is used to play, e.g.
+    :py:meth:`DecentralizedTrainer.test <rbgame.trainer.DecentralizedTrainer.test>`
+    or :py:meth:`RoboticBoardGame.run <rbgame.game.game.RoboticBoardGame.run>`.
+    If :code:`env_args` is given, actions of the copy are compared with actions of the agent on sampled game states,
+    the fraction of disagreed states is stored in :code:`disagreement` attribute of the copy,
+    and a warning is issued if it is larger than :code:`tolerance`.
+
+    :param agent: Agent to quantize.
+    :param env_args: Arguments for enviroment to sample states for checking. Default to :py:data:`None`, which means no check.
+    :param num_check_states: Number of sampled states for checking.
+    :param tolerance: Acceptable fraction of disagreed states.
+    :param seed: Seed of sampling states.
+    :return: Quantized agent.
+    """
+    policy = copy.deepcopy(agent.policy).cpu().eval()
+    quantized_policy = torch.ao.quantization.quantize_dynamic(policy, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized = type(agent)(
+        quantized_policy,
+        update_per_step=agent.update_per_step,
+        repeat_per_collect=agent.repeat_per_collect,
+        masked_input=agent.masked_input,
+    )
+    quantized.disagreement = None
+    if env_args is not None:
+        obs_b_o, mask_b = sample_states(env_args, num_check_states, agent=agent, seed=seed)
+        quantized.disagreement = action_disagreement(quantized, agent, obs_b_o, mask_b)
+        if quantized.disagreement > tolerance:
+            warnings.warn(
+                f'Quantized agent disagrees with the original one in {quantized.disagreement:.2%} of states, '
+                f'which is more than {tolerance:.2%}.'
+            )
+    return quantized
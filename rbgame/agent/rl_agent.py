@@ -1,9 +1,14 @@
 from __future__ import annotations
 from abc import abstractmethod
+from typing import Any
+import copy
+import json
+import warnings
 
 import numpy as np
 import torch
-from tianshou.data import Batch, VectorReplayBuffer
+from tianshou.data import Batch, VectorReplayBuffer, to_numpy
+from tianshou.policy import DQNPolicy, PGPolicy, RandomPolicy
 from tianshou.policy.base import BasePolicy
 # from tianshou.utils.net.discrete import NoisyLinear
 # from tianshou.data.types import RolloutBatchProtocol
@@ -11,6 +16,9 @@ from tianshou.policy.base import BasePolicy
 # from tianshou.policy.modelfree.c51 import TC51TrainingStats, C51Policy
 
 from rbgame.agent.base_agent import BaseAgent
+from rbgame.agent.memory import MemoryView
+from rbgame.agent.exported_agent import METADATA_FILE
+from rbgame.game.components import Action
 
 # class NoisyDQNPolicy(DQNPolicy[TDQNTrainingStats]):
 #     """
@@ -40,43 +48,145 @@ from rbgame.agent.base_agent import BaseAgent
 #                     module.sample()
 #         return super().learn(batch, *args, **kwargs)
 
+class GreedyNetwork(torch.nn.Module):
+    """
+    Network choosing greedy valid action, used to export policies.
+
+    :param net: Network of policy, which returns Q-values or action logits as the first output.
+    :param masked: Mask invalid actions or not.
+    """
+
+    def __init__(self, net: torch.nn.Module, masked: bool) -> None:
+        super().__init__()
+        self.net = net
+        self.masked = masked
+
+    def forward(self, obs: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+        logits = self.net(obs)[0]
+        if self.masked:
+            logits = logits.masked_fill(~mask, float('-inf'))
+        return logits.argmax(dim=-1)
+
 class RLAgent(BaseAgent):
         """
         Base Reinforcement Learning agent.
 
         :param policy: Policy.
-        :param memory: Replay Buffer.
+        :param memory: Replay Buffer or :py:class:`MemoryView <rbgame.agent.memory.MemoryView>` of a storage shared with other agents.
         :param update_per_step: How many times agent samples from memory and learns per one step, using only in offpolicy algorithms.
         :param repeat_per_collect: How many times agents learns on sampled data, using only in onpolicy algorithms.
+        :param masked_input: Policy takes action mask together with observation, as :class:`DQNPolicy <tianshou.policy.DQNPolicy>`
+                             and its subclasses do, or takes only observation. Default to :py:data:`None`, which means
+                             it is detected from type of the policy.
         """
+        # add exploration noise to actions if it is asked or not
+        explores: bool = False
+
         def __init__(
             self,
             policy: BasePolicy,
-            memory: VectorReplayBuffer|None = None,
+            memory: VectorReplayBuffer|MemoryView|None = None,
             update_per_step: float = 1.0,
             repeat_per_collect: int = 1000,
+            masked_input: bool|None = None,
         ) -> None:
             
             self.policy = policy
             self.memory = memory if memory is not None else None
             self.update_per_step = update_per_step
             self.repeat_per_collect = repeat_per_collect
+            self.masked_input = isinstance(policy, (DQNPolicy, RandomPolicy)) if masked_input is None else masked_input
+            # input format of policy is resolved only once
+            self.__build_input = self.__build_masked_input if self.masked_input else self.__build_plain_input
+            # input of get_action, its observation and mask are overwritten in place for every call
+            self.__single_obs: np.ndarray|None = None
+            self.__single_mask: np.ndarray|None = None
+            self.__single_input: Batch|None = None
 
             # policy should be always in eval mode to inference action
             # training mode is turned on only within context manager
             self.policy.eval()
+
+        def __getstate__(self) -> dict[str, Any]:
+            # resolved input builder can't be pickled, it is resolved again after unpickling
+            state = self.__dict__.copy()
+            del state['_RLAgent__build_input']
+            return state
+
+        def __setstate__(self, state: dict[str, Any]) -> None:
+            self.__dict__.update(state)
+            self.__build_input = self.__build_masked_input if self.masked_input else self.__build_plain_input
+
+        @staticmethod
+        def __build_masked_input(obs_b_o: np.ndarray|torch.Tensor, mask_b: np.ndarray) -> Batch:
+            return Batch(obs=Batch(obs=obs_b_o, mask=mask_b), info=None)
+
+        @staticmethod
+        def __build_plain_input(obs_b_o: np.ndarray|torch.Tensor, mask_b: np.ndarray) -> Batch:
+            return Batch(obs=obs_b_o, info=None)
         
-        @abstractmethod
         def infer_act(self, obs_b_o: np.ndarray, mask_b: np.ndarray, exploration_noise: bool) -> np.ndarray:
             """
             Forward batch of observations through network.
 
             :param obs_b_o: Batch of observations. 
-            :param mask_b: Batch of action masks.
-            :param exploration_noise: Exploration or not.
+            :param mask_b: Batch of action masks. Unused if policy doesn't take them.
+            :param exploration_noise: Exploration or not. Unused if agent doesn't explore.
             :return: Batch of actions.
             """
+            obs_batch = self.__build_input(obs_b_o, mask_b)
+            with torch.inference_mode():
+                act = self.policy(obs_batch).act
+            if exploration_noise and self.explores:
+                act = self.policy.exploration_noise(act, obs_batch)
+            return act
+
+        def get_action(self, obs: dict[str, np.ndarray]) -> int:
+            if self.__single_obs is None or self.__single_obs.size != obs['observation'].size:
+                self.__single_obs = np.zeros((1, obs['observation'].size), dtype=np.float32)
+                self.__single_mask = np.zeros((1, obs['action_mask'].size), dtype=obs['action_mask'].dtype)
+                # tensor shares memory with the array, so filling the array updates the input
+                self.__single_input = self.__build_input(torch.from_numpy(self.__single_obs), self.__single_mask)
+            self.__single_obs[0] = obs['observation']
+            self.__single_mask[0] = obs['action_mask']
+            with torch.inference_mode():
+                return int(self.policy(self.__single_input).act[0])
+
+        def get_actions(self, obs_b: np.ndarray, mask_b: np.ndarray|None = None) -> np.ndarray:
+            if mask_b is None:
+                mask_b = np.ones((len(obs_b), len(Action)), dtype=np.uint8)
+            return to_numpy(self.infer_act(obs_b, mask_b, exploration_noise=False))
         
+        def export(self, path: str, observation_size: int|None = None) -> None:
+            """
+            Export greedy action choice of the policy, including action masking, to a frozen TorchScript module,
+            which is run by :py:class:`ExportedAgent <rbgame.agent.exported_agent.ExportedAgent>`.
+            Supported policies are :class:`DQNPolicy <tianshou.policy.DQNPolicy>` with Q-value network and
+            policies with discrete actor, e.g. :class:`PPOPolicy <tianshou.policy.PPOPolicy>`, whose the most probable action is chosen.
+
+            :param path: File to save exported policy.
+            :param observation_size: Size of observation vector. Default to :py:data:`None`, 
+                                     which means input size of the first linear layer of network.
+            """
+            if isinstance(self.policy, DQNPolicy) and type(self.policy).compute_q_value is DQNPolicy.compute_q_value:
+                net = self.policy.model
+            elif isinstance(self.policy, PGPolicy) and self.policy.action_type == 'discrete':
+                net = self.policy.actor
+            else:
+                raise ValueError(f'Exporting {type(self.policy).__name__} is not supported.')
+            net = copy.deepcopy(net).cpu().eval()
+            if observation_size is None:
+                observation_size = next(m for m in net.modules() if isinstance(m, torch.nn.Linear)).in_features
+            num_actions = self.policy.action_space.n
+            module = GreedyNetwork(net, self.masked_input).eval()
+            example = (torch.zeros((1, observation_size)), torch.ones((1, num_actions), dtype=torch.bool))
+            with torch.no_grad(), warnings.catch_warnings():
+                # conversion of input to tensor inside tianshou networks is traced as identity, it is expected
+                warnings.simplefilter('ignore', torch.jit.TracerWarning)
+                frozen = torch.jit.freeze(torch.jit.trace(module, example, check_trace=False))
+            metadata = {'observation_size': observation_size, 'num_actions': int(num_actions), 'masked_input': self.masked_input}
+            torch.jit.save(frozen, path, _extra_files={METADATA_FILE: json.dumps(metadata)})
+
         @abstractmethod
         def policy_update_fn(self, batch_size: int, num_collected_steps: int) -> int:
             """
@@ -88,6 +198,8 @@ class RLAgent(BaseAgent):
             """  
 
 class OffPolicyAgent(RLAgent):
+    explores = True
+
     def policy_update_fn(self, batch_size: int, num_collected_steps: int) -> int:
         """
         Update policy.
@@ -108,38 +220,12 @@ class OffPolicyAgent(RLAgent):
             self.policy.update(sample_size=batch_size, buffer=self.memory)
         return num_gradient_steps
 
-    def infer_act(self, obs_b_o: np.ndarray, mask_b: np.ndarray, exploration_noise: bool) -> np.ndarray:
-        """
-        Forward batch of observations through network.
-
-        :param obs_b_o: Batch of observations. 
-        :param mask_b: Batch of action masks.
-        :param exploration_noise: Exploration or not.
-        :return: Batch of actions.
-        """
-        try:
-            obs_batch = Batch(obs=Batch(obs=obs_b_o, mask=mask_b), info=None)
-            with torch.no_grad():
-                act = self.policy(obs_batch).act
-        except:
-            obs_batch = Batch(obs=obs_b_o, info=None)
-            with torch.no_grad():
-                act = self.policy(obs_batch).act
-        if exploration_noise:
-            act = self.policy.exploration_noise(act, obs_batch)
-        return act
-    
-    def get_action(self, obs: dict[str, np.ndarray]) -> int:
-        mask = obs['action_mask'].reshape(1,-1)
-        obs = obs['observation'].reshape(1, -1)
-        with torch.no_grad():
-            act = self.policy(Batch(obs=Batch(obs=obs, mask=mask), info=None)).act[0]
-        return act
-    
 class OnPolicyAgent(RLAgent):
     def policy_update_fn(self, batch_size: int, num_collected_steps: int) -> int:
         """
         Perform one on-policy update by passing the entire buffer to the policy's update method.
+        Memory isn't cleared here, because it may be shared by other agents, which haven't updated yet.
+        :py:class:`DecentralizedTrainer <rbgame.trainer.DecentralizedTrainer>` clears it after all agents sharing it have updated.
 
         :param batch_size: Batch size.
         :param num_collected_steps: Number collected steps. Unused.
@@ -151,32 +237,4 @@ class OnPolicyAgent(RLAgent):
             batch_size=batch_size,
             repeat=self.repeat_per_collect,
         )
-        num_gradient_steps = len(self.memory)//batch_size*self.repeat_per_collect
-        self.memory.reset(keep_statistics=True)
-
-        return num_gradient_steps
-    
-    def infer_act(self, obs_b_o: np.ndarray, mask_b: np.ndarray, exploration_noise: bool) -> np.ndarray:
-        """
-        Forward batch of observations through network.
-
-        :param obs_b_o: Batch of observations. 
-        :param mask_b: Batch of action masks. Unused.
-        :param exploration_noise: Exploration or not. Unused.
-        :return: Batch of actions.
-        """
-        try:
-            obs_batch = Batch(obs=Batch(obs=obs_b_o, mask=mask_b), info=None)
-            with torch.no_grad():
-                act = self.policy(obs_batch).act
-        except:
-            obs_batch = Batch(obs=obs_b_o, info=None)
-            with torch.no_grad():
-                act = self.policy(obs_batch).act
-        return act
-
-    def get_action(self, obs: dict[str, np.ndarray]) -> int:
-        obs = obs['observation'].reshape(1, -1)
-        with torch.no_grad():
-            act = self.policy(Batch(obs=obs, info=None)).act[0]
-        return act
\ No newline at end of file
+        return len(self.memory)//batch_size*self.repeat_per_collect
@@ -0,0 +1,363 @@
+from __future__ import annotations
+from typing import Any
+
+import numpy as np
+from tianshou.data import Batch
+
+from rbgame.game import components
+from rbgame.game.engine import BoardArrays, EMPTY, BLUE, GREEN, YELLOW
+from rbgame.game.streams import RandomStreams
+from rbgame.game.consts import *
+
+class BatchedRoboticBoardGame:
+    """
+    Many games of :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`, stored in stacked numpy arrays
+    and stepped together in one vectorized call. Game rules are the same as in single game. It has interface of
+    :class:`DummyVectorEnv <tianshou.env.venvs.DummyVectorEnv>` used by :py:class:`DecentralizedTrainer <rbgame.trainer.DecentralizedTrainer>`,
+    but observations are returned as :class:`Batch <tianshou.data.Batch>` with keys :code:`'observation'` and :code:`'action_mask'`.
+
+    :param num_envs: Number of games.
+    :param colors_map: Color map for board.
+    :param target_map: Target map for board.
+    :param required_mail: Number of mails to win.
+    :param robot_colors: Colors of robots.
+    :param num_robots_per_player: Number robots per player.
+    :param with_battery: Battery is considered or not.
+    :param random_num_steps: Robot can move random number of steps each turn or not.
+    :param max_step: Maximum enviroment step.
+    :param auto_reset: Reset a game as soon as it has finished. Then :py:meth:`step` returns
+                       last observation of finished game and :py:meth:`last` returns first observation of new game.
+    :param seed: Seed of random streams. Each game owns its own :py:class:`stream <rbgame.game.streams.RandomStreams>`,
+                 so games are independent and reproducible however many of them are stepped together.
+    :param stalemate_window: Game is a stalemate, if no mail is picked up or deliveried during this number of steps.
+                             Default to :py:data:`None`, which means no window.
+    :param stalemate_policy: What happens to a stalemate, see :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`.
+                             Detection by repeated states isn't supported.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        colors_map: str,
+        targets_map: str,
+        required_mail: int,
+        robot_colors: list[str],
+        num_robots_per_player: int = 1,
+        with_battery: bool = False,
+        random_num_steps: bool = False,
+        max_step: int = 500,
+        auto_reset: bool = True,
+        seed: int|None = None,
+        stalemate_window: int|None = None,
+        stalemate_policy: str = 'truncate',
+        **kwargs: Any,
+    ) -> None:
+        assert len(robot_colors) >= 2
+        assert stalemate_policy in ('truncate', 'terminate', 'flag'), f"{stalemate_policy} is not a valid stalemate policy"
+        assert kwargs.get('max_state_repeats') is None, f'{type(self).__name__} does not support detection by repeated states'
+        self.env_num = num_envs
+        self.board = BoardArrays(components.Board(colors_map=colors_map, targets_map=targets_map))
+        self.required_mail = required_mail
+        self.robot_colors = robot_colors
+        self.num_robots_per_player = num_robots_per_player
+        self.num_robots = num_robots_per_player * len(robot_colors)
+        self.with_battery = with_battery
+        self.random_num_steps = random_num_steps
+        self.max_step = max_step
+        self.auto_reset = auto_reset
+        self.stalemate_window = stalemate_window
+        self.stalemate_policy = stalemate_policy
+        self.streams = RandomStreams(num_envs, seed)
+
+        self.agents = [robot_color + str(i + 1) for robot_color in robot_colors for i in range(num_robots_per_player)]
+        self.possible_agents = self.agents[:]
+        self.num_agents = self.num_robots
+        self.robot_obs_size = 4 if self.with_battery else 3
+
+        # B - number of games, R - number of robots, C - number of cells
+        self.occupancy = np.full((num_envs, self.board.num_cells), EMPTY, dtype=np.int16)
+        self.cell_mails = np.zeros((num_envs, self.board.num_cells), dtype=np.int8)
+        self.positions = np.zeros((num_envs, self.num_robots), dtype=np.int16)
+        self.mails = np.zeros((num_envs, self.num_robots), dtype=np.int8)
+        self.batteries = np.full((num_envs, self.num_robots), MAXIMUM_ROBOT_BATTERY, dtype=np.float64)
+        self.stand_times = np.zeros((num_envs, self.num_robots), dtype=np.int16)
+        self.count_mails = np.zeros((num_envs, self.num_robots), dtype=np.int16)
+
+        self.agent_indices = np.zeros(num_envs, dtype=np.int64)
+        self.steps_to_change_turn = np.ones(num_envs, dtype=np.int64)
+        self.num_steps = np.zeros(num_envs, dtype=np.int64)
+        self.clocks = np.zeros(num_envs, dtype=np.int64)
+        self.cumulative_rewards = np.zeros((num_envs, self.num_robots))
+        self.terminations = np.zeros(num_envs, dtype=np.bool_)
+        self.truncations = np.zeros(num_envs, dtype=np.bool_)
+        # index of the winner player, -1 if there is no winner
+        self.winners = np.full(num_envs, -1, dtype=np.int64)
+        self.stalemates = np.zeros(num_envs, dtype=np.bool_)
+        # number of pick ups and deliveries and the step, when the last of them happened
+        self.progress = np.zeros(num_envs, dtype=np.int64)
+        self.last_progress_steps = np.zeros(num_envs, dtype=np.int64)
+
+        # order of robots in observation of each robot, robot itself is in the first place
+        self.__orders = np.array([
+            [robot] + [r for r in range(self.num_robots) if r != robot]
+            for robot in range(self.num_robots)
+        ])
+
+        self.reset()
+
+    def __len__(self) -> int:
+        return self.env_num
+
+    def __ids(self, id: int|list[int]|np.ndarray|None) -> np.ndarray:
+        if id is None:
+            return np.arange(self.env_num)
+        return np.atleast_1d(np.asarray(id, dtype=np.int64))
+
+    def __draw_steps_to_change_turn(self, ids: np.ndarray) -> np.ndarray:
+        if self.random_num_steps:
+            return self.streams.integers(ids, 1, MAXIMUM_STEP_PER_TURN)
+        return np.ones(ids.size, dtype=np.int64)
+
+    def reset_games(self, ids: np.ndarray) -> None:
+        """
+        Reset games with indices :code:`ids` to initial state without returning observations.
+
+        :param ids: Indices of games.
+        """
+        n = ids.size
+        if n == 0:
+            return
+        self.occupancy[ids] = EMPTY
+        # sample distinct white cells for robots in each game
+        order = self.streams.random(ids, self.board.white_cells.size).argsort(axis=1)[:, :self.num_robots]
+        self.positions[ids] = self.board.white_cells[order]
+        self.occupancy[ids[:, None], self.positions[ids]] = np.arange(self.num_robots)
+        self.mails[ids] = 0
+        self.count_mails[ids] = 0
+        if self.with_battery:
+            self.batteries[ids] = MAXIMUM_ROBOT_BATTERY
+        self.cell_mails[ids] = 0
+        self.cell_mails[ids[:, None], self.board.green_cells] = self.streams.integers(ids, 1, 10, self.board.green_cells.size)
+
+        self.agent_indices[ids] = 0
+        self.steps_to_change_turn[ids] = self.__draw_steps_to_change_turn(ids)
+        self.num_steps[ids] = 0
+        self.clocks[ids] = 0
+        self.cumulative_rewards[ids] = 0
+        self.terminations[ids] = False
+        self.truncations[ids] = False
+        self.winners[ids] = -1
+        self.stalemates[ids] = False
+        self.progress[ids] = 0
+        self.last_progress_steps[ids] = 0
+
+    def reset(self, id: int|list[int]|np.ndarray|None = None, seed: int|None = None, **kwargs: Any) -> tuple[Batch, Batch]:
+        """
+        Reset games.
+
+        :param id: Indices of games to reset. Default to all games.
+        :param seed: Seed of random streams. If it isn't :py:data:`None`, streams of games :code:`id` are reseeded.
+        :return: Observations of current agents and some infomations.
+        """
+        ids = self.__ids(id)
+        if seed is not None:
+            self.streams.seed(seed, ids)
+        self.reset_games(ids)
+        return self.observe(ids, self.agent_indices[ids]), Batch(transition_belongs_agent=self.agent_indices[ids])
+
+    def masks(self, ids: np.ndarray, robots: np.ndarray) -> np.ndarray:
+        """
+        Action masks, the same as :py:attr:`Robot.mask <rbgame.game.components.Robot.mask>`.
+
+        :param ids: Indices of games.
+        :param robots: Index of robot in each game.
+        :return: Binary matrix with shape (number of games, 5).
+        """
+        board = self.board
+        pos = self.positions[ids, robots]
+        next_pos = board.neighbors[pos]
+        has_next = next_pos != EMPTY
+        occupied = has_next & (self.occupancy[ids[:, None], np.where(has_next, next_pos, 0)] != EMPTY)
+        legal_actions = board.action_table[
+            pos,
+            self.mails[ids, robots],
+            board.battery_buckets[np.ceil(self.batteries[ids, robots]).astype(np.int64)],
+            (self.stand_times[ids, robots] >= 5).astype(np.int64),
+            occupied @ (1 << np.arange(4)),
+        ]
+        return components.ACTION_MASKS[legal_actions]
+
+    def observe(self, ids: np.ndarray, robots: np.ndarray) -> Batch:
+        """
+        Observations of robots, the same as :py:meth:`RoboticBoardGame.observe <rbgame.game.game.RoboticBoardGame.observe>`.
+
+        :param ids: Indices of games.
+        :param robots: Index of observing robot in each game.
+        :return: Batch with keys :code:`'observation'` and :code:`'action_mask'`.
+        """
+        robot_states = np.empty((ids.size, self.num_robots, self.robot_obs_size), dtype=np.float32)
+        positions = self.positions[ids]
+        robot_states[..., :2] = self.board.cell_coordinates[positions]
+        robot_states[..., 2] = self.mails[ids]/9
+        if self.with_battery:
+            robot_states[..., 3] = np.ceil(self.batteries[ids])/10
+        robot_states = robot_states[np.arange(ids.size)[:, None], self.__orders[robots]]
+        return Batch(observation=robot_states.reshape(ids.size, -1), action_mask=self.masks(ids, robots))
+
+    def step(self, action: np.ndarray, id: int|list[int]|np.ndarray|None = None) -> tuple[Batch, np.ndarray, np.ndarray, np.ndarray, Batch]:
+        """
+        Perform one step in each game with indices :code:`id`.
+
+        :param action: Actions of current agents of games.
+        :param id: Indices of games. Default to all games.
+        :return: Next observations of acting agents, the rewards, terminations, truncations and infomations.
+                 Besides :code:`'transition_belongs_agent'`, infomations contain what :py:meth:`last` would return after the step,
+                 so caller doesn't need to call it: :code:`'next_agent'` - index of current agent,
+                 :code:`'next_obs'` - its observation and :code:`'next_done'` - game has finished or not.
+        """
+        ids = self.__ids(id)
+        action = np.asarray(action, dtype=np.int64).reshape(-1)
+        assert action.size == ids.size
+        board = self.board
+        n = ids.size
+        robots = self.agent_indices[ids]
+        pos = self.positions[ids, robots]
+
+        legal = self.masks(ids, robots)[np.arange(n), action].astype(np.bool_)
+        rewards = np.full(n, DEFAULT_REWARD)
+
+        # robots stand
+        stand = legal & (action == components.Action.DO_NOTHING)
+        self.stand_times[ids[stand], robots[stand]] += 1
+        charging = stand & (board.cell_colors[pos] == BLUE)
+        if self.with_battery:
+            self.batteries[ids[charging], robots[charging]] = np.minimum(
+                self.batteries[ids[charging], robots[charging]] + BATTERY_UP_PER_CHARGE, MAXIMUM_ROBOT_BATTERY)
+        rewards[charging] = 0
+
+        # robots move
+        move = legal & (action != components.Action.DO_NOTHING)
+        m_ids, m_robots, m_pos = ids[move], robots[move], pos[move]
+        next_pos = board.neighbors[m_pos, action[move] - 1]
+        self.stand_times[m_ids, m_robots] = 0
+        self.occupancy[m_ids, m_pos] = EMPTY
+        leave_green = board.cell_colors[m_pos] == GREEN
+        self.cell_mails[m_ids[leave_green], m_pos[leave_green]] = self.streams.integers(m_ids[leave_green], 1, 10)
+        self.positions[m_ids, m_robots] = next_pos
+        self.occupancy[m_ids, next_pos] = m_robots
+        if self.with_battery:
+            battery = self.batteries[m_ids, m_robots]
+            battery -= np.where(battery > 2, BATTERY_PER_STEP, BATTERY_PER_STEP/2)
+            self.batteries[m_ids, m_robots] = np.maximum(battery, 0)
+        next_color = board.cell_colors[next_pos]
+        m_rewards = np.full(m_ids.size, DEFAULT_REWARD)
+        pick_up = next_color == GREEN
+        self.mails[m_ids[pick_up], m_robots[pick_up]] = self.cell_mails[m_ids[pick_up], next_pos[pick_up]]
+        m_rewards[pick_up] = REWARD_FOR_PICK_UP_MAIL
+        drop_off = next_color == YELLOW
+        self.mails[m_ids[drop_off], m_robots[drop_off]] = 0
+        self.count_mails[m_ids[drop_off], m_robots[drop_off]] += 1
+        m_rewards[drop_off] = REWARD_FOR_DROP_OFF_MAIL
+        m_rewards[next_color == BLUE] = REWARD_FOR_REACHING_BLUE
+        rewards[move] = m_rewards
+        self.clocks[m_ids] += 1
+
+        # if robot has moved, charge robots in blue cells, except acting robot
+        if self.with_battery and m_ids.size:
+            waiting = board.cell_colors[self.positions[m_ids]] == BLUE
+            waiting[np.arange(m_ids.size), m_robots] = False
+            batteries = self.batteries[m_ids]
+            self.batteries[m_ids] = np.where(waiting, np.minimum(batteries + BATTERY_UP_PER_CHARGE, MAXIMUM_ROBOT_BATTERY), batteries)
+
+        self.cumulative_rewards[ids] = 0
+        self.cumulative_rewards[ids, robots] = rewards
+        self.num_steps[ids] += 1
+
+        players = robots // self.num_robots_per_player
+        count_mails = self.count_mails[ids].reshape(n, len(self.robot_colors), self.num_robots_per_player).sum(axis=2)
+        win = count_mails[np.arange(n), players] == self.required_mail
+        self.terminations[ids[win]] = True
+        self.winners[ids[win]] = players[win]
+        if self.stalemate_window is not None:
+            progress = 2*self.count_mails[ids].sum(axis=1) + np.count_nonzero(self.mails[ids], axis=1)
+            progressed = ids[progress != self.progress[ids]]
+            self.progress[ids] = progress
+            self.last_progress_steps[progressed] = self.num_steps[progressed]
+            stalemate = ids[~win & ~self.stalemates[ids] & (self.num_steps[ids] - self.last_progress_steps[ids] >= self.stalemate_window)]
+            self.stalemates[stalemate] = True
+            if self.stalemate_policy == 'terminate':
+                self.terminations[stalemate] = True
+        self.truncations[ids] = self.num_steps[ids] >= self.max_step
+        if self.stalemate_policy == 'truncate':
+            self.truncations[ids] |= self.stalemates[ids]
+
+        self.steps_to_change_turn[ids] -= 1
+        change_turn = ids[self.steps_to_change_turn[ids] == 0]
+        self.agent_indices[change_turn] = (self.agent_indices[change_turn] + 1) % self.num_robots
+        self.steps_to_change_turn[change_turn] = self.__draw_steps_to_change_turn(change_turn)
+
+        # next observation always belongs to acting robot, whether game changes turn or not
+        obs = self.observe(ids, robots)
+        terminated = self.terminations[ids].copy()
+        truncated = self.truncations[ids].copy()
+        if self.auto_reset:
+            self.reset_games(ids[terminated | truncated])
+
+        # observation of current agent differs from the one of acting agent only if turn has changed or game has been reset
+        next_robots = self.agent_indices[ids]
+        next_obs = Batch(observation=obs.observation.copy(), action_mask=obs.action_mask.copy())
+        changed = (next_robots != robots) | terminated | truncated
+        if changed.any():
+            changed_obs = self.observe(ids[changed], next_robots[changed])
+            next_obs.observation[changed] = changed_obs.observation
+            next_obs.action_mask[changed] = changed_obs.action_mask
+        info = Batch(
+            transition_belongs_agent=robots,
+            next_agent=next_robots,
+            next_obs=next_obs,
+            next_done=self.terminations[ids] | self.truncations[ids],
+        )
+        return obs, rewards, terminated, truncated, info
+
+    def last(self, id: int|list[int]|np.ndarray|None = None) -> tuple[Batch, np.ndarray, np.ndarray, np.ndarray, Batch]:
+        """
+        Similar to :py:meth:`last` of :class:`AECEnv <pettingzoo.AECEnv>`, but for many games.
+
+        :param id: Indices of games. Default to all games.
+        :return: Observations of current agents, their cumulative rewards, terminations, truncations and infomations.
+        """
+        ids = self.__ids(id)
+        robots = self.agent_indices[ids]
+        return (
+            self.observe(ids, robots),
+            self.cumulative_rewards[ids, robots],
+            self.terminations[ids].copy(),
+            self.truncations[ids].copy(),
+            Batch(transition_belongs_agent=robots),
+        )
+
+    def get_env_attr(self, key: str, id: int|list[int]|np.ndarray|None = None) -> list[Any]:
+        """
+        Get attribute of games, similar to :meth:`get_env_attr <tianshou.env.venvs.BaseVectorEnv.get_env_attr>`.
+        Supported keys are :code:`'agent_selection'`, :code:`'winner'`, :code:`'stalemate'`, :code:`'agents'` and :code:`'num_agents'`.
+
+        :param key: Name of the attribute.
+        :param id: Indices of games. Default to all games.
+        :return: List of values for each game.
+        """
+        ids = self.__ids(id)
+        if key == 'agent_selection':
+            return [self.agents[i] for i in self.agent_indices[ids]]
+        if key == 'winner':
+            return [self.robot_colors[w] if w >= 0 else None for w in self.winners[ids]]
+        if key == 'stalemate':
+            return self.stalemates[ids].tolist()
+        if key in ('agents', 'possible_agents', 'num_agents'):
+            return [getattr(self, key)] * ids.size
+        raise AttributeError(f'{key} is not supported by {type(self).__name__}')
+
+    def close(self) -> None:
+        """
+        Close the enviroment.
+        """
+        pass
@@ -1,15 +1,13 @@
 from __future__ import annotations
-import os
 import random
-import csv
 import math
 import logging as log
 import enum
 
 import numpy as np
-import pygame
 
 from rbgame.game.consts import *
+from rbgame.game.topology import MapTopology, compile_map, NO_NEIGHBOR
 
 class Action(enum.IntEnum):
     '''
@@ -21,6 +19,41 @@ class Action(enum.IntEnum):
     TURN_LEFT = 3
     TURN_RIGHT = 4
 
+# legal actions are stored as bits, bit i is set if action i is legal
+# ACTION_MASKS[bits] is action mask corresponding to these bits
+ACTION_MASKS = ((np.arange(1 << len(Action))[:, None] >> np.arange(len(Action))) & 1).astype(np.uint8)
+ACTION_MASKS.flags.writeable = False
+
+def battery_signature(battery: int) -> tuple[bool, ...]:
+    """
+    :param battery: Battery of robot.
+    :return: Outcome of all battery comparisons which rules of moving depend on.
+    """
+    return (
+        battery == 0,
+        battery >= MAXIMUM_ROBOT_BATTERY - 1,
+        battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY,
+        battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY,
+    )
+
+def battery_buckets() -> tuple[list[int], list[int]]:
+    """
+    Split batteries into buckets of consecutive values with the same :py:func:`signature <battery_signature>`, 
+    within which rules of moving are the same.
+
+    :return: Bucket of each battery and smallest battery of each bucket.
+    """
+    buckets, smallest_batteries = [], []
+    for battery in range(MAXIMUM_ROBOT_BATTERY + 1):
+        if battery == 0 or battery_signature(battery) != battery_signature(battery - 1):
+            smallest_batteries.append(battery)
+        buckets.append(len(smallest_batteries) - 1)
+    return buckets, smallest_batteries
+
+BATTERY_BUCKETS, BUCKET_BATTERIES = battery_buckets()
+# maximum mail number plus one
+NUM_MAILS = 10
+
 class Cell:
 
     """
@@ -35,11 +68,12 @@ class Cell:
     :param color: The color of the cell. Possible colors are ``'w'`` - white, ``'b'`` - blue,  ``'r'`` - red, ``'y'`` - yellow, ``'gr'`` - green, ``'g'`` - gray.
     :param target: Number of the mail that robot have to delivery to this cell. 0 if cell isn't receiving station.  
     :param robot: The located in this cell robot.
-    :param mail: Generated mail in this cell.
+    :param mail: Number of generated mail in this cell, 0 if there is no mail.
     :param front: The front cell of this cell.
     :param back: The back cell of this cell.
     :param left: The left cell of this cell.
     :param right: The right cell of this cell.
+    :param is_corner: Cell is stucked between two yellow or red cells in the edge of the board.
     """
 
     def __init__(
@@ -49,12 +83,13 @@ class Cell:
         color: str = 'w',
         target: int = 0,
         robot: Robot | None = None,
-        mail: Mail | None = None,
+        mail: int = 0,
         *,
         front: 'Cell | None' = None,
         back: 'Cell | None' = None,
         left: 'Cell | None' = None,
-        right: 'Cell | None' = None
+        right: 'Cell | None' = None,
+        is_corner: bool = False,
     ) -> None:
         self.__x = x
         self.__y = y
@@ -67,6 +102,10 @@ class Cell:
         self.back = back
         self.left = left
         self.right = right
+        self.is_corner = is_corner
+
+        # legal actions of robot in this cell, compiled by board
+        self.action_table: np.ndarray | None = None
 
     def __repr__(self) -> str:
         return f'Cell({self.x}, {self.y})'
@@ -122,49 +161,102 @@ class Cell:
             if cell
         ]
 
-    def generate_mail(self, sprites_mail: pygame.sprite.Group, render_mode: str|None) -> None:
-        """
-        Generate a new mail and add it to :code:`sprites_mail`.
-
-        :param sprites_mail: Group of sprites to add new mail.
-        :param render_mode: Render mode of new generated mail.
-        """
-        # create new mail-sprite
-        self.mail = Mail(random.choice(range(1, 10)), self, render_mode)
-        # add mail to respective ground of sprites
-        sprites_mail.add(self.mail)
-
-    def draw(self, surface: pygame.Surface) -> None:
-        """
-        Draw this cell in a surface.
-
-        :param surface: Surface to draw this cell in.
-        """
-        # draw rectangle of the cell
-        pygame.draw.rect(
-            surface, MAP_COLORS[self.color],
-            ((self.x + 1) * CELL_SIZE[0],
-             (self.y + 1) * CELL_SIZE[1], CELL_SIZE[0], CELL_SIZE[1]))
-        # draw border
-        pygame.draw.rect(
-            surface, (0, 0, 0),
-            ((self.x + 1) * CELL_SIZE[0],
-             (self.y + 1) * CELL_SIZE[1], CELL_SIZE[0], CELL_SIZE[1]), 1)
-        # draw target number if it isn't 0 
-        if self.target:
-            target_font = pygame.font.SysFont(None, 64)
-            target_image = target_font.render(str(self.target), True,
-                                              (0, 0, 0))
-            surface.blit(target_image,
-                         ((self.x + 1) * CELL_SIZE[0] +
-                          (CELL_SIZE[0] - target_image.get_width()) / 2,
-                          (self.y + 1) * CELL_SIZE[1] +
-                          (CELL_SIZE[1] - target_image.get_height()) / 2))
-            
+    def can_stand(self, mail: int, battery: int, stand_too_long: bool) -> bool:
+        """
+        Robot in this cell can do nothing or not. 
+        It depends only on static properties of the board, so it is called only when board compiles action table.
+
+        :param mail: Number of the mail that robot carries, 0 if robot doesn't carry mail.
+        :param battery: Battery of robot.
+        :param stand_too_long: Robot has stood constantly too many times.
+        :return: Possibility of :py:attr:`Action.DO_NOTHING`.
+        """
+        # robot with high battery can't stand in the blue cell
+        if self.color == 'b' and battery >= MAXIMUM_ROBOT_BATTERY - 1:
+            return False
+        # robot without mail can't stand in the yellow cell
+        if self.color == 'y' and not mail:
+            return False
+        # robot with mail can't stand in the green cell
+        if self.color == 'gr' and mail:
+            return False
+        # robot with high battery can't stand waiting for charging
+        if any([cell.color == 'b' for cell in self.neighbors]) and battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
+            return False
+        # robot, stucked between two yellow cells in the edge of the board, can't stand
+        if self.is_corner:
+            return False
+        # robot can't stand constantly
+        if self.color != 'b' and stand_too_long:
+            return False
+        return True
+
+    def can_move_to(self, cell: Cell | None, mail: int, battery: int) -> bool:
+        """
+        Robot in this cell can move to :code:`cell` or not, assuming :code:`cell` is empty.
+        It depends only on static properties of the board, so it is called only when board compiles action table.
+
+        :param cell: Neighboring cell to move to.
+        :param mail: Number of the mail that robot carries, 0 if robot doesn't carry mail.
+        :param battery: Battery of robot.
+        :return: Possibility of the move.
+        """
+        # robot can't move if battery is exhausted
+        if not battery:
+            return False
+        # if robot is charging, it can't move until battery is nearly full
+        if self.color == 'b' and battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY:
+            return False
+        # robot can't move if next cell is none
+        if not cell:
+            return False
+        # robot can't move if next cell is red
+        if cell.color == 'r':
+            return False
+        # robot can't move to yellow cell if it don't carry a mail or carried mail not match with cell target
+        if cell.color == 'y' and (not mail or cell.target != mail):
+            return False
+        # robot can't move to green cell if it already has carried a mail
+        if cell.color == 'gr' and mail:
+            return False
+        # robot with high battery can't move to blue cell
+        if cell.color == 'b' and battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
+            return False
+        # robot avoid go to corner if don't need drop off mail
+        if self.color != 'y' and cell.is_corner:
+            if not mail or mail not in [neighbor.target for neighbor in cell.neighbors]:
+                return False
+        return True
+
+    @property
+    def occupied_neighbors(self) -> int:
+        """
+        Bits of neighboring cells with robot in order front, back, left, right.
+        """
+        bits = 0
+        if self.front and self.front.robot:
+            bits |= 1
+        if self.back and self.back.robot:
+            bits |= 2
+        if self.left and self.left.robot:
+            bits |= 4
+        if self.right and self.right.robot:
+            bits |= 8
+        return bits
+
+    def generate_mail(self, rng: random.Random) -> None:
+        """
+        Generate a new mail in this cell.
+
+        :param rng: Random generator of the game.
+        """
+        self.mail = rng.choice(range(1, 10))
+
 class Board:
 
     """
     A object representing game board. It is set of :py:class:`Cell`.
+    Static facts of the board are shared with other boards of the same map by :py:attr:`topology`.
 
     :param colors_map: csv file name for color map. 
                        Each element define :py:attr:`color` of each :py:class:`Cell`.
@@ -172,10 +264,14 @@ class Board:
                         Each element define :py:attr:`target` of each :py:class:`Cell`. 
     """
 
+    # action tables of compiled maps by content hash, they are read-only and shared between boards
+    __action_tables: dict[str, np.ndarray] = {}
+
     def __init__(self, colors_map: str, targets_map: str) -> None:
 
-        self.__load_from_file(colors_map, targets_map)
-        self.size = len(self.cells[0])
+        self.topology: MapTopology = compile_map(colors_map, targets_map)
+        self.__load_from_topology()
+        self.size = self.topology.size
 
         self.yellow_cells = self.__get_cells_by_color('y')
         self.red_cells = self.__get_cells_by_color('r')
@@ -183,49 +279,70 @@ class Board:
         self.blue_cells = self.__get_cells_by_color('b')
         self.white_cells = self.__get_cells_by_color('w')
 
+        self.__compile_action_table()
+
     # allow us access cell by coordinate
     def __getitem__(self, coordinate: tuple[int, int]) -> Cell:
         return self.cells[coordinate[1]][coordinate[0]]
 
     def __get_cells_by_color(self, color: str) -> list[Cell]:
-        return [
-            cell for row_cell in self.cells for cell in row_cell
-            if cell.color == color
+        return [self.flat_cells[c] for c in self.topology.cells(color)]
+
+    def __load_from_topology(self) -> None:
+        topology = self.topology
+        # create cells with given colors and targets, in order of flat index
+        self.flat_cells: list[Cell] = [
+            Cell(topology.ys[c], topology.xs[c], color=topology.colors[c], target=topology.targets[c], is_corner=bool(topology.is_corner[c]))
+            for c in range(topology.num_cells)
         ]
-
-    def __load_from_file(self, colors_map: str, targets_map: str) -> None:
-
         # two dimension list of Cell
-        self.cells: list[list[Cell]] = []
-
-        colors_map_file = open(colors_map, mode='r', encoding="utf-8")
-        targets_map_file = open(targets_map, mode='r', encoding="utf-8")
-
-        color_matrix = csv.reader(colors_map_file)
-        target_matrix = csv.reader(targets_map_file)
-
-        # create cells with given colors and targets in csv files
-        for i, (color_row,
-                target_row) in enumerate(zip(color_matrix, target_matrix)):
-            self.cells.append([])
-            for j, (color, target) in enumerate(zip(color_row, target_row)):
-                self.cells[-1].append(
-                    Cell(i, j, color=color, target=int(target)))
-
-        colors_map_file.close()
-        targets_map_file.close()
+        self.cells: list[list[Cell]] = [
+            self.flat_cells[i*topology.size:(i + 1)*topology.size] for i in range(topology.size)
+        ]
 
         # set for each cell its adjacent
-        for i, _ in enumerate(self.cells):
-            for j, _ in enumerate(self.cells[i]):
-                if (i - 1) >= 0:
-                    self.cells[i][j].front = self.cells[i - 1][j]
-                if (i + 1) < len(self.cells[i]):
-                    self.cells[i][j].back = self.cells[i + 1][j]
-                if (j + 1) < len(self.cells[i]):
-                    self.cells[i][j].right = self.cells[i][j + 1]
-                if (j - 1) >= 0:
-                    self.cells[i][j].left = self.cells[i][j - 1]
+        for cell, neighbors in zip(self.flat_cells, topology.neighbor_lists):
+            cell.front, cell.back, cell.left, cell.right = (
+                self.flat_cells[n] if n != NO_NEIGHBOR else None for n in neighbors
+            )
+
+    def __compile_action_table(self) -> None:
+        action_table = Board.__action_tables.get(self.topology.key)
+        if action_table is None:
+            action_table = Board.__action_tables[self.topology.key] = self.__build_action_table()
+        self.action_table = action_table
+        for k, cell in enumerate(self.flat_cells):
+            cell.action_table = self.action_table[k]
+
+    def __build_action_table(self) -> np.ndarray:
+        # legal actions of robot depend on its cell, carried mail, battery bucket, whether it stood too long
+        # and which neighboring cells are occupied, others are static facts of the board
+        # action_table[cell, mail, bucket, stand_too_long, occupied_neighbors] is bits of legal actions
+        cells = self.flat_cells
+        can_stand = np.array([
+            [
+                [[cell.can_stand(mail, battery, stand_too_long) for stand_too_long in (False, True)] for battery in BUCKET_BATTERIES]
+                for mail in range(NUM_MAILS)
+            ]
+            for cell in cells
+        ], dtype=np.uint8)
+        can_move = np.array([
+            [
+                [
+                    [cell.can_move_to(next_cell, mail, battery) for next_cell in [cell.front, cell.back, cell.left, cell.right]]
+                    for battery in BUCKET_BATTERIES
+                ]
+                for mail in range(NUM_MAILS)
+            ]
+            for cell in cells
+        ], dtype=np.uint8)
+        # bits of legal actions, bit i is set if action i is legal
+        legal_actions = can_stand | (can_move @ (2 << np.arange(4, dtype=np.uint8)))[..., None]
+        # moving to occupied neighbor is illegal, bit of action i+1 is cleared by bit i of occupied neighbors
+        free_moves = ~(np.arange(16, dtype=np.uint8) << 1)
+        action_table = legal_actions[..., None] & free_moves
+        action_table.flags.writeable = False
+        return action_table
 
     def reset(self) -> None:
         '''
@@ -234,12 +351,13 @@ class Board:
         for cells in self.cells:
             for cell in cells:
                 cell.robot = None
-                cell.mail = None
+                cell.mail = 0
 
-class Robot(pygame.sprite.Sprite):
+class Robot:
 
     """
-    Robot in the board.
+    Robot in the board. It is a lightweight record without any rendering stuffs, 
+    see :py:class:`RobotSprite <rbgame.game.sprites.RobotSprite>` for robot that can be drawn.
 
     .. note::
 
@@ -248,80 +366,45 @@ class Robot(pygame.sprite.Sprite):
     :param pos: Current position of the robot.
     :param index: The index of the robot.
     :param color: The color of the robot.
-    :param sprites_group: Group of mails. We need to add new mail to this group when robot pick up a mail and leaves green cell.
     :param clock: The game clock. For each step of the robot, time increases by :math:`\\Delta t`.
-    :param mail: The mail that robot are carring.
+    :param mail: Number of the mail that robot are carring, 0 if robot doesn't carry mail.
     :param count_mail: Number of deliveried mails by robot.
     :param battery: The battery.
     :param with_battery: Battery is considered or not.
-    :param render_mode: The render mode. It can be :py:data:`None` or :code:`'human'`.
     :param log _to_file: Log game process to file or not.
+    :param rng: Random generator of the game, which new mails are drawn from. Default to a new unseeded generator.
     """
 
+    __slots__ = ('pos', 'index', 'color', 'clock', 'mail', 'count_mail', '__battery', 'with_battery', 'log', 'stand_times', 'rng')
 
     def __init__(
         self,
         pos: Cell,
         index: int,
         color: str,
-        sprites_group: pygame.sprite.Group,
         clock: Clock,
-        mail: Mail | None = None,
+        mail: int = 0,
         count_mail: int = 0,
         battery: int = MAXIMUM_ROBOT_BATTERY,
         with_battery: bool = True,
-        render_mode: str|None = None,
         log_to_file: bool = False,
+        rng: random.Random | None = None,
     ) -> None:
-        super().__init__()
         self.pos = pos
         self.pos.robot = self
         self.index = index
         self.color = color
-        self.sprites_group = sprites_group
         self.clock = clock
         self.mail = mail
         self.count_mail = count_mail
         self.__battery = battery
         self.with_battery = with_battery
-        self.render_mode = render_mode
         self.log = log_to_file 
+        self.rng = rng if rng is not None else random.Random()
 
         # an variable to count how many times robot stands still
         self.stand_times = 0
 
-        if self.render_mode == 'human':
-            self.__set_image()
-            self.__set_number_image()
-            self.rect = self.image.get_rect()
-            self.rect.topleft = ((self.pos.x + 1) * CELL_SIZE[0],
-                                 (self.pos.y + 1) * CELL_SIZE[1])
-
-    def __set_image(self) -> None:
-        parent_dir = os.path.dirname(os.path.dirname(__file__))
-        if self.color == 'b':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'blue_robot.png'))
-        elif self.color == 'r':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'red_robot.png'))
-        elif self.color == 'p':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'purple_robot.png'))
-        elif self.color == 'gr':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'green_robot.png'))
-        elif self.color == 'o':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'orange_robot.png'))
-        elif self.color == 'pi':
-            self.image = pygame.image.load(os.path.join(parent_dir, 'assets', 'images', 'pink_robot.png'))
-        else:
-            raise ValueError("Colors of the robot can only be 'b', 'r', 'p', 'gr', 'o', 'pi'")
-        self.image = pygame.transform.scale(self.image, CELL_SIZE)
-
-    def __set_number_image(self) -> None:
-        robot_number_font = pygame.font.SysFont(None, 16)
-        number_img = robot_number_font.render(str(self.index), True, (0, 0, 0))
-        self.image.blit(number_img,
-                        (0.5 * CELL_SIZE[0] - number_img.get_width() / 2,
-                         0.7 * CELL_SIZE[1] - number_img.get_height() / 2))
-
     @property
     def battery(self) -> int:
         return math.ceil(self.__battery)
@@ -349,9 +432,8 @@ class Robot(pygame.sprite.Sprite):
         # TODO: Is return features of all robots is worthy, it makes observation space is larger and different 
         # for each case of number robots. We can include features of robots that inside a square around this robot
         # TODO: May be pixels of currrent frame better, it takes a CNN as features extraction but could extracts more features
-        mail = self.mail.mail_number if self.mail else 0
-        return np.array([self.pos.x/8, self.pos.y/8, mail/9, self.battery/10], dtype=np.float32) if self.with_battery \
-            else np.array([self.pos.x/8, self.pos.y/8, mail/9], dtype=np.float32)
+        return np.array([self.pos.x/8, self.pos.y/8, self.mail/9, self.battery/10], dtype=np.float32) if self.with_battery \
+            else np.array([self.pos.x/8, self.pos.y/8, self.mail/9], dtype=np.float32)
     
     @property
     def is_charged(self) -> bool:
@@ -360,16 +442,6 @@ class Robot(pygame.sprite.Sprite):
         """
         return self.pos.color == 'b'
 
-    @property
-    def next_rect(self) -> pygame.Rect:
-        """
-        Next rectangle, where we should draw it after its movement.
-        """
-        rect = self.image.get_rect()
-        rect.topleft = ((self.pos.x + 1) * CELL_SIZE[0],
-                        (self.pos.y + 1) * CELL_SIZE[1])
-        return rect
-    
     def stand(self) -> tuple[bool, float]:
         """
         Don't move. Charge if possible.
@@ -395,7 +467,7 @@ class Robot(pygame.sprite.Sprite):
         self.stand_times = 0
         self.pos.robot = None
         if self.pos.color == 'gr':
-            self.pos.generate_mail(self.sprites_group, self.render_mode)
+            self.generate_mail(self.pos)
         self.pos = self.pos.front
         self.pos.robot = self
         self.inner_battery -= BATTERY_PER_STEP if self.inner_battery > 2 else BATTERY_PER_STEP/2
@@ -425,7 +497,7 @@ class Robot(pygame.sprite.Sprite):
         self.stand_times = 0
         self.pos.robot = None
         if self.pos.color == 'gr':
-            self.pos.generate_mail(self.sprites_group, self.render_mode)
+            self.generate_mail(self.pos)
         self.pos = self.pos.back
         self.pos.robot = self
         self.inner_battery -= BATTERY_PER_STEP if self.inner_battery > 2 else BATTERY_PER_STEP/2
@@ -455,7 +527,7 @@ class Robot(pygame.sprite.Sprite):
         self.stand_times = 0
         self.pos.robot = None
         if self.pos.color == 'gr':
-            self.pos.generate_mail(self.sprites_group, self.render_mode)
+            self.generate_mail(self.pos)
         self.pos = self.pos.right
         self.pos.robot = self
         self.inner_battery -= BATTERY_PER_STEP if self.inner_battery > 2 else BATTERY_PER_STEP/2
@@ -485,7 +557,7 @@ class Robot(pygame.sprite.Sprite):
         self.stand_times = 0
         self.pos.robot = None
         if self.pos.color == 'gr':
-            self.pos.generate_mail(self.sprites_group, self.render_mode)
+            self.generate_mail(self.pos)
         self.pos = self.pos.left
         self.pos.robot = self
         self.inner_battery -= BATTERY_PER_STEP if self.inner_battery > 2 else BATTERY_PER_STEP/2
@@ -512,7 +584,7 @@ class Robot(pygame.sprite.Sprite):
         self.mail = self.pos.mail
         if self.log:
             log.info(
-                f'At t={self.clock.now:04} {COLOR2STR[self.color]:>5} robot {self.index} pick up mail {self.mail.mail_number}'
+                f'At t={self.clock.now:04} {COLOR2STR[self.color]:>5} robot {self.index} pick up mail {self.mail}'
             )
 
     def drop_off(self) -> None:
@@ -521,14 +593,21 @@ class Robot(pygame.sprite.Sprite):
         """
         # we assume this action is legal.
         deliveried_mail = self.mail
-        self.mail.kill()
-        self.mail = None
+        self.mail = 0
         self.count_mail += 1
         if self.log:
             log.info(
-                f'At t={self.clock.now:04} {COLOR2STR[self.color]:>5} robot {self.index} drop off mail {deliveried_mail.mail_number}'
+                f'At t={self.clock.now:04} {COLOR2STR[self.color]:>5} robot {self.index} drop off mail {deliveried_mail}'
             )
 
+    def generate_mail(self, cell: Cell) -> None:
+        """
+        Generate a new mail in green cell :code:`cell`, which robot has just left.
+
+        :param cell: Green cell to generate mail in.
+        """
+        cell.generate_mail(self.rng)
+
     def charge(self) -> None:
         """
         Charge.
@@ -544,11 +623,9 @@ class Robot(pygame.sprite.Sprite):
         """
         self.pos = pos
         self.pos.robot = self
-        self.mail = None
+        self.mail = 0
         self.count_mail = 0
         self.inner_battery = MAXIMUM_ROBOT_BATTERY
-        if self.render_mode == 'human':
-            self.rect = self.next_rect
 
     def step(self, action: int) -> tuple[bool, float]:
         """
@@ -575,6 +652,19 @@ class Robot(pygame.sprite.Sprite):
         if action == Action.DO_NOTHING:
             return self.stand()
     
+    @property
+    def legal_actions(self) -> int:
+        """
+        Bits of legal actions, bit i is set if action i is legal. 
+        It is looked up in :py:attr:`action table <rbgame.game.components.Board.action_table>` of the board.
+        """
+        return self.pos.action_table.item(
+            self.mail,
+            BATTERY_BUCKETS[self.battery],
+            int(self.stand_times >= 5),
+            self.pos.occupied_neighbors,
+        )
+
     def is_legal_move(self, action: int) -> bool:
         """
         Check if action is legal.
@@ -582,196 +672,14 @@ class Robot(pygame.sprite.Sprite):
         :param action: Action to check.
         :return: Possibility of :code:`action`  
         """
-
-        if action == Action.DO_NOTHING:
-            # robot with high battery can't stand in the blue cell
-            if self.pos.color == 'b' and self.battery >= MAXIMUM_ROBOT_BATTERY - 1:
-                return False
-            # robot without mail can't stand in the yellow cell
-            if self.pos.color == 'y' and not self.mail:
-                return False
-            # robot with mail can't stand in the green cell
-            if self.pos.color == 'gr' and self.mail:
-                return False
-            # robot with high battery can't stand waiting for charging
-            if any([cell.color == 'b' for cell in self.pos.neighbors]) and self.battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot, stucked between two yellow cells in the edge of the board, can't stand
-            if sum([int(cell.color == 'y' or cell.color == 'r') for cell in self.pos.neighbors]) == 2:
-                return False
-            # robot can't stand constantly
-            if self.pos.color != 'b' and self.stand_times >= 5:
-                return False
-        
-        if action == Action.GO_AHEAD:
-            # robot can't move if battery is exhausted
-            if not self.battery:
-                return False
-            # if robot is charging, it can't move until battery is nearly full
-            if self.pos.color == 'b' and self.battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot can't move if next cell is none
-            if not self.pos.front:
-                return False
-            # robot can't move if next cell is red
-            if self.pos.front.color == 'r':
-                return False
-            # robot can't move if next cell is not empty
-            if self.pos.front.robot:
-                return False
-            # robot can't move to yellow cell if it don't carry a mail or carried mail not match with cell target
-            if self.pos.front.color == 'y':
-                if not self.mail:
-                    return False
-                if self.pos.front.target != self.mail.mail_number:
-                    return False
-            # robot can't move to green cell if it already has carried a mail
-            if self.pos.front.color == 'gr' and self.mail:
-                return False
-            # robot with high battery can't move to blue cell
-            if self.pos.front.color == 'b' and self.battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            if self.pos.color != 'y' and sum([int(cell.color == 'y' or cell.color == 'r') for cell in self.pos.front.neighbors]) == 2:
-                if not self.mail:
-                    return False
-                if self.mail.mail_number not in [cell.target for cell in self.pos.front.neighbors]:
-                    return False
-
-
-        if action == Action.GO_BACK:
-            # robot can't move if battery is exhausted
-            if not self.battery:
-                return False
-            # if robot is charging, it can't move until battery is nearly full
-            if self.pos.color == 'b' and self.battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot can't move if next cell is none
-            if not self.pos.back:
-                return False
-            # robot can't move if next cell is red
-            if self.pos.back.color == 'r':
-                return False
-            # robot can't move if next cell is not empty
-            if self.pos.back.robot:
-                return False
-            # robot can't move to yellow cell if it don't carry a mail or carried mail not match with cell target
-            if self.pos.back.color == 'y':
-                if not self.mail:
-                    return False
-                if self.pos.back.target != self.mail.mail_number:
-                    return False
-            # robot can't move to green cell if it already has carried a mail
-            if self.pos.back.color == 'gr' and self.mail:
-                return False
-            # robot with high battery can't move to blue cell
-            if self.pos.back.color == 'b' and self.battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot avoid go to corner if don't need drop off mail
-            if self.pos.color != 'y' and sum([int(cell.color == 'y' or cell.color == 'r') for cell in self.pos.back.neighbors]) == 2:
-                if not self.mail:
-                    return False
-                if self.mail.mail_number not in [cell.target for cell in self.pos.back.neighbors]:
-                    return False
-
-        if action == Action.TURN_LEFT:
-            # robot can't move if battery is exhausted
-            if not self.battery:
-                return False
-            # if robot is charging, it can't move until battery is nearly full
-            if self.pos.color == 'b' and self.battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot can't move if next cell is none
-            if not self.pos.left:
-                return False
-            # robot can't move if next cell is red
-            if self.pos.left.color == 'r':
-                return False
-            # robot can't move if next cell is not empty
-            if self.pos.left.robot:
-                return False
-            # robot can't move to yellow cell if it don't carry a mail or carried mail not match with cell target
-            if self.pos.left.color == 'y':
-                if not self.mail:
-                    return False
-                if self.pos.left.target != self.mail.mail_number:
-                    return False
-            # robot can't move to green cell if it already has carried a mail
-            if self.pos.left.color == 'gr' and self.mail:
-                return False
-            # robot with high battery can't move to blue cell
-            if self.pos.left.color == 'b' and self.battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            if self.pos.color != 'y' and sum([int(cell.color == 'y' or cell.color == 'r') for cell in self.pos.left.neighbors]) == 2:
-                if not self.mail:
-                    return False
-                if self.mail.mail_number not in [cell.target for cell in self.pos.left.neighbors]:
-                    return False
-                               
-        if action == Action.TURN_RIGHT:
-            # robot can't move if battery is exhausted
-            if not self.battery:
-                return False
-            # if robot is charging, it can't move until battery is nearly full
-            if self.pos.color == 'b' and self.battery < PERCENT_BATTERY_TO_LEAVE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            # robot can't move if next cell is none
-            if not self.pos.right:
-                return False
-            # robot can't move if next cell is red
-            if self.pos.right.color == 'r':
-                return False
-            # robot can't move if next cell is not empty
-            if self.pos.right.robot:
-                return False
-            # robot can't move to yellow cell if it don't carry a mail or carried mail not match with cell target
-            if self.pos.right.color == 'y':
-                if not self.mail:
-                    return False
-                if self.pos.right.target != self.mail.mail_number:
-                    return False
-            # robot can't move to green cell if it already has carried a mail
-            if self.pos.right.color == 'gr' and self.mail:
-                return False
-            # robot with high battery can't move to blue cell
-            if self.pos.right.color == 'b' and self.battery > PERCENT_BATTERY_TO_CHARGE*MAXIMUM_ROBOT_BATTERY:
-                return False
-            if self.pos.color != 'y' and sum([int(cell.color == 'y' or cell.color == 'r') for cell in self.pos.right.neighbors]) == 2:
-                if not self.mail:
-                    return False
-                if self.mail.mail_number not in [cell.target for cell in self.pos.right.neighbors]:
-                    return False 
-        return True
+        return bool(self.legal_actions >> action & 1)
     
     @property
     def mask(self) -> np.ndarray:
         """
         Action mask for legal actions.
         """
-        return np.array([self.is_legal_move(action) for action in Action], dtype=np.uint8)
-    
-class Mail(pygame.sprite.Sprite):
-    """
-    A object representing a mail.
-
-    :param mail_number: The number of the mail.
-    :param pos: Current location of the mail.
-    :param render_mode: The render mode. It can be None or :code:`'human'`.
-    """
-
-    def __init__(self, mail_number: int, pos: Cell, render_mode=None) -> None:
-        super().__init__()
-        self.mail_number = mail_number
-        if render_mode == 'human':
-            parent_dir = os.path.dirname(os.path.dirname(__file__))
-            self.image = pygame.transform.scale(
-                pygame.image.load(os.path.join(parent_dir, 'assets', 'images','mail.png')), CELL_SIZE)
-            mail_number_images = pygame.font.SysFont(None, 16).render(
-                str(self.mail_number), True, (255, 0, 0))
-            self.image.blit(mail_number_images,
-                            (0.5 * CELL_SIZE[0], 0.2 * CELL_SIZE[1]))
-            self.rect = self.image.get_rect()
-            self.rect.topleft = ((pos.x + 1) * CELL_SIZE[0],
-                                 (pos.y + 1) * CELL_SIZE[1])
+        return ACTION_MASKS[self.legal_actions].copy()
     
 class Clock:
     """
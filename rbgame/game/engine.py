@@ -0,0 +1,300 @@
+from __future__ import annotations
+import math
+import random
+import logging as log
+
+import numpy as np
+
+from rbgame.game import components
+from rbgame.game.consts import *
+from rbgame.game.topology import NO_NEIGHBOR
+
+# integer codes of cell colors in array representation of the board
+COLOR_CODES = {
+    'w': 0,
+    'r': 1,
+    'b': 2,
+    'gr': 3,
+    'y': 4,
+    'g': 5,
+}
+WHITE, RED, BLUE, GREEN, YELLOW, GRAY = (COLOR_CODES[c] for c in ['w', 'r', 'b', 'gr', 'y', 'g'])
+# no robot in the cell or no neighbor in the direction
+EMPTY = NO_NEIGHBOR
+# name of directions in the order of moving actions
+DIRECTIONS = {
+    components.Action.GO_AHEAD: 'up',
+    components.Action.GO_BACK: 'down',
+    components.Action.TURN_LEFT: 'left',
+    components.Action.TURN_RIGHT: 'right',
+}
+
+class BoardArrays:
+    """
+    Static arrays compiled from a :py:class:`Board <rbgame.game.components.Board>`. 
+    Cells are indexed by flat index :math:`y \\cdot size + x`.
+
+    :param board: The board to compile.
+    """
+
+    def __init__(self, board: components.Board) -> None:
+        topology = board.topology
+        self.size = topology.size
+        self.num_cells = topology.num_cells
+        self.cell_colors = np.array([COLOR_CODES[color] for color in topology.colors], dtype=np.int8)
+        self.cell_targets = np.array(topology.targets, dtype=np.int8)
+        self.colors = self.cell_colors.reshape(self.size, self.size)
+        self.targets = self.cell_targets.reshape(self.size, self.size)
+        self.cell_xs = np.array(topology.xs)
+        self.cell_ys = np.array(topology.ys)
+        # normalized coordinates of cells, the first two features of robot observation
+        self.cell_coordinates = np.stack([self.cell_xs/8, self.cell_ys/8], axis=1).astype(np.float32)
+        # neighbors in order front, back, left, right, the same as order of moving actions
+        self.neighbors = topology.neighbors
+        self.neighbor_lists = topology.neighbor_lists
+
+        self.white_cells = np.array(topology.cells('w'), dtype=np.int64)
+        self.green_cells = np.array(topology.cells('gr'), dtype=np.int64)
+        self.blue_cells = np.array(topology.cells('b'), dtype=np.int64)
+
+        # see Board.action_table
+        self.action_table = board.action_table
+        self.battery_buckets = np.array(components.BATTERY_BUCKETS)
+
+class ArrayEngine:
+    """
+    State of the game, stored in numpy arrays instead of graph of :py:class:`Cell <rbgame.game.components.Cell>`.
+    Board cells are indexed by flat index :math:`y \\cdot size + x`, robots are indexed by their order in game.
+    Game rules are the same as in :py:class:`Robot <rbgame.game.components.Robot>`.
+
+    :param board: The board to compile static color and target grids from.
+    :param robot_colors: Color of each robot.
+    :param robot_indices: Index of each robot in its player.
+    :param clock: The game clock. For each step of the robot, time increases by :math:`\\Delta t`.
+    :param with_battery: Battery is considered or not.
+    :param log_to_file: Log game process to file or not.
+    :param rng: Random generator of the game. Default to a new unseeded generator.
+    """
+
+    def __init__(
+        self,
+        board: components.Board,
+        robot_colors: list[str],
+        robot_indices: list[int],
+        clock: components.Clock,
+        with_battery: bool = True,
+        log_to_file: bool = False,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.board = BoardArrays(board)
+        self.num_robots = len(robot_colors)
+        self.robot_colors = robot_colors
+        self.robot_indices = robot_indices
+        self.clock = clock
+        self.with_battery = with_battery
+        self.log = log_to_file
+        self.rng = rng if rng is not None else random.Random()
+
+        # dynamic grids
+        self.occupancy = np.full(self.board.num_cells, EMPTY, dtype=np.int16)
+        self.cell_mails = np.zeros(self.board.num_cells, dtype=np.int8)
+
+        # per robot vectors
+        self.positions = np.zeros(self.num_robots, dtype=np.int16)
+        self.mails = np.zeros(self.num_robots, dtype=np.int8)
+        self.batteries = np.full(self.num_robots, MAXIMUM_ROBOT_BATTERY, dtype=np.float64)
+        self.stand_times = np.zeros(self.num_robots, dtype=np.int16)
+        self.count_mails = np.zeros(self.num_robots, dtype=np.int16)
+
+        # order of robots in observation of each robot, robot itself is in the first place
+        self.__orders = [
+            np.array([robot] + [r for r in range(self.num_robots) if r != robot])
+            for robot in range(self.num_robots)
+        ]
+
+    def battery(self, robot: int) -> int:
+        """
+        :param robot: Index of the robot.
+        :return: Battery of the robot, the same as :py:attr:`Robot.battery <rbgame.game.components.Robot.battery>`.
+        """
+        return math.ceil(self.batteries.item(robot))
+
+    def position(self, robot: int) -> tuple[int, int]:
+        """
+        :param robot: Index of the robot.
+        :return: Coordinate :math:`(x, y)` of the robot.
+        """
+        cell = int(self.positions[robot])
+        return cell % self.board.size, cell // self.board.size
+
+    def sum_count_mail(self, color: str) -> int:
+        """
+        :param color: Color of player.
+        :return: Sum collected mails of one player.
+        """
+        return int(sum(count for c, count in zip(self.robot_colors, self.count_mails) if c == color))
+
+    def reset(self) -> None:
+        """
+        Reset to empty board, place robots to random white cells and generate mails in green cells.
+        Random generator is called in the same order as in :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`
+        with object backend, so with the same seed both backends start from the same state.
+        """
+        self.occupancy.fill(EMPTY)
+        self.cell_mails.fill(0)
+        self.positions[:] = self.rng.sample(list(self.board.white_cells), k=self.num_robots)
+        self.occupancy[self.positions] = np.arange(self.num_robots)
+        self.mails.fill(0)
+        self.count_mails.fill(0)
+        if self.with_battery:
+            self.batteries.fill(MAXIMUM_ROBOT_BATTERY)
+        for green_cell in self.board.green_cells:
+            self.generate_mail(green_cell)
+
+    def generate_mail(self, cell: int) -> None:
+        """
+        Generate a new mail in :code:`cell`.
+
+        :param cell: Flat index of the cell.
+        """
+        self.cell_mails[cell] = self.rng.choice(range(1, 10))
+
+    def charge(self, robot: int) -> None:
+        """
+        Charge.
+
+        :param robot: Index of the robot.
+        """
+        if self.with_battery:
+            self.batteries[robot] = min(self.batteries[robot] + BATTERY_UP_PER_CHARGE, MAXIMUM_ROBOT_BATTERY)
+
+    def charge_waiting(self, acting_robot: int) -> list[int]:
+        """
+        Charge robots in blue cells, except :code:`acting_robot`.
+
+        :param acting_robot: Index of the robot that has moved.
+        :return: Indices of charged robots.
+        """
+        charged_robots = []
+        for blue_cell in self.board.blue_cells:
+            robot = self.occupancy.item(blue_cell)
+            if robot != EMPTY and robot != acting_robot:
+                self.charge(robot)
+                charged_robots.append(robot)
+        return charged_robots
+
+    def legal_actions(self, robot: int) -> int:
+        """
+        :param robot: Index of the robot.
+        :return: Bits of legal actions, looked up in :py:attr:`action table <rbgame.game.components.Board.action_table>`.
+        """
+        pos = self.positions.item(robot)
+        occupied = 0
+        for direction, next_pos in enumerate(self.board.neighbor_lists[pos]):
+            if next_pos != EMPTY and self.occupancy.item(next_pos) != EMPTY:
+                occupied |= 1 << direction
+        return self.board.action_table.item(
+            pos,
+            self.mails.item(robot),
+            components.BATTERY_BUCKETS[self.battery(robot)],
+            int(self.stand_times.item(robot) >= 5),
+            occupied,
+        )
+
+    def is_legal_move(self, robot: int, action: int) -> bool:
+        """
+        Check if action is legal.
+
+        :param robot: Index of the robot.
+        :param action: Action to check.
+        :return: Possibility of :code:`action`.
+        """
+        return bool(self.legal_actions(robot) >> action & 1)
+
+    def mask(self, robot: int) -> np.ndarray:
+        """
+        :param robot: Index of the robot.
+        :return: Action mask for legal actions.
+        """
+        return components.ACTION_MASKS[self.legal_actions(robot)].copy()
+
+    def observations(self, robots: list[int]|np.ndarray|None = None) -> np.ndarray:
+        """
+        :param robots: Indices of robots. Default to all robots.
+        :return: Matrix, each row of it is :py:attr:`observation <rbgame.game.components.Robot.observation>` of one robot.
+        """
+        if robots is None:
+            robots = slice(None)
+        positions = self.positions[robots]
+        robot_states = np.empty((positions.size, 4 if self.with_battery else 3), dtype=np.float32)
+        robot_states[:, :2] = self.board.cell_coordinates[positions]
+        robot_states[:, 2] = self.mails[robots]/9
+        if self.with_battery:
+            robot_states[:, 3] = np.ceil(self.batteries[robots])/10
+        return robot_states
+
+    def observe(self, robot: int) -> np.ndarray:
+        """
+        :param robot: Index of the robot.
+        :return: Observations of all robots concatenated, with observation of :code:`robot` in the first place.
+        """
+        return self.observations()[self.__orders[robot]].reshape(-1)
+
+    def step(self, robot: int, action: int) -> tuple[bool, float]:
+        """
+        Do robot move base on :code:`action`.
+
+        :param robot: Index of the robot.
+        :param action: Action to execute.
+        :return: Two value. First, have some movements or not. Second, the reward.
+        """
+        if not self.is_legal_move(robot, action):
+            # if all actions are not legal, skip robot's turn
+            return False, DEFAULT_REWARD
+
+        pos = self.positions.item(robot)
+        if action == components.Action.DO_NOTHING:
+            self.stand_times[robot] += 1
+            if self.board.cell_colors.item(pos) == BLUE:
+                self.charge(robot)
+                return False, 0
+            return False, DEFAULT_REWARD
+
+        reward = DEFAULT_REWARD
+        self.stand_times[robot] = 0
+        self.occupancy[pos] = EMPTY
+        if self.board.cell_colors.item(pos) == GREEN:
+            self.generate_mail(pos)
+        pos = self.board.neighbors.item(pos, action - 1)
+        self.positions[robot] = pos
+        self.occupancy[pos] = robot
+        if self.with_battery:
+            battery = self.batteries.item(robot)
+            battery -= BATTERY_PER_STEP if battery > 2 else BATTERY_PER_STEP/2
+            self.batteries[robot] = max(battery, 0)
+        if self.log:
+            x, y = self.position(robot)
+            log.info(
+                f'At t={self.clock.now:04} {COLOR2STR[self.robot_colors[robot]]:>5} robot {self.robot_indices[robot]} go {DIRECTIONS[action]} to position ({x},{y})'
+            )
+        color = self.board.cell_colors.item(pos)
+        if color == GREEN:
+            self.mails[robot] = self.cell_mails[pos]
+            if self.log:
+                log.info(
+                    f'At t={self.clock.now:04} {COLOR2STR[self.robot_colors[robot]]:>5} robot {self.robot_indices[robot]} pick up mail {self.mails[robot]}'
+                )
+            reward = REWARD_FOR_PICK_UP_MAIL
+        elif color == YELLOW:
+            deliveried_mail = self.mails[robot]
+            self.mails[robot] = 0
+            self.count_mails[robot] += 1
+            if self.log:
+                log.info(
+                    f'At t={self.clock.now:04} {COLOR2STR[self.robot_colors[robot]]:>5} robot {self.robot_indices[robot]} drop off mail {deliveried_mail}'
+                )
+            reward = REWARD_FOR_DROP_OFF_MAIL
+        elif color == BLUE:
+            reward = REWARD_FOR_REACHING_BLUE
+        self.clock.up()
+        return True, reward
@@ -1,19 +1,43 @@
 import random
 import os
 import logging as log
-from typing import Any
+from typing import Any, NamedTuple
 
-import pygame
 import numpy as np
 import pettingzoo
 import gymnasium
 from gymnasium import spaces
 from pettingzoo import utils
 
-from rbgame.game import components
+from rbgame.game import components, engine
 from rbgame.game.consts import *
 from rbgame.agent.base_agent import BaseAgent
-pygame.init()
+
+class GameState(NamedTuple):
+    """
+    Compact snapshot of :py:class:`RoboticBoardGame`, see :py:meth:`RoboticBoardGame.get_state`.
+    Robots are in order of :py:attr:`RoboticBoardGame.possible_agents`, cells are indexed by flat index :math:`y \\cdot size + x`.
+    """
+    #: Cell of each robot.
+    positions: np.ndarray
+    #: Carried mail of each robot, 0 if robot doesn't carry mail.
+    mails: np.ndarray
+    #: Inner battery of each robot.
+    batteries: np.ndarray
+    #: How many times each robot has stood constantly.
+    stand_times: np.ndarray
+    #: Number of deliveried mails by each robot.
+    count_mails: np.ndarray
+    #: Mail in each green cell, in order of :py:attr:`Board.green_cells <rbgame.game.components.Board.green_cells>`.
+    green_mails: np.ndarray
+    #: Index of the acting agent.
+    agent_index: int
+    steps_to_change_turn: int
+    num_steps: int
+    clock: float
+    winner: str | None
+    #: State of random generator.
+    rng_state: Any
 
 class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
 
@@ -29,7 +53,25 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
     :param random_num_steps: Robot can move random number of steps each turn or not.
     :param max_step: Maximum enviroment step.
     :param render_mode: The render mode. It can be :py:data:`None` or :code:`'human'`.
+                        Pygame is imported and initialized only in :code:`'human'` mode, 
+                        otherwise robots are lightweight :py:class:`Robot <rbgame.game.components.Robot>` records 
+                        and no sprites are created.
     :param log_to_file: Log game process to file or not.
+    :param array_backend: Store game state in numpy arrays of :py:class:`ArrayEngine <rbgame.game.engine.ArrayEngine>` 
+                          instead of :py:class:`Robot <rbgame.game.components.Robot>` objects. Game rules are the same,
+                          but rendering isn't supported.
+    :param zero_copy_obs: :py:meth:`observe` returns read-only views into observation buffer of enviroment 
+                          instead of copies. These views are updated in place by next steps, so copy them 
+                          if you need to keep them.
+    :param stalemate_window: Game is a stalemate, if no mail is picked up or deliveried during this number of steps.
+                             Default to :py:data:`None`, which means no window.
+    :param max_state_repeats: Game is a stalemate, if a state of the board recurs more than this number of times 
+                              since the last pick up or delivery. State is hashed from positions, mails and batteries 
+                              of robots, whether they have stood long, mails in green cells and the acting agent.
+                              Default to :py:data:`None`, which means states aren't tracked.
+    :param stalemate_policy: What happens to a stalemate. It can be :code:`'truncate'` - game ends with truncation as if 
+                             it reached :code:`max_step`, :code:`'terminate'` - game ends with termination without winner,
+                             or :code:`'flag'` - game goes on, only :py:attr:`stalemate` is set.
     """
 
     metadata = {"render_modes": ["human"], "name": "robotic_board_game", "is_parallelizable": False, "render_fps": 20}
@@ -46,12 +88,26 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         max_step: int = 500,
         render_mode: str|None = None,
         log_to_file: bool = False,
+        array_backend: bool = False,
+        zero_copy_obs: bool = False,
+        stalemate_window: int|None = None,
+        max_state_repeats: int|None = None,
+        stalemate_policy: str = 'truncate',
     ) -> None:
         super().__init__()
         assert len(robot_colors) >= 2 
+        assert stalemate_policy in ('truncate', 'terminate', 'flag'), f"{stalemate_policy} is not a valid stalemate policy"
+        assert not array_backend or render_mode is None, 'Array backend does not support rendering'
         self.game_clock = components.Clock()
-        self.robot_sprites: pygame.sprite.Group = pygame.sprite.Group()
-        self.mail_sprites: pygame.sprite.Group = pygame.sprite.Group()
+        # sprite groups exist only in human render mode
+        self.robot_sprites = None
+        self.mail_sprites = None
+        if render_mode == 'human':
+            import pygame
+            from rbgame.game import sprites
+            pygame.init()
+            self.robot_sprites: pygame.sprite.Group = pygame.sprite.Group()
+            self.mail_sprites: pygame.sprite.Group = pygame.sprite.Group()
 
         self.board = components.Board(colors_map=colors_map, targets_map=targets_map)
         self.required_mail = required_mail
@@ -61,36 +117,67 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.num_robots = num_robots_per_player * len(robot_colors)
         self.__with_battery = with_battery
         self.random_num_steps = random_num_steps
-        self.steps_to_change_turn = random.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
-
-        robot_cells_init = random.sample(self.board.white_cells,
-                                         k=self.num_robots)
-        robots: list[components.Robot] = [
-                components.Robot(
-                    robot_cells_init[num_robots_per_player * j + i],
-                    i + 1, 
-                    robot_color, 
-                    self.mail_sprites, 
-                    self.game_clock, 
-                    with_battery=self.__with_battery, 
-                    render_mode=render_mode, 
-                    log_to_file=log_to_file
-                )
-            for j, robot_color in enumerate(robot_colors)
-            for i in range(num_robots_per_player)
-        ]
-        self.robots: dict[str, components.Robot] = {robot.color + str(robot.index):robot for robot in robots}
-
-        # generate new mail in green cells
-        for green_cell in self.board.green_cells:
-            green_cell.generate_mail(self.mail_sprites, render_mode)
+        # random generator of this enviroment, it is reseeded in place, so robots and cells can keep reference to it
+        self.rng = random.Random()
+        self.steps_to_change_turn = self.rng.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
+
+        self.engine: engine.ArrayEngine | None = None
+        if array_backend:
+            self.engine = engine.ArrayEngine(
+                self.board,
+                [robot_color for robot_color in robot_colors for _ in range(num_robots_per_player)],
+                [i + 1 for _ in robot_colors for i in range(num_robots_per_player)],
+                self.game_clock,
+                with_battery=self.__with_battery,
+                log_to_file=log_to_file,
+                rng=self.rng,
+            )
+            self.engine.reset()
+            self.robots: dict[str, components.Robot] = {}
+            robot_names = [robot_color + str(i + 1) for robot_color in robot_colors for i in range(num_robots_per_player)]
+        else:
+            robot_cells_init = self.rng.sample(self.board.white_cells,
+                                               k=self.num_robots)
+            robots: list[components.Robot] = [
+                    sprites.RobotSprite(
+                        robot_cells_init[num_robots_per_player * j + i],
+                        i + 1, 
+                        robot_color, 
+                        self.mail_sprites, 
+                        self.game_clock, 
+                        with_battery=self.__with_battery, 
+                        log_to_file=log_to_file,
+                        rng=self.rng,
+                    ) if render_mode == 'human' else
+                    components.Robot(
+                        robot_cells_init[num_robots_per_player * j + i],
+                        i + 1, 
+                        robot_color, 
+                        self.game_clock, 
+                        with_battery=self.__with_battery, 
+                        log_to_file=log_to_file,
+                        rng=self.rng,
+                    )
+                for j, robot_color in enumerate(robot_colors)
+                for i in range(num_robots_per_player)
+            ]
+            self.robots: dict[str, components.Robot] = {robot.color + str(robot.index):robot for robot in robots}
+
+            # generate new mail in green cells
+            self.__generate_mails()
+
+            if render_mode == 'human':
+                # add all robots to sprites group
+                self.robot_sprites.add([robot for robot in self.robots.values()])
+            robot_names = list(self.robots.keys())
 
-        # add all robots to sprites group
-        self.robot_sprites.add([robot for robot in self.robots.values()])
-        
         # TODO: separate player and robot index in tuple for centralized training
-        self.agents = [robot_name for robot_name in self.robots.keys()]
+        self.agents = robot_names
         self.possible_agents = self.agents[:]
+        self.__agent_indices = {agent: i for i, agent in enumerate(self.possible_agents)}
+
+        self.zero_copy_obs = zero_copy_obs
+        self.__allocate_observations()
 
         self.action_spaces: dict[str, spaces.Discrete] = {a: spaces.Discrete(5) for a in self.agents}
         robot_obs_size = 4 if self.__with_battery else 3
@@ -120,6 +207,13 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.num_steps = 0
         self.winner = None
 
+        self.stalemate_window = stalemate_window
+        self.max_state_repeats = max_state_repeats
+        self.stalemate_policy = stalemate_policy
+        #: Game has been detected as a stalemate or not.
+        self.stalemate = False
+        self.__reset_stalemate_detection()
+
         assert render_mode is None or render_mode in self.metadata["render_modes"]
         self.render_mode = render_mode
         self.log = log_to_file
@@ -132,7 +226,7 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
             # draw board
             for i in range(self.board.size):
                 for j in range(self.board.size):
-                    self.board[i, j].draw(self.background)
+                    sprites.draw_cell(self.board[i, j], self.background)
             # draw axes
             images_for_cell_coordinate = [
             pygame.font.SysFont(None, 48).render(str(i), True, (0, 0, 0))
@@ -197,6 +291,9 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.__with_battery = with_battery
         for robot in self.robots.values():
             robot.with_battery = self.__with_battery
+        if self.engine is not None:
+            self.engine.with_battery = self.__with_battery
+        self.__allocate_observations()
         robot_obs_size = 4 if self.__with_battery else 3
         self.observation_spaces: dict[str, spaces.Dict]= {
             a: spaces.Dict(
@@ -218,7 +315,88 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         :param color: Color of player.
         :return: Sum collected mails of one player.
         """
+        if self.engine is not None:
+            return self.engine.sum_count_mail(color)
         return sum([robot.count_mail for robot in self.robots.values() if robot.color == color])
+
+    def __progress(self) -> int:
+        # it increases by one with every pick up and every delivery
+        if self.engine is not None:
+            return 2*int(self.engine.count_mails.sum()) + int(np.count_nonzero(self.engine.mails))
+        return sum([2*robot.count_mail + (robot.mail != 0) for robot in self.robots.values()])
+
+    def __state_hash(self) -> int:
+        if self.engine is not None:
+            robots = (self.engine.positions.tobytes(), self.engine.mails.tobytes(), self.engine.batteries.tobytes(),
+                      (self.engine.stand_times >= 5).tobytes())
+            green_mails = self.engine.cell_mails[self.engine.board.green_cells].tobytes()
+        else:
+            robots = tuple((id(robot.pos), robot.mail, robot.inner_battery, robot.stand_times >= 5) for robot in self.robots.values())
+            green_mails = tuple(green_cell.mail for green_cell in self.board.green_cells)
+        return hash((robots, green_mails, self.agent_selection, self.steps_to_change_turn))
+
+    def __reset_stalemate_detection(self) -> None:
+        self.stalemate = False
+        self.__last_progress = self.__progress()
+        self.__last_progress_step = self.num_steps
+        # how many times each state has occurred since the last progress
+        self.__state_counts: dict[int, int] = {}
+
+    def __is_stalemate(self) -> bool:
+        """
+        Update detection after a step.
+
+        :return: Game is a stalemate or not.
+        """
+        progress = self.__progress()
+        if progress != self.__last_progress:
+            # states before progress can't recur
+            self.__last_progress = progress
+            self.__last_progress_step = self.num_steps
+            self.__state_counts.clear()
+            return False
+        if self.stalemate_window is not None and self.num_steps - self.__last_progress_step >= self.stalemate_window:
+            return True
+        if self.max_state_repeats is not None:
+            state_hash = self.__state_hash()
+            count = self.__state_counts.get(state_hash, 0) + 1
+            self.__state_counts[state_hash] = count
+            return count > self.max_state_repeats + 1
+        return False
+
+    def __generate_mails(self) -> None:
+        # generate new mail in all green cells, mails of previous game are thrown away
+        if self.mail_sprites is not None:
+            from rbgame.game import sprites
+            self.mail_sprites.empty()
+        for green_cell in self.board.green_cells:
+            green_cell.generate_mail(self.rng)
+            if self.mail_sprites is not None:
+                self.mail_sprites.add(sprites.MailSprite(green_cell.mail, green_cell))
+
+    def __allocate_observations(self) -> None:
+        # robot_states[i] is observation matrix of agent i, where row j is observation of robot slots[i][j]
+        # robot i is placed in the first row, other robots are in their order
+        robot_obs_size = 4 if self.__with_battery else 3
+        self.__robot_states = np.zeros((self.num_robots, self.num_robots, robot_obs_size), dtype=np.float32)
+        # slots[i, j] is row of robot j in observation matrix of agent i
+        self.__slots = np.array([
+            [0 if j == i else j + 1 if j < i else j for j in range(self.num_robots)]
+            for i in range(self.num_robots)
+        ])
+        self.__observations = [robot_states.reshape(-1) for robot_states in self.__robot_states]
+        if self.zero_copy_obs:
+            for observation in self.__observations:
+                observation.flags.writeable = False
+        self.__update_observations(list(range(self.num_robots)))
+
+    def __update_observations(self, robots: list[int]) -> None:
+        # write observations of robots, whose states have changed, to observation matrices of all agents
+        if self.engine is not None:
+            robot_states = self.engine.observations(robots)
+        else:
+            robot_states = np.array([self.robots[self.possible_agents[robot]].observation for robot in robots])
+        self.__robot_states[np.arange(self.num_robots)[:, None], self.__slots[:, robots]] = robot_states
     
     def observe(self, agent: str) -> dict[str, np.ndarray]:
         """
@@ -232,10 +410,15 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
                  of the vector represents whether the action is legal or not.
 
         """
-        robot_states = np.hstack([self.robots[a].observation for a in self.agents if a != agent])
-        robot_states = np.hstack([self.robots[agent].observation, robot_states])
-
-        mask = self.robots[agent].mask
+        robot = self.__agent_indices[agent]
+        robot_states = self.__observations[robot]
+        if self.engine is not None:
+            mask = components.ACTION_MASKS[self.engine.legal_actions(robot)]
+        else:
+            mask = components.ACTION_MASKS[self.robots[agent].legal_actions]
+        if not self.zero_copy_obs:
+            robot_states = robot_states.copy()
+            mask = mask.copy()
         
         return {'observation': robot_states, 'action_mask': mask}
             
@@ -257,12 +440,12 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         """
         Reset enviroment.
 
-        :param seed: Random module seed. If it isn't :py:data:`None`, reset 
-                     enviroment to same initial state every time.
+        :param seed: Seed of random generator of this enviroment. If it isn't :py:data:`None`, reset 
+                     enviroment to same initial state every time. Other enviroments aren't affected.
         :param option: Unused.
         :return: Observation of current agent and some infomations.
         """
-        random.seed(seed)
+        self.rng.seed(seed)
         self.agents = self.possible_agents[:]
         self.rewards = {agent: 0 for agent in self.agents}
         self._cumulative_rewards = {agent: 0 for agent in self.agents}
@@ -271,23 +454,26 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.infos = {agent: {} for agent in self.agents}
 
         self.game_clock.reset()
-        self.board.reset()
-        
-        robot_cells_init = random.sample(self.board.white_cells,
-                                         k=self.num_robots)
-        for i, robot in enumerate(self.robots.values()):
-            robot.reset(robot_cells_init[i])
+        if self.engine is not None:
+            self.engine.reset()
+        else:
+            self.board.reset()
+            
+            robot_cells_init = self.rng.sample(self.board.white_cells,
+                                               k=self.num_robots)
+            for i, robot in enumerate(self.robots.values()):
+                robot.reset(robot_cells_init[i])
 
-        self.mail_sprites.empty()
-        for green_cell in self.board.green_cells:
-            green_cell.generate_mail(self.mail_sprites, self.render_mode)
+            self.__generate_mails()
             
-        self.steps_to_change_turn = random.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
+        self.steps_to_change_turn = self.rng.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
         self._agent_selector.reinit(self.agents)
         self.agent_selection = self._agent_selector.reset()
 
         self.num_steps = 0
         self.winner = None
+        self.__reset_stalemate_detection()
+        self.__update_observations(list(range(self.num_robots)))
 
         if self.render_mode == "human":
             self.render()
@@ -302,6 +488,9 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         :return: Next observation of acting agent, the reward, termination, truncation and infomations.
                  Flag termination - enviroment has finished?, 
                  flag truncation - enviroment reaches maximum step and has finished?
+                 Besides :code:`'transition_belongs_agent'`, infomations contain what :py:meth:`last` would return after the step,
+                 so caller doesn't need to call it: :code:`'next_agent'` - index of current agent,
+                 :code:`'next_obs'` - its observation and :code:`'next_done'` - game has finished or not.
         """
         if (
             self.terminations[self.agent_selection]
@@ -313,34 +502,57 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.rewards = {agent: 0 for agent in self.agents}
 
         # #r(s, a, s') and s'(s, a)
-        acting_robot = self.robots[self.agent_selection]
-        is_moved, reward = acting_robot.step(action)
+        acting_index = self.__agent_indices[self.agent_selection]
+        if self.engine is not None:
+            acting_robot = None
+            acting_color = self.engine.robot_colors[acting_index]
+            is_moved, reward = self.engine.step(acting_index, action)
+        else:
+            acting_robot = self.robots[self.agent_selection]
+            acting_color = acting_robot.color
+            is_moved, reward = acting_robot.step(action)
         self.rewards[self.agent_selection] = reward
         self._accumulate_rewards()
+        # only acting robot and charged robots change their states
+        changed_robots = [acting_index]
         # if robot has moved, charge robots in blue cells
         # don't charge acting robot, it decides this itself in step method
         if is_moved and self.with_battery:
-            for blue_cell in self.board.blue_cells:
-                if blue_cell.robot and blue_cell.robot is not acting_robot:
-                    blue_cell.robot.charge()
+            if self.engine is not None:
+                changed_robots.extend(self.engine.charge_waiting(acting_index))
+            else:
+                for blue_cell in self.board.blue_cells:
+                    if blue_cell.robot and blue_cell.robot is not acting_robot:
+                        blue_cell.robot.charge()
+                        changed_robots.append(self.__agent_indices[blue_cell.robot.color + str(blue_cell.robot.index)])
+        self.__update_observations(changed_robots)
 
         self.num_steps += 1    
 
-        if self.sum_count_mail(acting_robot.color) == self.required_mail:
+        if self.sum_count_mail(acting_color) == self.required_mail:
             self.terminations = {a: True for a in self.agents}
-            self.winner = acting_robot.color
+            self.winner = acting_color
             if self.log:
                 log.info(f'At t={self.game_clock.now:04} Player {self.winner} win')
 
-        self.truncations = {a: self.num_steps >= self.max_step for a in self.agents}
+        if (self.stalemate_window is not None or self.max_state_repeats is not None) \
+            and self.winner is None and not self.stalemate and self.__is_stalemate():
+            self.stalemate = True
+            if self.log:
+                log.info(f'At t={self.game_clock.now:04} Game is a stalemate')
+            if self.stalemate_policy == 'terminate':
+                self.terminations = {a: True for a in self.agents}
+
+        self.truncations = {a: self.num_steps >= self.max_step or (self.stalemate and self.stalemate_policy == 'truncate') 
+                            for a in self.agents}
         
         if self.render_mode == "human":
             # for smooth movement
             for i in range(1, FRAME_PER_STEP+1):
                 diff = tuple(a-b for a, b in zip(acting_robot.next_rect.topleft, acting_robot.rect.topleft))
                 acting_robot.rect.topleft = tuple(a+i/FRAME_PER_STEP*b for a,b in zip(acting_robot.rect.topleft, diff))
-                if acting_robot.mail:
-                    acting_robot.mail.rect.topleft = acting_robot.rect.topleft
+                if acting_robot.mail_sprite:
+                    acting_robot.mail_sprite.rect.topleft = acting_robot.rect.topleft
                 self.render()
         
         self.steps_to_change_turn -= 1
@@ -348,23 +560,37 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
             self.agent_selection = self._agent_selector.next() 
             if self.render_mode == "human":
                 self.render()
-            self.steps_to_change_turn = random.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
+            self.steps_to_change_turn = self.rng.choice(range(1, MAXIMUM_STEP_PER_TURN)) if self.random_num_steps else 1
             # return previous agent's observation as next observation if game changes turn
             return (
                 self.observe(self.previous_agent),
                 self._cumulative_rewards[self.previous_agent],
                 self.terminations[self.agent_selection],
                 self.truncations[self.agent_selection],
-                {'transition_belongs_agent': self.agents.index(self.previous_agent)},
+                self.__step_info(self.previous_agent),
             )
         # return current agent's observation as next observation if game doesn't changes turn
+        next_obs = self.observe(self.agent_selection)
         return (
-            self.observe(self.agent_selection),
+            next_obs,
             self._cumulative_rewards[self.agent_selection],
             self.terminations[self.agent_selection],
             self.truncations[self.agent_selection],
-            {'transition_belongs_agent': self.agents.index(self.agent_selection)},
+            self.__step_info(self.agent_selection, next_obs),
             )
+
+    def __step_info(self, acting_agent: str, next_obs: dict[str, np.ndarray]|None = None) -> dict[str, Any]:
+        """
+        :param acting_agent: Agent, whose transition it is.
+        :param next_obs: Observation of current agent if it is already observed.
+        :return: Infomations of step.
+        """
+        return {
+            'transition_belongs_agent': self.agents.index(acting_agent),
+            'next_agent': self.agents.index(self.agent_selection),
+            'next_obs': self.observe(self.agent_selection) if next_obs is None else next_obs,
+            'next_done': self.terminations[self.agent_selection] or self.truncations[self.agent_selection],
+        }
     
     @property
     def previous_agent(self):
@@ -376,6 +602,102 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
             return self.agents[-1]
         return self.agents[index-1]
 
+    def get_state(self) -> GameState:
+        """
+        Take a snapshot of game. It is picklable and doesn't depend on rendering or logging settings, 
+        so it can be restored in any enviroment with the same map and robots.
+
+        :return: Current state of the game.
+        """
+        if self.engine is not None:
+            positions = self.engine.positions.copy()
+            mails = self.engine.mails.copy()
+            batteries = self.engine.batteries.copy()
+            stand_times = self.engine.stand_times.copy()
+            count_mails = self.engine.count_mails.copy()
+            green_mails = self.engine.cell_mails[self.engine.board.green_cells]
+        else:
+            robots = self.robots.values()
+            positions = np.array([robot.pos.y*self.board.size + robot.pos.x for robot in robots], dtype=np.int16)
+            mails = np.array([robot.mail for robot in robots], dtype=np.int8)
+            batteries = np.array([robot.inner_battery for robot in robots], dtype=np.float64)
+            stand_times = np.array([robot.stand_times for robot in robots], dtype=np.int16)
+            count_mails = np.array([robot.count_mail for robot in robots], dtype=np.int16)
+            green_mails = np.array([green_cell.mail for green_cell in self.board.green_cells], dtype=np.int8)
+        return GameState(
+            positions, mails, batteries, stand_times, count_mails, green_mails,
+            self.__agent_indices[self.agent_selection],
+            self.steps_to_change_turn,
+            self.num_steps,
+            self.game_clock.now,
+            self.winner,
+            self.rng.getstate(),
+        )
+
+    def set_state(self, state: GameState) -> None:
+        """
+        Restore the game to :code:`state`, which is taken by :py:meth:`get_state`.
+
+        :param state: State to restore.
+        """
+        if self.engine is not None:
+            self.engine.occupancy.fill(engine.EMPTY)
+            self.engine.positions[:] = state.positions
+            self.engine.occupancy[state.positions] = np.arange(self.num_robots)
+            self.engine.mails[:] = state.mails
+            self.engine.batteries[:] = state.batteries
+            self.engine.stand_times[:] = state.stand_times
+            self.engine.count_mails[:] = state.count_mails
+            self.engine.cell_mails[self.engine.board.green_cells] = state.green_mails
+        else:
+            for robot in self.robots.values():
+                robot.pos.robot = None
+            for robot, pos, mail, battery, stand_times, count_mail in zip(
+                self.robots.values(), state.positions.tolist(), state.mails.tolist(), state.batteries.tolist(),
+                state.stand_times.tolist(), state.count_mails.tolist()
+            ):
+                robot.pos = self.board.flat_cells[pos]
+                robot.pos.robot = robot
+                robot.mail = mail
+                robot.inner_battery = battery
+                robot.stand_times = stand_times
+                robot.count_mail = count_mail
+            for green_cell, mail in zip(self.board.green_cells, state.green_mails.tolist()):
+                green_cell.mail = mail
+            if self.render_mode == 'human':
+                self.__sync_sprites()
+
+        self._agent_selector.reinit(self.agents)
+        for _ in range(state.agent_index + 1):
+            self.agent_selection = self._agent_selector.next()
+        self.steps_to_change_turn = state.steps_to_change_turn
+        self.num_steps = state.num_steps
+        self.game_clock.now = state.clock
+        self.winner = state.winner
+        self.rng.setstate(state.rng_state)
+
+        self.rewards = {agent: 0 for agent in self.agents}
+        self._cumulative_rewards = {agent: 0 for agent in self.agents}
+        self.terminations = {agent: self.winner is not None for agent in self.agents}
+        self.truncations = {agent: self.num_steps >= self.max_step for agent in self.agents}
+        # stalemate detection starts over from the restored state
+        self.__reset_stalemate_detection()
+        self.__update_observations(list(range(self.num_robots)))
+
+    def __sync_sprites(self) -> None:
+        # rebuild sprites of mails and move robots to their cells after restoring state
+        from rbgame.game import sprites
+        self.mail_sprites.empty()
+        for green_cell in self.board.green_cells:
+            self.mail_sprites.add(sprites.MailSprite(green_cell.mail, green_cell))
+        for robot in self.robots.values():
+            robot.rect = robot.next_rect
+            robot.mail_sprite = None
+            if robot.mail:
+                robot.mail_sprite = sprites.MailSprite(robot.mail, robot.pos)
+                robot.mail_sprite.pos = None
+                self.mail_sprites.add(robot.mail_sprite)
+
     def render(self) -> None:
         """
         Display all animations to screen. Only works if enviroment render mode is :code:`'human'`.
@@ -392,6 +714,7 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
             )
 
     def _render_gui(self) -> None:
+        import pygame
         if self.screen is None:
             self.screen = pygame.display.set_mode(
             self.background.get_size())
@@ -424,6 +747,7 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         pass
 
     def watch(self) -> None:
+        import pygame
         running = True
         self.render()
         while running :
@@ -442,11 +766,17 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
         self.reset()
         if self.log:
             log.info(f'At t={self.game_clock.now:04} game starts with {self.num_robots_per_player} number robots per player and {len(self.robot_colors)} players')
+            if self.engine is not None:
+                for i, (color, index) in enumerate(zip(self.engine.robot_colors, self.engine.robot_indices)):
+                    x, y = self.engine.position(i)
+                    log.info(f'At t={self.game_clock.now:04} {COLOR2STR[color]:>5} robot {index} in position [{x},{y}]')
             for robot in self.robots.values():
                 log.info(f'At t={self.game_clock.now:04} {COLOR2STR[robot.color]:>5} robot {robot.index} in position [{robot.pos.x},{robot.pos.y}]')
         if any(agent is None for agent in agents) and self.render_mode is None:
             raise ValueError("Person-player can't play without rendering animation")
         agents: dict[str, BaseAgent] = {name: a for name, a in zip(self.agents, agents)}
+        if self.render_mode == 'human':
+            import pygame
         running = True
         while running and not self.terminations[self.agent_selection] and not self.truncations[self.agent_selection]:
             if agents[self.agent_selection] is not None:
@@ -454,6 +784,8 @@ class RoboticBoardGame(gymnasium.Env, pettingzoo.AECEnv):
                 action = agents[self.agent_selection].get_action(obs)  
                 self.step(action)
             # Human behaviors
+            if self.render_mode != 'human':
+                continue
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import os
+
+import pygame
+
+from rbgame.game.components import Cell, Robot, Clock
+from rbgame.game.consts import *
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'images')
+
+def draw_cell(cell: Cell, surface: pygame.Surface) -> None:
+    """
+    Draw a cell in a surface.
+
+    :param cell: Cell to draw.
+    :param surface: Surface to draw the cell in.
+    """
+    # draw rectangle of the cell
+    pygame.draw.rect(
+        surface, MAP_COLORS[cell.color],
+        ((cell.x + 1) * CELL_SIZE[0],
+         (cell.y + 1) * CELL_SIZE[1], CELL_SIZE[0], CELL_SIZE[1]))
+    # draw border
+    pygame.draw.rect(
+        surface, (0, 0, 0),
+        ((cell.x + 1) * CELL_SIZE[0],
+         (cell.y + 1) * CELL_SIZE[1], CELL_SIZE[0], CELL_SIZE[1]), 1)
+    # draw target number if it isn't 0
+    if cell.target:
+        target_font = pygame.font.SysFont(None, 64)
+        target_image = target_font.render(str(cell.target), True,
+                                           (0, 0, 0))
+        surface.blit(target_image,
+                     ((cell.x + 1) * CELL_SIZE[0] +
+                      (CELL_SIZE[0] - target_image.get_width()) / 2,
+                      (cell.y + 1) * CELL_SIZE[1] +
+                      (CELL_SIZE[1] - target_image.get_height()) / 2))
+
+class MailSprite(pygame.sprite.Sprite):
+    """
+    Sprite of a mail.
+
+    :param mail_number: The number of the mail.
+    :param pos: Cell where the mail is generated.
+    """
+
+    def __init__(self, mail_number: int, pos: Cell) -> None:
+        super().__init__()
+        self.mail_number = mail_number
+        # cell where the mail lies, None if it is carried by a robot
+        self.pos: Cell | None = pos
+        self.image = pygame.transform.scale(
+            pygame.image.load(os.path.join(ASSETS_DIR, 'mail.png')), CELL_SIZE)
+        mail_number_images = pygame.font.SysFont(None, 16).render(
+            str(self.mail_number), True, (255, 0, 0))
+        self.image.blit(mail_number_images,
+                        (0.5 * CELL_SIZE[0], 0.2 * CELL_SIZE[1]))
+        self.rect = self.image.get_rect()
+        self.rect.topleft = ((pos.x + 1) * CELL_SIZE[0],
+                             (pos.y + 1) * CELL_SIZE[1])
+
+class RobotSprite(Robot, pygame.sprite.Sprite):
+
+    """
+    :py:class:`Robot <rbgame.game.components.Robot>` that can be drawn.
+    It keeps sprites of mails in sync with game state.
+
+    :param pos: Current position of the robot.
+    :param index: The index of the robot.
+    :param color: The color of the robot.
+    :param sprites_group: Group of mails. We need to add new mail to this group when robot pick up a mail and leaves green cell.
+    :param clock: The game clock. For each step of the robot, time increases by :math:`\\Delta t`.
+    :param kwargs: Other parameters of :py:class:`Robot <rbgame.game.components.Robot>`.
+    """
+
+    def __init__(
+        self,
+        pos: Cell,
+        index: int,
+        color: str,
+        sprites_group: pygame.sprite.Group,
+        clock: Clock,
+        **kwargs,
+    ) -> None:
+        Robot.__init__(self, pos, index, color, clock, **kwargs)
+        pygame.sprite.Sprite.__init__(self)
+        self.sprites_group = sprites_group
+        # sprite of carried mail
+        self.mail_sprite: MailSprite | None = None
+
+        self.__set_image()
+        self.__set_number_image()
+        self.rect = self.image.get_rect()
+        self.rect.topleft = ((self.pos.x + 1) * CELL_SIZE[0],
+                             (self.pos.y + 1) * CELL_SIZE[1])
+
+    def __set_image(self) -> None:
+        if self.color == 'b':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'blue_robot.png'))
+        elif self.color == 'r':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'red_robot.png'))
+        elif self.color == 'p':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'purple_robot.png'))
+        elif self.color == 'gr':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'green_robot.png'))
+        elif self.color == 'o':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'orange_robot.png'))
+        elif self.color == 'pi':
+            self.image = pygame.image.load(os.path.join(ASSETS_DIR, 'pink_robot.png'))
+        else:
+            raise ValueError("Colors of the robot can only be 'b', 'r', 'p', 'gr', 'o', 'pi'")
+        self.image = pygame.transform.scale(self.image, CELL_SIZE)
+
+    def __set_number_image(self) -> None:
+        robot_number_font = pygame.font.SysFont(None, 16)
+        number_img = robot_number_font.render(str(self.index), True, (0, 0, 0))
+        self.image.blit(number_img,
+                        (0.5 * CELL_SIZE[0] - number_img.get_width() / 2,
+                         0.7 * CELL_SIZE[1] - number_img.get_height() / 2))
+
+    @property
+    def next_rect(self) -> pygame.Rect:
+        """
+        Next rectangle, where we should draw it after its movement.
+        """
+        rect = self.image.get_rect()
+        rect.topleft = ((self.pos.x + 1) * CELL_SIZE[0],
+                        (self.pos.y + 1) * CELL_SIZE[1])
+        return rect
+
+    def generate_mail(self, cell: Cell) -> None:
+        super().generate_mail(cell)
+        self.sprites_group.add(MailSprite(cell.mail, cell))
+
+    def pick_up(self) -> None:
+        super().pick_up()
+        for mail_sprite in self.sprites_group:
+            if mail_sprite.pos is self.pos:
+                self.mail_sprite = mail_sprite
+                self.mail_sprite.pos = None
+                break
+
+    def drop_off(self) -> None:
+        super().drop_off()
+        if self.mail_sprite:
+            self.mail_sprite.kill()
+            self.mail_sprite = None
+
+    def reset(self, pos: Cell) -> None:
+        super().reset(pos)
+        self.mail_sprite = None
+        self.rect = self.next_rect
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import numpy as np
+
+# constants of splitmix64 mixing function
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+class RandomStreams:
+    """
+    Independent random streams of many games, one stream per game. Stream is counter-based:
+    :math:`k`-th number of a game is splitmix64 hash of its key and :math:`k`, so drawing numbers for any subset
+    of games is one vectorized call, and numbers of a game don't depend on how often other games draw.
+
+    :param num_streams: Number of streams.
+    :param seed: Seed of all streams.
+    """
+
+    def __init__(self, num_streams: int, seed: int|None = None) -> None:
+        self.num_streams = num_streams
+        self.keys = np.zeros(num_streams, dtype=np.uint64)
+        # number of drawn values of each stream
+        self.counters = np.zeros(num_streams, dtype=np.uint64)
+        self.seed(seed)
+
+    def seed(self, seed: int|None = None, ids: np.ndarray|None = None) -> None:
+        """
+        Reseed streams. Stream of game :math:`i` depends only on :code:`seed` and :math:`i`,
+        so the game starts from the same state whether it is reseeded alone or together with others.
+
+        :param seed: Seed. If it is :py:data:`None`, fresh entropy is taken from OS.
+        :param ids: Indices of streams. Default to all streams.
+        """
+        if ids is None:
+            ids = np.arange(self.num_streams)
+        entropy = np.random.SeedSequence(seed).entropy
+        self.keys[ids] = [np.random.SeedSequence(entropy, spawn_key=(i,)).generate_state(1, np.uint64)[0] for i in ids]
+        self.counters[ids] = 0
+
+    def advance(self, ids: np.ndarray, delta: int|np.ndarray) -> None:
+        """
+        Skip :code:`delta` values of streams :code:`ids`.
+
+        :param ids: Indices of streams.
+        :param delta: Number of values to skip for each stream.
+        """
+        self.counters[ids] += np.asarray(delta, dtype=np.uint64)
+
+    def random(self, ids: np.ndarray, size: int|tuple[int, ...] = ()) -> np.ndarray:
+        """
+        Draw uniform floats in :math:`[0, 1)` and advance streams.
+
+        :param ids: Indices of distinct streams.
+        :param size: Shape of values drawn from each stream.
+        :return: Array with shape :code:`(len(ids), *size)`.
+        """
+        shape = (ids.size, *((size,) if isinstance(size, int) else size))
+        count = int(np.prod(shape[1:], dtype=np.int64))
+        with np.errstate(over='ignore'):
+            z = self.keys[ids, None] + (self.counters[ids, None] + np.arange(count, dtype=np.uint64)) * GOLDEN_GAMMA
+            z = (z ^ (z >> np.uint64(30))) * MIX_1
+            z = (z ^ (z >> np.uint64(27))) * MIX_2
+            z ^= z >> np.uint64(31)
+        self.counters[ids] += np.uint64(count)
+        return ((z >> np.uint64(11)) * 2.0**-53).reshape(shape)
+
+    def integers(self, ids: np.ndarray, low: int, high: int, size: int|tuple[int, ...] = ()) -> np.ndarray:
+        """
+        Draw integers in :math:`[low, high)` and advance streams.
+
+        :param ids: Indices of distinct streams.
+        :param low: Lowest integer.
+        :param high: One above the largest integer.
+        :param size: Shape of values drawn from each stream.
+        :return: Array with shape :code:`(len(ids), *size)`.
+        """
+        return low + (self.random(ids, size) * (high - low)).astype(np.int64)
@@ -0,0 +1,321 @@
+from __future__ import annotations
+from typing import Any
+import ctypes
+import multiprocessing as mp
+import os
+
+import numpy as np
+from tianshou.data import Batch
+
+from rbgame.game.game import RoboticBoardGame
+
+def _fields(num_envs: int, obs_size: int, num_actions: int) -> dict[str, tuple[tuple[int, ...], np.dtype]]:
+    # shape and dtype of each shared array
+    # step_* are results of the last step, last_* describe current agent of the game
+    return {
+        'actions': ((num_envs,), np.dtype(np.int64)),
+        'step_observation': ((num_envs, obs_size), np.dtype(np.float32)),
+        'step_action_mask': ((num_envs, num_actions), np.dtype(np.uint8)),
+        'step_reward': ((num_envs,), np.dtype(np.float64)),
+        'step_terminated': ((num_envs,), np.dtype(np.bool_)),
+        'step_truncated': ((num_envs,), np.dtype(np.bool_)),
+        'step_belongs_agent': ((num_envs,), np.dtype(np.int64)),
+        'last_observation': ((num_envs, obs_size), np.dtype(np.float32)),
+        'last_action_mask': ((num_envs, num_actions), np.dtype(np.uint8)),
+        'last_reward': ((num_envs,), np.dtype(np.float64)),
+        'last_terminated': ((num_envs,), np.dtype(np.bool_)),
+        'last_truncated': ((num_envs,), np.dtype(np.bool_)),
+        'agent_indices': ((num_envs,), np.dtype(np.int64)),
+        'winners': ((num_envs,), np.dtype(np.int64)),
+        'clocks': ((num_envs,), np.dtype(np.float64)),
+    }
+
+def _views(buffers: dict[str, Any], fields: dict[str, tuple[tuple[int, ...], np.dtype]]) -> dict[str, np.ndarray]:
+    return {
+        name: np.frombuffer(buffers[name], dtype=dtype).reshape(shape)
+        for name, (shape, dtype) in fields.items()
+    }
+
+class _Worker:
+    """
+    Games of one subprocess. They read actions from and write results to shared arrays.
+    """
+
+    def __init__(self, env_ids: list[int], env_args: dict[str, Any], arrays: dict[str, np.ndarray], auto_reset: bool) -> None:
+        self.env_ids = env_ids
+        self.arrays = arrays
+        self.auto_reset = auto_reset
+        # observations are copied to shared arrays, so views are enough
+        self.envs = [RoboticBoardGame(**env_args, zero_copy_obs=True) for _ in env_ids]
+        self.agent_indices = {agent: i for i, agent in enumerate(self.envs[0].possible_agents)}
+        self.robot_colors = self.envs[0].robot_colors
+
+    def __write_last(self, i: int, env: RoboticBoardGame) -> None:
+        a = self.arrays
+        agent = env.agent_selection
+        obs = env.observe(agent)
+        a['last_observation'][i] = obs['observation']
+        a['last_action_mask'][i] = obs['action_mask']
+        a['last_reward'][i] = env._cumulative_rewards[agent]
+        a['last_terminated'][i] = env.terminations[agent]
+        a['last_truncated'][i] = env.truncations[agent]
+        a['agent_indices'][i] = self.agent_indices[agent]
+        a['winners'][i] = self.robot_colors.index(env.winner) if env.winner is not None else -1
+        a['clocks'][i] = env.game_clock.now
+
+    def reset(self, local_ids: list[int], seed: int|None) -> None:
+        for k in local_ids:
+            i, env = self.env_ids[k], self.envs[k]
+            env.reset(seed=None if seed is None else seed + i)
+            self.__write_last(i, env)
+
+    def step(self, local_ids: list[int]) -> None:
+        a = self.arrays
+        for k in local_ids:
+            i, env = self.env_ids[k], self.envs[k]
+            obs, reward, terminated, truncated, info = env.step(int(a['actions'][i]))
+            a['step_observation'][i] = obs['observation']
+            a['step_action_mask'][i] = obs['action_mask']
+            a['step_reward'][i] = reward
+            a['step_terminated'][i] = terminated
+            a['step_truncated'][i] = truncated
+            a['step_belongs_agent'][i] = info['transition_belongs_agent']
+            if self.auto_reset and (terminated or truncated):
+                env.reset()
+            self.__write_last(i, env)
+
+    def get_attr(self, local_ids: list[int], key: str) -> list[Any]:
+        return [getattr(self.envs[k], key) for k in local_ids]
+
+def _run_worker(
+    conn: mp.connection.Connection,
+    env_ids: list[int],
+    env_args: dict[str, Any],
+    buffers: dict[str, Any],
+    fields: dict[str, tuple[tuple[int, ...], np.dtype]],
+    auto_reset: bool,
+) -> None:
+    try:
+        worker = _Worker(env_ids, env_args, _views(buffers, fields), auto_reset)
+        conn.send(None)
+        while True:
+            command, args = conn.recv()
+            if command == 'close':
+                break
+            conn.send(getattr(worker, command)(*args))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        conn.send(e)
+    finally:
+        conn.close()
+
+class SubprocRoboticBoardGame:
+    """
+    Many games of :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`, distributed among subprocesses.
+    Workers exchange observations, action masks, rewards and done flags with main process through preallocated
+    shared arrays instead of pickled dicts, only short commands go through pipes.
+    It has the same interface as :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>`.
+
+    :param num_envs: Number of games.
+    :param num_workers: Number of subprocesses. Default to number of CPUs.
+    :param auto_reset: Reset a game as soon as it has finished. Then :py:meth:`step` returns
+                       last observation of finished game and :py:meth:`last` returns first observation of new game.
+    :param context: Start method of subprocesses, see :py:func:`multiprocessing.get_context`.
+    :param env_args: Arguments for each :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_workers: int|None = None,
+        auto_reset: bool = True,
+        context: str|None = None,
+        **env_args: Any,
+    ) -> None:
+        env_args.pop('zero_copy_obs', None)
+        self.env_num = num_envs
+        self.auto_reset = auto_reset
+        probe = RoboticBoardGame(**env_args)
+        self.agents = probe.possible_agents[:]
+        self.possible_agents = self.agents[:]
+        self.num_agents = len(self.agents)
+        self.robot_colors = probe.robot_colors
+        obs_size = probe.observation_space(self.agents[0])['observation'].shape[0]
+        num_actions = probe.action_space(self.agents[0]).n
+
+        ctx = mp.get_context(context)
+        fields = _fields(num_envs, obs_size, num_actions)
+        buffers = {name: ctx.RawArray(ctypes.c_byte, max(int(np.prod(shape))*dtype.itemsize, 1)) for name, (shape, dtype) in fields.items()}
+        self.__arrays = _views(buffers, fields)
+
+        num_workers = min(num_workers or os.cpu_count() or 1, num_envs)
+        # worker w hosts games worker_env_ids[w]
+        self.__worker_env_ids = [ids.tolist() for ids in np.array_split(np.arange(num_envs), num_workers)]
+        self.__workers = np.concatenate([np.full(len(ids), w) for w, ids in enumerate(self.__worker_env_ids)])
+        self.__local_ids = np.concatenate([np.arange(len(ids)) for ids in self.__worker_env_ids])
+        self.__conns = []
+        self.__processes = []
+        for env_ids in self.__worker_env_ids:
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=_run_worker,
+                args=(child_conn, env_ids, env_args, buffers, fields, auto_reset),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.__conns.append(parent_conn)
+            self.__processes.append(process)
+        for conn in self.__conns:
+            self.__receive(conn)
+        self.closed = False
+
+        self.reset()
+
+    def __len__(self) -> int:
+        return self.env_num
+
+    def __ids(self, id: int|list[int]|np.ndarray|None) -> np.ndarray:
+        if id is None:
+            return np.arange(self.env_num)
+        return np.atleast_1d(np.asarray(id, dtype=np.int64))
+
+    @staticmethod
+    def __receive(conn: mp.connection.Connection) -> Any:
+        result = conn.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def __call(self, ids: np.ndarray, command: str, *args: Any) -> dict[int, Any]:
+        # send command to workers hosting games ids, then wait for all of them, results are keyed by worker index
+        workers = self.__workers[ids]
+        local_ids = self.__local_ids[ids]
+        called = np.unique(workers)
+        for w in called:
+            self.__conns[w].send((command, (local_ids[workers == w].tolist(), *args)))
+        results = {}
+        for w in called:
+            results[w] = self.__receive(self.__conns[w])
+        return results
+
+    def __last_observations(self, ids: np.ndarray) -> Batch:
+        return Batch(observation=self.__arrays['last_observation'][ids], action_mask=self.__arrays['last_action_mask'][ids])
+
+    @property
+    def clocks(self) -> np.ndarray:
+        """
+        Game time of each game.
+        """
+        return self.__arrays['clocks']
+
+    @property
+    def agent_indices(self) -> np.ndarray:
+        """
+        Index of current agent of each game.
+        """
+        return self.__arrays['agent_indices']
+
+    def reset(self, id: int|list[int]|np.ndarray|None = None, seed: int|None = None, **kwargs: Any) -> tuple[Batch, Batch]:
+        """
+        Reset games.
+
+        :param id: Indices of games to reset. Default to all games.
+        :param seed: Seed. If it isn't :py:data:`None`, game :math:`i` is reset with seed :math:`seed + i`.
+        :return: Observations of current agents and some infomations.
+        """
+        ids = self.__ids(id)
+        self.__call(ids, 'reset', seed)
+        return self.__last_observations(ids), Batch(transition_belongs_agent=self.agent_indices[ids])
+
+    def step(self, action: np.ndarray, id: int|list[int]|np.ndarray|None = None) -> tuple[Batch, np.ndarray, np.ndarray, np.ndarray, Batch]:
+        """
+        Perform one step in each game with indices :code:`id`.
+
+        :param action: Actions of current agents of games.
+        :param id: Indices of games. Default to all games.
+        :return: Next observations of acting agents, the rewards, terminations, truncations and infomations.
+                 Infomations are the same as in :py:meth:`BatchedRoboticBoardGame.step <rbgame.game.batched_game.BatchedRoboticBoardGame.step>`.
+        """
+        ids = self.__ids(id)
+        action = np.asarray(action, dtype=np.int64).reshape(-1)
+        assert action.size == ids.size
+        arrays = self.__arrays
+        arrays['actions'][ids] = action
+        self.__call(ids, 'step')
+        return (
+            Batch(observation=arrays['step_observation'][ids], action_mask=arrays['step_action_mask'][ids]),
+            arrays['step_reward'][ids],
+            arrays['step_terminated'][ids],
+            arrays['step_truncated'][ids],
+            Batch(
+                transition_belongs_agent=arrays['step_belongs_agent'][ids],
+                next_agent=arrays['agent_indices'][ids],
+                next_obs=self.__last_observations(ids),
+                next_done=arrays['last_terminated'][ids] | arrays['last_truncated'][ids],
+            ),
+        )
+
+    def last(self, id: int|list[int]|np.ndarray|None = None) -> tuple[Batch, np.ndarray, np.ndarray, np.ndarray, Batch]:
+        """
+        Similar to :py:meth:`last` of :class:`AECEnv <pettingzoo.AECEnv>`, but for many games.
+        It only reads shared arrays, no command is sent to workers.
+
+        :param id: Indices of games. Default to all games.
+        :return: Observations of current agents, their cumulative rewards, terminations, truncations and infomations.
+        """
+        ids = self.__ids(id)
+        arrays = self.__arrays
+        return (
+            self.__last_observations(ids),
+            arrays['last_reward'][ids],
+            arrays['last_terminated'][ids],
+            arrays['last_truncated'][ids],
+            Batch(transition_belongs_agent=arrays['agent_indices'][ids]),
+        )
+
+    def get_env_attr(self, key: str, id: int|list[int]|np.ndarray|None = None) -> list[Any]:
+        """
+        Get attribute of games, similar to :meth:`get_env_attr <tianshou.env.venvs.BaseVectorEnv.get_env_attr>`.
+        Keys :code:`'agent_selection'`, :code:`'winner'`, :code:`'agents'`, :code:`'possible_agents'` and :code:`'num_agents'`
+        are read without asking workers, other attributes are fetched from workers and must be picklable.
+
+        :param key: Name of the attribute.
+        :param id: Indices of games. Default to all games.
+        :return: List of values for each game.
+        """
+        ids = self.__ids(id)
+        if key == 'agent_selection':
+            return [self.agents[i] for i in self.agent_indices[ids]]
+        if key == 'winner':
+            return [self.robot_colors[w] if w >= 0 else None for w in self.__arrays['winners'][ids]]
+        if key in ('agents', 'possible_agents', 'num_agents'):
+            return [getattr(self, key)] * ids.size
+        results = self.__call(ids, 'get_attr', key)
+        workers = self.__workers[ids]
+        positions = {w: iter(values) for w, values in results.items()}
+        return [next(positions[w]) for w in workers]
+
+    def close(self) -> None:
+        """
+        Close the enviroment and stop workers.
+        """
+        if self.closed:
+            return
+        for conn in self.__conns:
+            try:
+                conn.send(('close', ()))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.__processes:
+            process.join()
+        for conn in self.__conns:
+            conn.close()
+        self.closed = True
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
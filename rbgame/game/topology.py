@@ -0,0 +1,94 @@
+from __future__ import annotations
+import csv
+import hashlib
+import types
+
+import numpy as np
+
+# no neighbor in the direction
+NO_NEIGHBOR = -1
+
+class MapTopology:
+    """
+    Immutable static facts of a map, compiled once from a pair of color and target maps
+    and shared read-only by every :py:class:`Board <rbgame.game.components.Board>`,
+    :py:class:`Graph <rbgame.agent.astar_agent.Graph>` and :py:class:`BoardArrays <rbgame.game.engine.BoardArrays>`
+    built from the same files. Use :py:func:`compile_map` to get it.
+    Cells are indexed by flat index :math:`y \\cdot size + x`.
+
+    :param key: Content hash of the maps.
+    :param colors: Rows of cell colors.
+    :param targets: Rows of cell targets.
+    """
+
+    def __init__(self, key: str, colors: list[list[str]], targets: list[list[int]]) -> None:
+        self.key = key
+        self.size = len(colors[0])
+        self.num_cells = self.size * self.size
+        self.colors: tuple[str, ...] = tuple(color for row in colors for color in row)
+        self.targets: tuple[int, ...] = tuple(target for row in targets for target in row)
+        self.xs: tuple[int, ...] = tuple(c % self.size for c in range(self.num_cells))
+        self.ys: tuple[int, ...] = tuple(c // self.size for c in range(self.num_cells))
+
+        # neighbors in order front, back, left, right, the same as order of moving actions
+        neighbors = np.full((self.num_cells, 4), NO_NEIGHBOR, dtype=np.int16)
+        for c in range(self.num_cells):
+            x, y = self.xs[c], self.ys[c]
+            if y - 1 >= 0:
+                neighbors[c, 0] = c - self.size
+            if y + 1 < self.size:
+                neighbors[c, 1] = c + self.size
+            if x - 1 >= 0:
+                neighbors[c, 2] = c - 1
+            if x + 1 < self.size:
+                neighbors[c, 3] = c + 1
+        neighbors.flags.writeable = False
+        self.neighbors = neighbors
+        self.neighbor_lists: tuple[tuple[int, ...], ...] = tuple(tuple(row) for row in neighbors.tolist())
+
+        # cell indices of each color, in row-major order
+        self.cells_by_color: types.MappingProxyType[str, tuple[int, ...]] = types.MappingProxyType({
+            color: tuple(c for c in range(self.num_cells) if self.colors[c] == color)
+            for color in sorted(set(self.colors))
+        })
+        # receiving station of each mail number
+        self.target_cells: types.MappingProxyType[int, int] = types.MappingProxyType({
+            target: c for c, target in enumerate(self.targets) if target
+        })
+        # cell is stucked between two yellow or red cells in the edge of the board
+        is_corner = np.array([
+            sum(int(self.colors[n] in ('y', 'r')) for n in self.neighbor_lists[c] if n != NO_NEIGHBOR) == 2
+            for c in range(self.num_cells)
+        ])
+        is_corner.flags.writeable = False
+        self.is_corner = is_corner
+
+    def cells(self, color: str) -> tuple[int, ...]:
+        """
+        :param color: Color of cells.
+        :return: Flat indices of cells with :code:`color`.
+        """
+        return self.cells_by_color.get(color, ())
+
+# compiled maps by content hash
+_TOPOLOGIES: dict[str, MapTopology] = {}
+
+def compile_map(colors_map: str, targets_map: str) -> MapTopology:
+    """
+    Compile color and target maps into :py:class:`MapTopology`.
+    Result is cached by content of the files, so maps are parsed only once per process.
+
+    :param colors_map: csv file name for color map.
+    :param targets_map: csv file name for target map.
+    :return: Compiled topology of the map.
+    """
+    with open(colors_map, mode='rb') as colors_map_file, open(targets_map, mode='rb') as targets_map_file:
+        colors_content = colors_map_file.read()
+        targets_content = targets_map_file.read()
+    key = hashlib.sha1(colors_content + b'\0' + targets_content).hexdigest()
+    topology = _TOPOLOGIES.get(key)
+    if topology is None:
+        colors = list(csv.reader(colors_content.decode('utf-8').splitlines()))
+        targets = [[int(target) for target in row] for row in csv.reader(targets_content.decode('utf-8').splitlines())]
+        topology = _TOPOLOGIES[key] = MapTopology(key, colors, targets)
+    return topology
@@ -0,0 +1,63 @@
+from __future__ import annotations
+from statistics import NormalDist
+import math
+
+import numpy as np
+
+class RunningStats:
+    """
+    Streaming count, mean and variance of a sample. Values are merged batch by batch
+    with Chan's parallel update of Welford's accumulators, so the sample is never stored.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = math.nan
+        # sum of squared deviations from mean
+        self.__m2 = 0.0
+
+    def update(self, values: float|list[float]|np.ndarray) -> None:
+        """
+        :param values: New values of the sample.
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if values.size == 0:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean)**2).sum())
+        if self.count == 0:
+            self.count, self.mean, self.__m2 = values.size, batch_mean, batch_m2
+            return
+        count = self.count + values.size
+        delta = batch_mean - self.mean
+        self.mean += delta*values.size/count
+        self.__m2 += batch_m2 + delta**2*self.count*values.size/count
+        self.count = count
+
+    @property
+    def var(self) -> float:
+        """
+        Unbiased sample variance, :py:data:`math.nan` if there are less than two values.
+        """
+        return self.__m2/(self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+    def half_width(self, confidence: float = 0.95) -> float:
+        """
+        :param confidence: Confidence level.
+        :return: Half width of normal-approximation confidence interval of mean, :py:data:`math.inf` if there are less than two values.
+        """
+        if self.count < 2:
+            return math.inf
+        return NormalDist().inv_cdf(0.5 + confidence/2)*self.std/math.sqrt(self.count)
+
+    def interval(self, confidence: float = 0.95) -> tuple[float, float]:
+        """
+        :param confidence: Confidence level.
+        :return: Lower and upper bound of confidence interval of mean.
+        """
+        half_width = self.half_width(confidence)
+        return self.mean - half_width, self.mean + half_width
@@ -1,20 +1,32 @@
 from __future__ import annotations
 from typing import Any, Callable
 from collections import Counter
+import copy
+import math
+import queue
 import time
 import os
 
 import numpy as np
 import matplotlib.pyplot as plt
-from tianshou.data import Batch
+import torch
+import torch.multiprocessing as mp
+from tianshou.data import Batch, VectorReplayBuffer
 from tianshou.env import DummyVectorEnv
 # from tianshou.utils.torch_utils import (
 #     policy_within_training_step, 
 #     torch_train_mode,
 #     )
 
-from rbgame.agent.rl_agent import RLAgent
+from rbgame.agent.rl_agent import RLAgent, OffPolicyAgent, OnPolicyAgent
+from rbgame.agent.memory import MemoryView
+from rbgame.running_stats import RunningStats
 from rbgame.game.game import RoboticBoardGame
+from rbgame.game.batched_game import BatchedRoboticBoardGame
+from rbgame.game.subproc_game import SubprocRoboticBoardGame
+
+def _mean_reward(rewards: np.ndarray) -> float:
+    return rewards.mean()
 
 class DecentralizedTrainer:
     """
@@ -43,6 +55,34 @@ class DecentralizedTrainer:
                           (num_episode, agent_num)) -> a scalar np.ndarray`. We need to return a single scalar 
                           to monitor training. This function specifies what is the desired metric, 
                           e.g., the reward of agent 1 or the average reward over all agents.
+    :param shared_memory: Agent with its own memory stores transitions of the other agents or not.
+                          Agents, whose memories share one storage (see :py:func:`make_memory_views <rbgame.agent.memory.make_memory_views>`),
+                          always store each transition once, and their memories define which transitions they sample.
+    :param env_backend: Vector enviroment to run games. It can be :code:`'dummy'` - :class:`DummyVectorEnv <tianshou.env.venvs.DummyVectorEnv>` 
+                        of :py:class:`RoboticBoardGame <rbgame.game.game.RoboticBoardGame>`, :code:`'batched'` - 
+                        :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>`, which steps all games 
+                        in one vectorized call, :code:`'subproc'` - :py:class:`SubprocRoboticBoardGame <rbgame.game.subproc_game.SubprocRoboticBoardGame>`,
+                        which runs games in subprocesses, or a function with signature 
+                        :code:`f(num_envs: int, env_args: dict[str, Any]) -> vector enviroment`. Returned enviroment must have the same
+                        interface as :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>` and mustn't reset finished games.
+    :param auto_reset: Reset each enviroment as soon as its game finishes, instead of waiting until all games finish.
+                       Episodes are counted per enviroment, :code:`train_fn` and :code:`test_fn` are called after each finished episode.
+                       In testing, no more than :code:`episodes_per_test` episodes are started, so short games aren't over-represented.
+    :param share_inference: Agents of the same type sharing one policy object, e.g. in self-play, infer actions in one forward pass 
+                            for all their enviroments instead of one pass per agent. Default to :py:data:`False`, each agent infers alone.
+    :param seat_feature: Append one-hot index of agent to observation vectors, which are fed to policies and stored in memories,
+                         so agents sharing a policy can be distinguished. Input size of networks must be larger by number of agents.
+                         Compact memories need :py:class:`ObservationCodec <rbgame.agent.memory.ObservationCodec>` with :code:`num_robots`.
+    :param test_precision: Tests stop early, when half width of the confidence interval of the reward is not larger than it.
+                           Default to :py:data:`None`, which means tests don't stop for precision. See :py:meth:`test`.
+    :param test_confidence: Confidence level of intervals of the reward.
+    :param min_episodes_per_test: Minimal number of episodes before a test can stop early.
+    :param stop_worse_tests: Tests during training stop early, when the agents are clearly worse than the best tested agents so far.
+    :param background_test: Tests during training run in a background process on snapshots of learning policies, so collecting 
+                            and learning go on meanwhile. Results are recorded when they arrive, a newer snapshot replaces
+                            the one waiting for test. :code:`test_fn` and :code:`save_best_fn` are called in the background process,
+                            where policies of the agents hold the tested snapshot, so :code:`save_best_fn` saves exactly them.
+                            Background process runs :code:`'subproc'` games in :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>`.
     """
     def __init__(
         self,
@@ -61,18 +101,26 @@ class DecentralizedTrainer:
         save_last_fn: Callable[[], None]|None = None,
         stop_fn: Callable[[float, int], bool]|None = None,
         reward_metric: Callable[[np.ndarray], float]|None = None,
-        # agent stores in memory transitions of the other or not
         shared_memory: bool = True,
+        env_backend: str|Callable[[int, dict[str, Any]], Any] = 'dummy',
+        auto_reset: bool = False,
+        share_inference: bool = False,
+        seat_feature: bool = False,
+        test_precision: float|None = None,
+        test_confidence: float = 0.95,
+        min_episodes_per_test: int = 10,
+        stop_worse_tests: bool = False,
+        background_test: bool = False,
     ) -> None:
 
         env_args.update({
             'render_mode': None,
             'log_to_file': False,
             })
-        def make_env():
-            return RoboticBoardGame(**env_args)
-        self.train_env = DummyVectorEnv([make_env for _ in range(num_train_envs)])
-        self.test_env = DummyVectorEnv([make_env for _ in range(num_test_envs)])
+        self.env_args = env_args
+        self.env_backend = env_backend
+        self.train_env = self.__make_env(env_backend, num_train_envs, env_args)
+        self.test_env = self.__make_env(env_backend, num_test_envs, env_args)
 
         self.batch_size = batch_size
         self.update_freq = update_freq
@@ -85,13 +133,419 @@ class DecentralizedTrainer:
         self.save_last_fn = save_last_fn
         self.stop_fn = stop_fn if stop_fn else \
         lambda reward, episode: False
-        self.reward_metric = reward_metric if reward_metric else \
-        lambda rewards: rewards.mean()
+        # module-level function can be pickled for background evaluation
+        self.reward_metric = reward_metric if reward_metric else _mean_reward
         self.shared_memory = shared_memory
+        self.auto_reset = auto_reset
+        self.share_inference = share_inference
+        self.seat_feature = seat_feature
+        self.test_precision = test_precision
+        self.test_confidence = test_confidence
+        self.min_episodes_per_test = min_episodes_per_test
+        self.stop_worse_tests = stop_worse_tests
+        self.background_test = background_test
+        # process, queues of requests and results of background test
+        self.__evaluator: tuple[Any, Any, Any]|None = None
 
         self.num_agents = self.train_env.get_env_attr('num_agents')[0]
         self.agent_names = self.train_env.get_env_attr('agents')[0]
 
+    @staticmethod
+    def __make_env(env_backend: str|Callable[[int, dict[str, Any]], Any], num_envs: int, env_args: dict[str, Any]) -> Any:
+        """
+        :param env_backend: Type of vector enviroment or function to create it.
+        :param num_envs: Number of enviroments.
+        :param env_args: Arguments for enviroment.
+        :return: Vector enviroment.
+        """
+        if callable(env_backend):
+            return env_backend(num_envs, env_args)
+        # trainer resets all games together, so finished games must keep their final state
+        if env_backend == 'batched':
+            return BatchedRoboticBoardGame(num_envs, auto_reset=False, **env_args)
+        if env_backend == 'subproc':
+            return SubprocRoboticBoardGame(num_envs, auto_reset=False, **env_args)
+        if env_backend == 'dummy':
+            def make_env():
+                return RoboticBoardGame(**env_args)
+            return DummyVectorEnv([make_env for _ in range(num_envs)])
+        raise ValueError(f"{env_backend} is not a valid env backend. Available backends are: 'dummy', 'batched', 'subproc'")
+
+    @staticmethod
+    def __split_obs(obs_b: np.ndarray|Batch) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Split batch of observations from vector enviroment to observation vectors and action masks.
+
+        :param obs_b: Array of observation dicts or :class:`Batch <tianshou.data.Batch>` of observations.
+        :return: Batch of observation vectors and batch of action masks.
+        """
+        if isinstance(obs_b, Batch):
+            return obs_b.observation, obs_b.action_mask
+        return np.array([obs['observation'] for obs in obs_b]), np.array([obs['action_mask'] for obs in obs_b])
+
+    def __last(self, env: Any, ids: np.ndarray|None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Observe current state of enviroments.
+
+        :param env: Vector enviroment.
+        :param ids: Indices of enviroments. Default to all enviroments.
+        :return: Observation vectors and action masks of current agents, indices of current agents and done flags.
+        """
+        if not isinstance(env, DummyVectorEnv):
+            obs, _, terminated, truncated, info = env.last(ids)
+            return obs.observation, obs.action_mask, info.transition_belongs_agent, terminated | truncated
+        last = [last() for last in env.get_env_attr('last', id=ids)]
+        obs_o, action_mask = self.__split_obs([l[0] for l in last])
+        agent = np.array([self.agent_names.index(name) for name in env.get_env_attr('agent_selection', id=ids)])
+        done = np.array([l[2] or l[3] for l in last], dtype=np.bool_)
+        return obs_o, action_mask, agent, done
+
+    def __step(
+            self,
+            env: Any,
+            act: np.ndarray,
+            ids: np.ndarray,
+        ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Batch, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Step enviroments and observe their state after the step.
+
+        :param env: Vector enviroment.
+        :param act: Actions of current agents of enviroments.
+        :param ids: Indices of enviroments.
+        :return: Next observation vectors of acting agents, the rewards, terminations, truncations, infomations 
+                 and state after the step in the same format as :py:meth:`__last`.
+        """
+        obs_next, rew, terminated, truncated, info = env.step(act, ids)
+        obs_next_o, _ = self.__split_obs(obs_next)
+        if not isinstance(env, DummyVectorEnv):
+            next_obs = info.next_obs
+            state = next_obs.observation, next_obs.action_mask, info.next_agent, info.next_done
+            info = Batch(transition_belongs_agent=info.transition_belongs_agent)
+        else:
+            # infomations are dictionaries of games, only transition_belongs_agent is kept in them
+            next_obs_o, next_action_mask = self.__split_obs([i.pop('next_obs') for i in info])
+            next_agent = np.array([i.pop('next_agent') for i in info])
+            next_done = np.array([i.pop('next_done') for i in info], dtype=np.bool_)
+            state = next_obs_o, next_action_mask, next_agent, next_done
+        return obs_next_o, rew, terminated, truncated, info, state
+
+    def __inference_groups(
+            self,
+            agents: list[RLAgent],
+            exploration_mask: list|np.ndarray|None = None,
+        ) -> list[tuple[RLAgent, bool, list[int]]]:
+        """
+        Group agents, which infer actions together. If :code:`share_inference` is on, agents of the same type
+        sharing one policy object and exploring in the same way are in one group, otherwise each agent is alone.
+
+        :param agents: Agents, which participate in game.
+        :param exploration_mask: Which agents explore. Default to :py:data:`None`, which means no agent explores.
+        :return: Agent to infer, exploring or not and indices of agents in each group.
+        """
+        groups: dict[Any, tuple[RLAgent, bool, list[int]]] = {}
+        for agent_index, agent in enumerate(agents):
+            exploration = exploration_mask is not None and bool(exploration_mask[agent_index])
+            # agents without policy, e.g. exported agents, are grouped by themselves
+            key = (type(agent), id(getattr(agent, 'policy', agent)), exploration) if self.share_inference else agent_index
+            groups.setdefault(key, (agent, exploration, []))[2].append(agent_index)
+        return list(groups.values())
+
+    def __with_seat(self, obs_o: np.ndarray, agent: np.ndarray) -> np.ndarray:
+        """
+        :param obs_o: Observation vectors.
+        :param agent: Indices of agents, whose observations they are.
+        :return: Observation vectors with one-hot seat of agent appended if :code:`seat_feature` is on.
+        """
+        if not self.seat_feature:
+            return obs_o
+        return np.concatenate((obs_o, np.eye(self.num_agents, dtype=obs_o.dtype)[agent]), axis=-1)
+
+    def __act(
+            self,
+            groups: list[tuple[RLAgent, bool, list[int]]],
+            obs_o_r: np.ndarray,
+            action_mask_r: np.ndarray,
+            agent_r: np.ndarray,
+        ) -> np.ndarray:
+        """
+        Let current agents of enviroments act. Enviroments are grouped by current agent,
+        so each group of agents infers once for all its enviroments.
+
+        :param groups: Groups of agents from :py:meth:`__inference_groups`.
+        :param obs_o_r: Observation vectors of current agents.
+        :param action_mask_r: Action masks of current agents.
+        :param agent_r: Indices of current agents.
+        :return: Actions of current agents.
+        """
+        act_r = np.zeros(agent_r.size, dtype=np.int64)
+        order_r = np.argsort(agent_r, kind='stable')
+        bounds = np.searchsorted(agent_r[order_r], np.arange(self.num_agents+1))
+        for agent, exploration, group_agents in groups:
+            # indicies of envs within running envs that have current agent in the group
+            if len(group_agents) == 1:
+                inner_b = order_r[bounds[group_agents[0]]:bounds[group_agents[0]+1]]
+            else:
+                inner_b = np.concatenate([order_r[bounds[a]:bounds[a+1]] for a in group_agents])
+            if inner_b.size == 0:
+                # skip if no env is in turn of the group
+                continue
+            obs_b_o, action_mask_b = obs_o_r[inner_b], action_mask_r[inner_b]
+            if exploration:
+                # with policy_within_training_step(agent.policy):
+                agent.policy.train()
+                act_r[inner_b] = agent.infer_act(obs_b_o, action_mask_b, exploration_noise=True)
+                agent.policy.eval()
+            else:
+                act_r[inner_b] = agent.get_actions(obs_b_o, action_mask_b)
+        return act_r
+
+    def __check_agents(
+            self,
+            agents: list[RLAgent],
+            learning_mask: list|np.ndarray,
+            exploration_mask: list|np.ndarray|None,
+            num_envs: int,
+        ) -> tuple[list|np.ndarray, dict[int, tuple[VectorReplayBuffer, list[int]]]]:
+        """
+        Check arguments of training.
+
+        :param agents: Agents, which participate in game.
+        :param learning_mask: Which agents learn.
+        :param exploration_mask: Which agents explore. :py:data:`None` means all RL agents explore.
+        :param num_envs: Number of enviroments, whose transitions are stored.
+        :return: Exploration mask and storages of learning agents with indices of agents using them.
+        """
+        assert any(learning_mask), 'We need at least one learning agent.'
+        assert self.num_agents == len(agents), f'Please provide number of agents is {self.num_agents}'
+        assert self.num_agents == len(learning_mask), f'Please provide learning_mask size is {self.num_agents}'
+        if exploration_mask is None:
+            # agents without policy, e.g. A* agents, can't explore
+            exploration_mask = np.array([isinstance(agent, RLAgent) for agent in agents], dtype=np.bool_)
+        assert self.num_agents == len(exploration_mask), f'Please provide exploration_mask size is {self.num_agents}'
+        # storages of learning agents and agents using them, a storage shared through views gets each transition once
+        storages: dict[int, tuple[VectorReplayBuffer, list[int]]] = {}
+        for agent_index, agent in enumerate(agents):
+            if learning_mask[agent_index]:
+                assert agent.memory is not None, f'Learning agent {agent_index} must having a memory.'
+                storage = agent.memory.buffer if isinstance(agent.memory, MemoryView) else agent.memory
+                assert self.num_agents*num_envs == storage.buffer_num
+                storages.setdefault(id(storage), (storage, []))[1].append(agent_index)
+        return exploration_mask, storages
+
+    @staticmethod
+    def __clear_on_policy_memories(agents: list[RLAgent], learning_mask: list|np.ndarray) -> None:
+        """
+        Clear memories of learning on-policy agents, whose transitions have been used. 
+        Memory shared by several agents is cleared once, after all of them have updated.
+
+        :param agents: Agents, which participate in game.
+        :param learning_mask: Which agents learn.
+        """
+        cleared = set()
+        for agent_index, agent in enumerate(agents):
+            if learning_mask[agent_index] and isinstance(agent, OnPolicyAgent) and id(agent.memory) not in cleared:
+                cleared.add(id(agent.memory))
+                agent.memory.reset(keep_statistics=True)
+
+    def __add_transitions(
+            self,
+            storages: dict[int, tuple[VectorReplayBuffer, list[int]]],
+            transitions_r: Batch,
+            ids_r: np.ndarray,
+            agent_r: np.ndarray,
+        ) -> None:
+        """
+        Add transitions to storages of learning agents.
+
+        :param storages: Storages from :py:meth:`__check_agents`.
+        :param transitions_r: Transitions.
+        :param ids_r: Indices of enviroments of transitions.
+        :param agent_r: Indices of acting agents of transitions.
+        """
+        for storage, storage_agents in storages.values():
+            if len(storage_agents) == 1 and not self.shared_memory:
+                # private memory keeps only transitions of its agent
+                own_r = agent_r == storage_agents[0]
+                if own_r.any():
+                    storage.add(transitions_r[own_r], buffer_ids=ids_r[own_r]*self.num_agents+storage_agents[0])
+            else:
+                # mofify or reset data in one memory doesn't change data in the other
+                # so we don't need to create copy of data to store in next buffer
+                storage.add(transitions_r, buffer_ids=ids_r*self.num_agents+agent_r)
+
+    def __evaluate(self, agents: list[RLAgent], learning_mask: list|np.ndarray, num_collected_episodes: int, episodes: list[int], rewards: list[float]) -> bool:
+        """
+        Test agents during training, record the metric and save them if the metric gets better.
+        If test runs in background, snapshot of learning policies is sent to test and arrived results are recorded.
+
+        :param agents: Agents, which participate in game.
+        :param learning_mask: Which agents learn.
+        :param num_collected_episodes: Number of collected episodes.
+        :param episodes: Numbers of collected episodes at tests.
+        :param rewards: Reward metrics at tests.
+        :return: Training should stop or not.
+        """
+        if self.__evaluator is not None:
+            states, published = [], set()
+            for agent_index, agent in enumerate(agents):
+                if learning_mask[agent_index] and id(agent.policy) not in published:
+                    published.add(id(agent.policy))
+                    states.append((agent_index, {k: v.detach().cpu().clone() for k, v in agent.policy.state_dict().items()}))
+            self.__evaluator[1].put((num_collected_episodes, states))
+            return self.__collect_evaluations(episodes, rewards)
+        baseline = max(rewards) if self.stop_worse_tests and rewards else None
+        test_stats = self.test(agents, eval_metrics=False, baseline=baseline)
+        if len(rewards) > 0 and test_stats['reward'] > rewards[-1] and self.save_best_fn:
+            self.save_best_fn(num_collected_episodes)
+        return self.__record_evaluation(num_collected_episodes, test_stats, episodes, rewards)
+
+    def __record_evaluation(self, num_collected_episodes: int, test_stats: dict[str, Any], episodes: list[int], rewards: list[float]) -> bool:
+        """
+        :param num_collected_episodes: Number of collected episodes, when tested agents were taken.
+        :param test_stats: Testing statistic.
+        :param episodes: Numbers of collected episodes at tests.
+        :param rewards: Reward metrics at tests.
+        :return: Training should stop or not.
+        """
+        num_steps, reward_metric = test_stats['mean_num_steps'], test_stats['reward']
+        episodes.append(num_collected_episodes)
+        rewards.append(reward_metric)
+        print("===episode {:04d} done with number steps: {:5.1f}, reward: {:+06.2f}==="
+              .format((num_collected_episodes), num_steps, reward_metric))
+        return self.stop_fn(rewards[-1], num_collected_episodes)
+
+    def __collect_evaluations(self, episodes: list[int], rewards: list[float], wait: bool = False) -> bool:
+        """
+        Record results of background test, which have arrived.
+
+        :param episodes: Numbers of collected episodes at tests.
+        :param rewards: Reward metrics at tests.
+        :param wait: Wait until background process exits.
+        :return: Training should stop or not.
+        """
+        process, _, results = self.__evaluator
+        stop = False
+        while True:
+            try:
+                num_collected_episodes, test_stats = results.get(timeout=0.1) if wait else results.get_nowait()
+            except queue.Empty:
+                if wait and process.is_alive():
+                    continue
+                return stop
+            if isinstance(test_stats, Exception):
+                raise test_stats
+            stop = self.__record_evaluation(num_collected_episodes, test_stats, episodes, rewards) or stop
+
+    def __start_evaluator(self, agents: list[RLAgent]) -> None:
+        """
+        Start background test if it is on.
+
+        :param agents: Agents, which participate in game.
+        """
+        if not self.background_test:
+            return
+        ctx = mp.get_context()
+        requests, results = ctx.Queue(), ctx.Queue()
+        # hooks and enviroments of training stay in main process
+        evaluator_trainer = copy.copy(self)
+        for key in ('train_env', 'test_env', 'train_fn', 'save_last_fn', 'stop_fn'):
+            setattr(evaluator_trainer, key, None)
+        evaluator_trainer.__evaluator = None
+        # policies are shared with the agents, so hooks using the agents see the tested snapshot
+        evaluator_agents = []
+        for agent in agents:
+            evaluator_agent = copy.copy(agent)
+            evaluator_agent.memory = None
+            evaluator_agents.append(evaluator_agent)
+        process = ctx.Process(
+            target=evaluator_trainer._run_evaluator,
+            args=(evaluator_agents, requests, results, self.test_env.env_num),
+            daemon=True,
+        )
+        process.start()
+        self.__evaluator = (process, requests, results)
+
+    def __stop_evaluator(self, episodes: list[int], rewards: list[float], wait: bool = True) -> None:
+        """
+        Stop background test after it finishes the waiting test and record the remaining results.
+
+        :param episodes: Numbers of collected episodes at tests.
+        :param rewards: Reward metrics at tests.
+        :param wait: Wait for the remaining results or drop them.
+        """
+        if self.__evaluator is None:
+            return
+        process, requests, _ = self.__evaluator
+        requests.put(None)
+        try:
+            if wait:
+                self.__collect_evaluations(episodes, rewards, wait=True)
+        finally:
+            process.join(timeout=None if wait else 5)
+            if process.is_alive():
+                process.terminate()
+            self.__evaluator = None
+
+    # it isn't name-mangled, so bound method can be pickled as target of spawned process
+    def _run_evaluator(self, agents: list[RLAgent], requests: Any, results: Any, num_envs: int) -> None:
+        """
+        Background test of :py:meth:`train` and :py:meth:`train_async`. It tests the latest received snapshot
+        and calls :code:`save_best_fn`, if the metric gets better than the metric of the previous test.
+
+        :param agents: Agents without memories.
+        :param requests: Queue of numbers of collected episodes and parameters of learning policies.
+        :param results: Queue of numbers of collected episodes and testing statistics.
+        :param num_envs: Number of test enviroments.
+        """
+        try:
+            # subprocesses can't be started by daemonic process
+            env_backend = 'batched' if self.env_backend == 'subproc' else self.env_backend
+            self.test_env = self.__make_env(env_backend, num_envs, self.env_args)
+            last_reward = None
+            best_reward = None
+            latest = None
+            finished = False
+            while not finished:
+                request = requests.get()
+                # newer snapshot replaces the waiting one
+                while True:
+                    if request is None:
+                        finished = True
+                    else:
+                        latest = request
+                    try:
+                        request = requests.get_nowait()
+                    except queue.Empty:
+                        break
+                if latest is None:
+                    continue
+                num_collected_episodes, states = latest
+                latest = None
+                for agent_index, state in states:
+                    agents[agent_index].policy.load_state_dict(state)
+                baseline = best_reward if self.stop_worse_tests else None
+                test_stats = self.test(agents, eval_metrics=False, baseline=baseline)
+                if last_reward is not None and test_stats['reward'] > last_reward and self.save_best_fn:
+                    self.save_best_fn(num_collected_episodes)
+                last_reward = test_stats['reward']
+                best_reward = last_reward if best_reward is None else max(best_reward, last_reward)
+                results.put((num_collected_episodes, test_stats))
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            results.put((None, e))
+
+    @staticmethod
+    def __game_times(env: Any, ids: np.ndarray) -> np.ndarray:
+        """
+        :param env: Vector enviroment.
+        :param ids: Indices of enviroments.
+        :return: Game time of enviroments.
+        """
+        if hasattr(env, 'clocks'):
+            return np.asarray(env.clocks[ids], dtype=np.float64)
+        return np.array([clock.now for clock in env.get_env_attr('game_clock', id=ids)], dtype=np.float64)
+
     def train(
             self, 
             agents: list[RLAgent], 
@@ -107,7 +561,7 @@ class DecentralizedTrainer:
         :param exploration_mask: A binary vector to define how agent behaves within training.
                                  Whether explore or not for off-policy agent 
                                  and whether random sample or get mode for on-policy agent.
-                                 Default to :py:data:`None`, which mean all agents explore during training. 
+                                 Default to :py:data:`None`, which mean all RL agents explore during training. 
         :param plot: Plot a graph of metric evolulation and save it. 
         :return: Training statistic.
         """
@@ -116,19 +570,12 @@ class DecentralizedTrainer:
         # B - collected batch size
         # R - number of running envs 
         # O - observation-vector size
-        assert any(learning_mask), 'We need at least one learning agent.'
-        assert self.num_agents == len(agents), f'Please provide number of agents is {self.num_agents}'
-        assert self.num_agents == len(learning_mask), f'Please provide learning_mask size is {self.num_agents}'
-        if exploration_mask is None:
-            exploration_mask = np.ones_like(learning_mask, dtype=np.bool_)
-        assert self.num_agents == len(exploration_mask), f'Please provide exploration_mask size is {self.num_agents}'
-        for agent_index, agent in enumerate(agents):
-            if learning_mask[agent_index]:
-                assert agent.memory is not None, f'Learning agent {agent_index} must having a memory.'
-                assert self.num_agents*self.train_env.env_num == agent.memory.buffer_num
+        exploration_mask, storages = self.__check_agents(agents, learning_mask, exploration_mask, self.train_env.env_num)
+        self.__start_evaluator(agents)
         
         agents: dict[str, RLAgent] = {k: v for k, v in zip(self.agent_names, agents)}
         num_envs = self.train_env.env_num
+        groups = self.__inference_groups(agents.values(), exploration_mask)
         num_collected_steps = 0
         num_collected_episodes = 0
         num_gradient_steps = 0
@@ -138,96 +585,80 @@ class DecentralizedTrainer:
         episodes = []
         rewards = []
         start = time.time()
+        self.train_env.reset()
+        obs_o_e, action_mask_e, agent_e, done_e = self.__last(self.train_env)
+        # train function do some stuffs at beginning of every episode 
+        if self.train_fn:
+            self.train_fn(num_collected_episodes, num_collected_steps)
         while num_collected_episodes < self.episodes_per_train:
-            done_e = np.zeros(num_envs, dtype=np.bool_)
-            obs_e, _ = self.train_env.reset()
-            # train function do some stuffs at beginning of every episode 
-            if self.train_fn:
-                self.train_fn(num_collected_episodes, num_collected_steps)
-            while not all(done_e):
-                # ids and current observations of running envs
-                ids_r = np.where(done_e == False)[0]
-                obs_r = obs_e[ids_r]
-                # current agents of these envs
-                current_agents_r = np.array(self.train_env.get_env_attr('agent_selection', id = ids_r))
-                for agent_index, (name, agent) in enumerate(agents.items()):
-                    # indicies and of envs within running envs that have current agent is ```agent```
-                    # we call such env is right env
-                    env_inner_indicies_b = np.where(current_agents_r == name)[0]
-                    ids_b = ids_r[env_inner_indicies_b]
-                    obs_b = obs_r[env_inner_indicies_b]
-                    if len(env_inner_indicies_b) == 0:
-                        # skip if no env is in ```agent```'s turn
-                        continue
-
-                    # policy generate action from right envs
-                    obs_b_o = np.array([obs['observation'] for obs in obs_b])
-                    action_mask_b = np.array([obs['action_mask'] for obs in obs_b])
-                    if exploration_mask[agent_index]:
-                        # with policy_within_training_step(agent.policy):
+            # ids of running envs and their current agents
+            ids_r = np.flatnonzero(~done_e)
+            agent_r = agent_e[ids_r]
+            obs_o_r = self.__with_seat(obs_o_e[ids_r], agent_r)
+            act_r = self.__act(groups, obs_o_r, action_mask_e[ids_r], agent_r)
+
+            # step all running envs at once
+            next_obs_r_o, rew_r, terminated_r, truncated_r, info_r, next_state_r = self.__step(self.train_env, act_r, ids_r)
+            next_obs_r_o = self.__with_seat(next_obs_r_o, agent_r)
+
+            # add transitions to storages of learning agents
+            transitions_r = Batch(
+                obs=obs_o_r,
+                act=act_r,
+                rew=rew_r,
+                terminated=terminated_r,
+                truncated=truncated_r,
+                obs_next=next_obs_r_o,
+                info=info_r,
+            )
+            self.__add_transitions(storages, transitions_r, ids_r, agent_r)
+
+            num_collected_steps += ids_r.size
+
+            # policies updating
+            if ((num_collected_steps-last_num_collected_steps) >= self.update_freq):
+                for agent_index, agent in enumerate(agents.values()):
+                    if learning_mask[agent_index]:
+                        # with policy_within_training_step(agent.policy), torch_train_mode(agent.policy):
                         agent.policy.train()
-                        act_b = agent.infer_act(obs_b_o, action_mask_b, exploration_noise=True)
+                        num_bonus_steps = num_collected_steps-last_num_collected_steps
+                        num_gradient_steps += agent.policy_update_fn(self.batch_size, num_bonus_steps)
                         agent.policy.eval()
-                    else:
-                        act_b = agent.infer_act(obs_b_o, action_mask_b, exploration_noise=False)
-
-                    # step in the right envs
-                    next_obs_b, rew_b, terminated_b, truncated_b, info_b = self.train_env.step(act_b, ids_b)
-                    next_obs_b_o = np.array([obs['observation'] for obs in next_obs_b])
-
-                    # add transitions to memories of all learning agents, only shared memory now
-                    for a_i, a in enumerate(agents.values()):
-                        if learning_mask[a_i]:
-                            # mofify or reset data in one memory doesn't change data in the other
-                            # so we don't need to create copy of data to store in next buffer
-                            a.memory.add(
-                                Batch(
-                                    obs=obs_b_o,
-                                    act=act_b,
-                                    rew=rew_b,
-                                    terminated=terminated_b,
-                                    truncated=truncated_b,
-                                    obs_next=next_obs_b_o,
-                                    info=info_b,
-                                ),
-                                buffer_ids=ids_b*self.num_agents+agent_index,
-                            )
-
-                num_collected_steps += ids_r.size
+                self.__clear_on_policy_memories(list(agents.values()), learning_mask)
+                last_num_collected_steps=num_collected_steps
 
-                # policies updating
-                if ((num_collected_steps-last_num_collected_steps) >= self.update_freq):
-                    for agent_index, agent in enumerate(agents.values()):
-                        if learning_mask[agent_index]:
-                            # with policy_within_training_step(agent.policy), torch_train_mode(agent.policy):
-                            agent.policy.train()
-                            num_bonus_steps = num_collected_steps-last_num_collected_steps
-                            num_gradient_steps += agent.policy_update_fn(self.batch_size, num_bonus_steps)
-                            agent.policy.eval()
-                    last_num_collected_steps=num_collected_steps
+            # new observations, agents and dones of stepped envs
+            obs_o_e[ids_r], action_mask_e[ids_r], agent_e[ids_r], done_e[ids_r] = next_state_r
 
-                # observe new observations and dones of all envs 
-                last_e = [last() for last in self.train_env.get_env_attr('last')]
-                done_e = np.array([last[2] or last[3] for last in last_e])
-                obs_e = np.array([last[0] for last in last_e])
-
-            num_collected_episodes += num_envs
+            # envs whose episodes are counted now
+            if self.auto_reset:
+                ids_f = ids_r[done_e[ids_r]]
+            else:
+                ids_f = np.arange(num_envs) if all(done_e) else ids_r[:0]
+            if ids_f.size == 0:
+                continue
+            num_collected_episodes += ids_f.size
+            if self.auto_reset and self.train_fn:
+                for num_episodes in range(num_collected_episodes-ids_f.size+1, num_collected_episodes+1):
+                    self.train_fn(num_episodes, num_collected_steps)
 
             # test
             if (num_collected_episodes-last_num_collected_episodes) >= self.test_freq:
-                test_stats = self.test(agents.values(), eval_metrics=False)
-                num_steps, reward_metric = test_stats['mean_num_steps'], test_stats['reward']
-                if len(rewards) > 0 and reward_metric > rewards[-1] and self.save_best_fn:
-                    self.save_best_fn(num_collected_episodes)
-                episodes.append(num_collected_episodes)
-                rewards.append(reward_metric)
-                print("===episode {:04d} done with number steps: {:5.1f}, reward: {:+06.2f}==="
-                      .format((num_collected_episodes), num_steps, reward_metric))
                 last_num_collected_episodes = num_collected_episodes
                 # break if reach required reward
-                if self.stop_fn(rewards[-1], num_collected_episodes):
+                if self.__evaluate(list(agents.values()), learning_mask, num_collected_episodes, episodes, rewards):
                     break
+            elif self.__evaluator is not None and self.__collect_evaluations(episodes, rewards):
+                break
 
+            # start new episodes in finished envs
+            if num_collected_episodes < self.episodes_per_train:
+                self.train_env.reset(ids_f)
+                obs_o_e[ids_f], action_mask_e[ids_f], agent_e[ids_f], done_e[ids_f] = self.__last(self.train_env, ids_f)
+                if not self.auto_reset and self.train_fn:
+                    self.train_fn(num_collected_episodes, num_collected_steps)
+
+        self.__stop_evaluator(episodes, rewards)
         finish = time.time()      
         if self.save_last_fn:
             self.save_last_fn()
@@ -243,6 +674,277 @@ class DecentralizedTrainer:
             'training_time': finish - start,
             }
     
+    # it isn't name-mangled, so bound method can be pickled as target of spawned process
+    def _run_actor(
+            self,
+            actor_id: int,
+            agents: list[RLAgent],
+            exploration_mask: list|np.ndarray,
+            weights: list[tuple[int, dict[str, torch.Tensor], Any]],
+            version: Any,
+            transitions: Any,
+            stop: Any,
+            num_envs: int,
+            ticks_per_message: int,
+            seed: int,
+        ) -> None:
+        """
+        Actor of :py:meth:`train_async`. It plays games with snapshots of policies and sends transitions to learner.
+
+        :param actor_id: Index of actor.
+        :param agents: Agents without memories.
+        :param exploration_mask: Which agents explore.
+        :param weights: Index of an agent using the policy, shared parameters and shared :code:`eps` of each published policy.
+        :param version: Shared version of published parameters.
+        :param transitions: Queue of messages to learner.
+        :param stop: Event to stop.
+        :param num_envs: Number of enviroments of actor.
+        :param ticks_per_message: Number of steps of all enviroments sent in one message.
+        :param seed: Seed of actor, forked actors inherit random state of learner.
+        """
+        try:
+            # actors share the CPU, so each runs one thread
+            torch.set_num_threads(1)
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+            # learner stops reading queue at the end, so actor mustn't wait for flushing it
+            transitions.cancel_join_thread()
+            env = BatchedRoboticBoardGame(num_envs, auto_reset=True, **self.env_args)
+            env.reset(seed=seed)
+            groups = self.__inference_groups(agents, exploration_mask)
+            ids_e = np.arange(num_envs)
+            obs_o_e, action_mask_e, agent_e, _ = self.__last(env)
+            local_version = -1
+            ticks, num_finished_episodes = [], 0
+            while not stop.is_set():
+                # load the latest published parameters
+                if version.value != local_version:
+                    with version.get_lock():
+                        for agent_index, state, _ in weights:
+                            agents[agent_index].policy.load_state_dict(state)
+                        local_version = version.value
+                for agent_index, _, eps in weights:
+                    if eps is not None and eps.value != agents[agent_index].policy.eps:
+                        agents[agent_index].policy.set_eps(eps.value)
+                obs_o_e = self.__with_seat(obs_o_e, agent_e)
+                act_e = self.__act(groups, obs_o_e, action_mask_e, agent_e)
+                next_obs_e_o, rew_e, terminated_e, truncated_e, _, next_state_e = self.__step(env, act_e, ids_e)
+                ticks.append((obs_o_e, act_e, rew_e, terminated_e, truncated_e, self.__with_seat(next_obs_e_o, agent_e), agent_e))
+                num_finished_episodes += int(np.sum(terminated_e | truncated_e))
+                # finished games have been reset by enviroment
+                obs_o_e, action_mask_e, agent_e, _ = next_state_e
+                if len(ticks) < ticks_per_message:
+                    continue
+                message = (actor_id, ticks, num_finished_episodes)
+                ticks, num_finished_episodes = [], 0
+                while not stop.is_set():
+                    try:
+                        transitions.put(message, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            transitions.put((actor_id, e, 0))
+
+    def train_async(
+            self,
+            agents: list[RLAgent],
+            learning_mask: list|np.ndarray,
+            exploration_mask: list|np.ndarray|None = None,
+            num_actors: int|None = None,
+            envs_per_actor: int|None = None,
+            publish_freq: int = 100,
+            ticks_per_message: int = 8,
+            context: str|None = None,
+            plot: bool = True,
+        ) -> dict[str, Any]:
+        """
+        Off-policy agents learn while actor processes play. Each actor runs its own
+        :py:class:`BatchedRoboticBoardGame <rbgame.game.batched_game.BatchedRoboticBoardGame>`, chooses actions
+        with a snapshot of policies and streams transitions through a queue. Learner in the main process stores them
+        and updates policies continuously, so collecting and learning overlap. Parameters and :code:`eps` of
+        learning policies are published through shared memory, actors load them before their next step.
+        Training stops when :code:`episodes_per_train` episodes are collected, actors may have played some more.
+
+        Learner does :code:`update_per_step` gradient steps per received step, but at least one gradient step per round,
+        so it doesn't idle when actors are slower. Memories of learning agents must have 
+        :code:`num_agents*num_actors*envs_per_actor` sub-buffers, policies must be on CPU.
+        :code:`train_fn` is called after each finished episode, test is run after each :code:`test_freq` episodes,
+        by learner or in background if :code:`background_test` is on.
+
+        :param agents: :py:class:`list` of agents, which participate in game.
+        :param learning_mask: A binary vector to define which agent need to learn. Learning agents must be off-policy agents.
+        :param exploration_mask: A binary vector to define which agents explore.
+                                 Default to :py:data:`None`, which mean all RL agents explore during training. 
+        :param num_actors: Number of actor processes. Default to number of CPUs minus one for learner.
+        :param envs_per_actor: Number of enviroments of each actor. Default to :code:`num_train_envs` divided among actors.
+        :param publish_freq: After how many gradient steps are parameters published.
+        :param ticks_per_message: Number of steps of all enviroments of an actor, which are sent together.
+        :param context: Start method of actors, see :py:func:`multiprocessing.get_context`.
+        :param plot: Plot a graph of metric evolulation and save it. 
+        :return: Training statistic.
+        """
+        if num_actors is None:
+            num_actors = max((os.cpu_count() or 2) - 1, 1)
+        if envs_per_actor is None:
+            envs_per_actor = max(self.train_env.env_num // num_actors, 1)
+        for agent_index, agent in enumerate(agents):
+            if learning_mask[agent_index]:
+                assert isinstance(agent, OffPolicyAgent), f'Learning agent {agent_index} must be off-policy agent.'
+        exploration_mask, storages = self.__check_agents(agents, learning_mask, exploration_mask, num_actors*envs_per_actor)
+
+        ctx = mp.get_context(context)
+        # parameters of each learning policy in shared memory
+        policies: list[tuple[RLAgent, dict[str, torch.Tensor], Any]] = []
+        weights: list[tuple[int, dict[str, torch.Tensor], Any]] = []
+        published = set()
+        for agent_index, agent in enumerate(agents):
+            if learning_mask[agent_index] and id(agent.policy) not in published:
+                published.add(id(agent.policy))
+                state = {k: v.detach().cpu().clone().share_memory_() for k, v in agent.policy.state_dict().items()}
+                eps = ctx.Value('d', agent.policy.eps, lock=False) if hasattr(agent.policy, 'set_eps') else None
+                policies.append((agent, state, eps))
+                weights.append((agent_index, state, eps))
+        version = ctx.Value('q', 0)
+
+        def publish():
+            with version.get_lock():
+                for agent, state, eps in policies:
+                    for k, v in agent.policy.state_dict().items():
+                        state[k].copy_(v)
+                version.value += 1
+
+        # actors don't need memories
+        actor_agents = []
+        for agent in agents:
+            actor_agent = copy.copy(agent)
+            actor_agent.memory = None
+            actor_agents.append(actor_agent)
+        # hooks and enviroments of trainer stay in learner
+        actor_trainer = copy.copy(self)
+        for key in ('train_env', 'test_env', 'train_fn', 'test_fn', 'save_best_fn', 'save_last_fn', 'stop_fn', 'reward_metric'):
+            setattr(actor_trainer, key, None)
+
+        num_collected_steps = 0
+        num_collected_episodes = 0
+        num_gradient_steps = 0
+        last_num_collected_steps = num_collected_steps
+        last_num_collected_episodes = num_collected_episodes
+        last_num_gradient_steps = num_gradient_steps
+        # lists to record data for plotting
+        episodes = []
+        rewards = []
+        start = time.time()
+        if self.train_fn:
+            self.train_fn(num_collected_episodes, num_collected_steps)
+        publish()
+        self.__start_evaluator(agents)
+
+        transitions = ctx.Queue(maxsize=2*num_actors)
+        stop = ctx.Event()
+        actors = []
+        for actor_id in range(num_actors):
+            actor = ctx.Process(
+                target=actor_trainer._run_actor,
+                args=(actor_id, actor_agents, exploration_mask, weights, version, transitions, stop,
+                      envs_per_actor, ticks_per_message, int(np.random.randint(2**31))),
+                daemon=True,
+            )
+            actor.start()
+            actors.append(actor)
+
+        try:
+            while num_collected_episodes < self.episodes_per_train:
+                # wait for transitions only if there is nothing to learn from
+                ready = all(len(storage) >= self.batch_size for storage, _ in storages.values())
+                messages = []
+                try:
+                    messages.append(transitions.get_nowait() if ready else transitions.get(timeout=1.0))
+                    while len(messages) < num_actors:
+                        messages.append(transitions.get_nowait())
+                except queue.Empty:
+                    if not messages and not ready and not all(actor.is_alive() for actor in actors):
+                        raise RuntimeError('An actor has exited unexpectedly.')
+
+                stop_training = False
+                for actor_id, ticks, num_finished_episodes in messages:
+                    if isinstance(ticks, Exception):
+                        raise ticks
+                    for obs_o, act, rew, terminated, truncated, obs_next_o, agent in ticks:
+                        transitions_e = Batch(
+                            obs=obs_o,
+                            act=act,
+                            rew=rew,
+                            terminated=terminated,
+                            truncated=truncated,
+                            obs_next=obs_next_o,
+                            info=Batch(transition_belongs_agent=agent),
+                        )
+                        ids_e = actor_id*envs_per_actor + np.arange(envs_per_actor)
+                        self.__add_transitions(storages, transitions_e, ids_e, agent)
+                        num_collected_steps += envs_per_actor
+                    for _ in range(num_finished_episodes):
+                        num_collected_episodes += 1
+                        if self.train_fn:
+                            self.train_fn(num_collected_episodes, num_collected_steps)
+                    # test
+                    if (num_collected_episodes-last_num_collected_episodes) >= self.test_freq:
+                        last_num_collected_episodes = num_collected_episodes
+                        # break if reach required reward
+                        if self.__evaluate(agents, learning_mask, num_collected_episodes, episodes, rewards):
+                            stop_training = True
+                            break
+                    elif self.__evaluator is not None and self.__collect_evaluations(episodes, rewards):
+                        stop_training = True
+                        break
+                if stop_training:
+                    break
+
+                # policies updating
+                if all(len(storage) >= self.batch_size for storage, _ in storages.values()):
+                    num_bonus_steps = num_collected_steps-last_num_collected_steps
+                    for agent_index, agent in enumerate(agents):
+                        if learning_mask[agent_index]:
+                            agent.policy.train()
+                            num_gradient_steps += agent.policy_update_fn(
+                                self.batch_size, max(num_bonus_steps, math.ceil(1/agent.update_per_step)))
+                            agent.policy.eval()
+                    last_num_collected_steps = num_collected_steps
+
+                # publish eps changed by train_fn and new parameters
+                for agent, _, eps in policies:
+                    if eps is not None:
+                        eps.value = agent.policy.eps
+                if num_gradient_steps-last_num_gradient_steps >= publish_freq:
+                    publish()
+                    last_num_gradient_steps = num_gradient_steps
+            self.__stop_evaluator(episodes, rewards)
+        finally:
+            self.__stop_evaluator(episodes, rewards, wait=False)
+            stop.set()
+            for actor in actors:
+                actor.join(timeout=5)
+                if actor.is_alive():
+                    actor.terminate()
+            transitions.cancel_join_thread()
+
+        finish = time.time()
+        if self.save_last_fn:
+            self.save_last_fn()
+
+        if plot:
+            self.plot_stats(episodes, rewards)
+
+        return {
+            'reward_metric_stats': rewards,
+            'num_collected_steps': num_collected_steps,
+            'num_collected_episodes': num_collected_episodes,
+            'num_gradient_steps': num_gradient_steps,
+            'training_time': finish - start,
+            }
+
     @staticmethod
     def plot_stats(episodes: list[int], rewards: list[float]) -> None:
         fig, axes = plt.subplots(1, 1, figsize=(6, 4))
@@ -260,12 +962,18 @@ class DecentralizedTrainer:
             self, 
             agents: list[RLAgent], 
             eval_metrics: bool = False,
+            baseline: float|None = None,
         ) -> dict[str, Any]:
         """
-        Test trained agents.
+        Test trained agents. Results of episodes are accumulated in the order, in which episodes were started,
+        so a test stopped early doesn't favor short episodes. Test stops early after :code:`min_episodes_per_test` episodes,
+        when the confidence interval of the reward is narrower than :code:`2*test_precision`
+        or lies below :code:`baseline`, episodes running at that moment are dropped.
+        The interval is of the mean of per-episode rewards, so it is meaningful for reward metrics averaging over episodes, as the default one.
 
         :param agents: :py:class:`list` of agents, which participate in game.
         :param eval_metrics: Evaluate some addition metric of game process.
+        :param baseline: Reward of the best agents so far. Default to :py:data:`None`, which means no comparison.
         :return: Testing statistic.
         """
 
@@ -279,68 +987,107 @@ class DecentralizedTrainer:
 
         agents: dict[str, RLAgent] = {k: v for k, v in zip(self.agent_names, agents)}
         num_envs = self.test_env.env_num
+        groups = self.__inference_groups(agents.values())
+        sequential = self.test_precision is not None or baseline is not None
         num_collected_steps = 0
-        num_collected_episodes = 0
         num_finished_episodes = 0
-        rewards_p_a = np.array([]).reshape(0, self.num_agents)
-        if eval_metrics:
-            time_spans = 0
-            count_wins = Counter()
-        while num_collected_episodes < self.episodes_per_test:
-            rewards_e_a = np.zeros((num_envs, self.num_agents))
-            done_e = np.zeros(num_envs, dtype=np.bool_)
-            obs_e, _ = self.test_env.reset()
-            if self.test_fn:
-                self.test_fn(num_collected_episodes, num_collected_steps)
-            while not all(done_e):
-                # ids and current observations of running envs
-                ids_r = np.where(done_e == False)[0]
-                obs_r = obs_e[ids_r]
-                
-                # current agents of these envs
-                current_agents_r = np.array(self.test_env.get_env_attr('agent_selection', id = ids_r))
-                for agent_index, (name, agent) in enumerate(agents.items()):
-                    # indicies of envs within running envs that have current agent is ```agent```
-                    # we call such env is right env
-                    env_inner_indicies_b = np.where(current_agents_r == name)[0]
-                    ids_b = ids_r[env_inner_indicies_b]
-                    obs_b = obs_r[env_inner_indicies_b]
-                    if len(env_inner_indicies_b) == 0:
-                        # skip if no env is in ```agent```'s turn
-                        continue
-
-                    # policy generate action from right envs
-                    obs_b_o = np.array([obs['observation'] for obs in obs_b])
-                    action_mask_b = np.array([obs['action_mask'] for obs in obs_b])
-                    act_b = agent.infer_act(obs_b_o, action_mask_b, exploration_noise=False)
-
-                    # step in the right envs
-                    _, rew_b, _, _, _ = self.test_env.step(act_b, ids_b)
-                    rewards_e_a[ids_b, agent_index] += rew_b
-
-                num_collected_steps += ids_r.size
-
-                # observe new observations and dones of all envs 
-                last_e = [last() for last in self.test_env.get_env_attr('last')]
-                done_e = np.array([last[2] or last[3] for last in last_e])
-                obs_e = np.array([last[0] for last in last_e])
-
-            num_collected_episodes += num_envs
-            rewards_p_a = np.concatenate((rewards_p_a, rewards_e_a), axis=0)
+        # episodes, which are finished together with all episodes started before them
+        num_counted_episodes = 0
+        # results of episodes in starting order, the last batch of episodes may exceed episodes_per_test
+        max_episodes = self.episodes_per_test + num_envs
+        rewards_p_a = np.zeros((max_episodes, self.num_agents))
+        steps_p = np.zeros(max_episodes, dtype=np.int64)
+        finished_p = np.zeros(max_episodes, dtype=np.bool_)
+        winners_p = np.full(max_episodes, None, dtype=object)
+        game_times_p = np.zeros(max_episodes)
+        # streaming statistics of counted episodes
+        reward_stats = RunningStats()
+        steps_stats = RunningStats()
+        time_span_stats = RunningStats()
+        count_wins = Counter()
+        self.test_env.reset()
+        obs_o_e, action_mask_e, agent_e, done_e = self.__last(self.test_env)
+        # episode played in each env
+        episode_e = np.arange(num_envs)
+        num_started_episodes = num_envs
+        if self.test_fn:
+            self.test_fn(num_finished_episodes, num_collected_steps)
+        while not all(done_e):
+            # ids of running envs and their current agents
+            ids_r = np.flatnonzero(~done_e)
+            agent_r = agent_e[ids_r]
+            act_r = self.__act(groups, self.__with_seat(obs_o_e[ids_r], agent_r), action_mask_e[ids_r], agent_r)
+
+            # step all running envs at once
+            _, rew_r, _, _, _, next_state_r = self.__step(self.test_env, act_r, ids_r)
+            rewards_p_a[episode_e[ids_r], agent_r] += rew_r
+            steps_p[episode_e[ids_r]] += 1
+
+            num_collected_steps += ids_r.size
+
+            # new observations, agents and dones of stepped envs
+            obs_o_e[ids_r], action_mask_e[ids_r], agent_e[ids_r], done_e[ids_r] = next_state_r
+
+            # envs whose episodes are counted now
+            if self.auto_reset:
+                ids_f = ids_r[done_e[ids_r]]
+            else:
+                ids_f = np.arange(num_envs) if all(done_e) else ids_r[:0]
+            if ids_f.size == 0:
+                continue
+            episodes_f = episode_e[ids_f]
+            finished_p[episodes_f] = True
             if eval_metrics:
-                winners_e = np.array(self.test_env.get_env_attr('winner'))
-                id_finished_envs =  np.where(winners_e != None)[0]
-                time_spans += sum([clock.now for clock in self.test_env.get_env_attr('game_clock', id=id_finished_envs)])
-                num_finished_episodes += id_finished_envs.size
-                count_wins.update(winners_e)
-        reward = self.reward_metric(rewards_p_a)  
+                winners_p[episodes_f] = self.test_env.get_env_attr('winner', id=ids_f)
+                game_times_p[episodes_f] = self.__game_times(self.test_env, ids_f)
+            num_finished_episodes += ids_f.size
+            if self.auto_reset and self.test_fn:
+                for num_episodes in range(num_finished_episodes-ids_f.size+1, num_finished_episodes+1):
+                    self.test_fn(num_episodes, num_collected_steps)
+
+            # accumulate episodes, which are finished together with all episodes started before them
+            waiting = ~finished_p[num_counted_episodes:num_started_episodes]
+            num_ready = int(waiting.argmax()) if waiting.any() else waiting.size
+            if num_ready > 0:
+                ready = slice(num_counted_episodes, num_counted_episodes+num_ready)
+                reward_stats.update([self.reward_metric(rewards_p_a[p:p+1]) for p in range(ready.start, ready.stop)])
+                steps_stats.update(steps_p[ready])
+                if eval_metrics:
+                    winners = winners_p[ready]
+                    time_span_stats.update(game_times_p[ready][winners != None])
+                    count_wins.update(winners)
+                num_counted_episodes += num_ready
+
+            # stop as soon as reward is determined precisely enough or clearly worse than baseline
+            if sequential and num_counted_episodes >= self.min_episodes_per_test:
+                half_width = reward_stats.half_width(self.test_confidence)
+                if self.test_precision is not None and half_width <= self.test_precision:
+                    break
+                if baseline is not None and reward_stats.mean + half_width < baseline:
+                    break
+
+            # start new episodes in finished envs
+            if self.auto_reset:
+                # don't start more episodes than required, otherwise short episodes would be over-represented
+                ids_n = ids_f[:max(self.episodes_per_test-num_started_episodes, 0)]
+            else:
+                ids_n = ids_f if num_finished_episodes < self.episodes_per_test else ids_f[:0]
+            if ids_n.size > 0:
+                self.test_env.reset(ids_n)
+                obs_o_e[ids_n], action_mask_e[ids_n], agent_e[ids_n], done_e[ids_n] = self.__last(self.test_env, ids_n)
+                episode_e[ids_n] = np.arange(num_started_episodes, num_started_episodes+ids_n.size)
+                num_started_episodes += ids_n.size
+                if not self.auto_reset and self.test_fn:
+                    self.test_fn(num_finished_episodes, num_collected_steps)
+
+        reward = self.reward_metric(rewards_p_a[:num_counted_episodes])
         test_stats = {
             'reward': reward,
-            'mean_num_steps': num_collected_steps/num_collected_episodes,
+            'reward_interval': reward_stats.interval(self.test_confidence),
+            'mean_num_steps': steps_stats.mean,
             'num_collected_steps': num_collected_steps,
-            'num_collected_episodes': num_collected_episodes,
+            'num_collected_episodes': num_counted_episodes,
         }
         if eval_metrics:
-            test_stats.update({'time_spans': time_spans/num_finished_episodes, 'count_wins': dict(count_wins)})
+            test_stats.update({'time_spans': time_span_stats.mean, 'count_wins': dict(count_wins)})
         return test_stats
- 
\ No newline at end of file
@@ -1,4 +1,5 @@
-from typing import Any
+from __future__ import annotations
+from typing import Any, TYPE_CHECKING
 import importlib
 import os
 
@@ -6,7 +7,9 @@ import yaml
 import torch
 
 from rbgame.agent.astar_agent import AStarAgent
-from rbgame.agent.rl_agent import OffPolicyAgent
+from rbgame.agent.exported_agent import ExportedAgent
+if TYPE_CHECKING:
+    from rbgame.agent.rl_agent import OffPolicyAgent
 
 def set_class(config: dict[str, Any], key: str) -> None:
     """
@@ -41,6 +44,9 @@ def dqn_constructor(num_robots: int, with_battery: bool) -> OffPolicyAgent:
     :param with_battery: Battery is considered or not.
     :return: The agent.
     """
+    # tianshou is imported only when it is needed
+    from rbgame.agent.rl_agent import OffPolicyAgent
+
     ckpt = str(num_robots)+'-b' if with_battery else str(num_robots)
     with open(os.path.join(os.getcwd(), 'checkpoints', ckpt, 'policy.yaml'), "r") as file:
         data = yaml.safe_load(file)
@@ -67,6 +73,18 @@ def dqn_constructor(num_robots: int, with_battery: bool) -> OffPolicyAgent:
     agent = OffPolicyAgent(policy)
     return agent
 
+def exported_constructor(num_robots: int, with_battery: bool) -> ExportedAgent:
+    """
+    Initialize a :py:class:`ExportedAgent <rbgame.agent.exported_agent.ExportedAgent>` from policy exported 
+    by :py:meth:`RLAgent.export <rbgame.agent.rl_agent.RLAgent.export>` to :code:`policy.pt` in checkpoint directory.
+
+    :param num_robots: Number robots of the game.
+    :param with_battery: Battery is considered or not.
+    :return: The agent.
+    """
+    ckpt = str(num_robots)+'-b' if with_battery else str(num_robots)
+    return ExportedAgent(os.path.join(os.getcwd(), 'checkpoints', ckpt, 'policy.pt'))
+
 def astar_constructor(num_robots: int, with_battery: bool) -> AStarAgent:
     """
     Initialize a :py:class:`AStarAgent`.
@@ -0,0 +1,152 @@
+import os
+import random
+
+import numpy as np
+
+from rbgame.agent.astar_agent import AStarAgent, Graph, UNREACHABLE
+from rbgame.game.game import RoboticBoardGame
+from rbgame.game.topology import NO_NEIGHBOR
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+COLORS_MAP = os.path.join(CSV_FILES, 'colors_map.csv')
+TARGETS_MAP = os.path.join(CSV_FILES, 'targets_map.csv')
+ENV_ARGS = dict(
+    colors_map=COLORS_MAP,
+    targets_map=TARGETS_MAP,
+    required_mail=3,
+    robot_colors=['r', 'b'],
+    num_robots_per_player=2,
+    with_battery=True,
+    max_step=300,
+)
+
+def bfs_distance(graph: Graph, start: int, goal: int, occupied: set[int]) -> int|None:
+    """Reference length of the shortest path, which avoids colored vertices and robots except start and goal."""
+    distances = {start: 0}
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for current in frontier:
+            if current == goal:
+                return distances[current]
+            for neighbor in graph.topology.neighbor_lists[current]:
+                if neighbor == NO_NEIGHBOR or neighbor in distances:
+                    continue
+                if (graph.static_blocked[neighbor] or neighbor in occupied) and neighbor != goal:
+                    continue
+                distances[neighbor] = distances[current] + 1
+                next_frontier.append(neighbor)
+        frontier = next_frontier
+    return None
+
+def assert_valid_path(graph: Graph, start: int, goal: int, occupied: set[int], path: list[int]) -> None:
+    current = start
+    for index in path:
+        assert index in graph.topology.neighbor_lists[current]
+        if index != goal:
+            assert not graph.static_blocked[index] and index not in occupied
+        current = index
+    assert current == goal
+
+def random_boards(graph: Graph, num_boards: int, seed: int):
+    """Random start, goal and robots, start is white or colored, goal is any vertex."""
+    rng = random.Random(seed)
+    white = [graph.index(v) for v in graph.white_vertecies]
+    for _ in range(num_boards):
+        start = rng.randrange(graph.topology.num_cells)
+        goal = rng.randrange(graph.topology.num_cells)
+        occupied = set(rng.sample(white, k=rng.randrange(0, 20))) | {start}
+        yield start, goal, occupied
+
+def test_a_star_search_finds_shortest_paths():
+    graph = Graph(COLORS_MAP, TARGETS_MAP)
+    for start, goal, occupied in random_boards(graph, 500, seed=0):
+        start_v, goal_v = graph.flat_vertices[start], graph.flat_vertices[goal]
+        path = [graph.index(v) for v in graph.a_star_search(start_v, goal_v, occupied)]
+        distance = bfs_distance(graph, start, goal, occupied)
+        if distance is None or start == goal:
+            assert path == []
+            continue
+        assert len(path) == distance
+        assert_valid_path(graph, start, goal, occupied, path)
+
+def test_distance_field_matches_breadth_first_search():
+    graph = Graph(COLORS_MAP, TARGETS_MAP)
+    for goal_v in graph.yellow_vertices + graph.red_vertices + graph.green_vertices + graph.blue_vertices:
+        goal = graph.index(goal_v)
+        field = graph.distance_field(goal_v)
+        assert graph.distance_field(goal_v) is field
+        for v in range(graph.topology.num_cells):
+            if graph.static_blocked[v] and v != goal:
+                assert field[v] == UNREACHABLE
+            else:
+                distance = bfs_distance(graph, v, goal, set())
+                assert field[v] == (UNREACHABLE if distance is None else distance)
+
+def test_plan_finds_shortest_paths():
+    graph = Graph(COLORS_MAP, TARGETS_MAP)
+    for start, goal, occupied in random_boards(graph, 500, seed=1):
+        start_v, goal_v = graph.flat_vertices[start], graph.flat_vertices[goal]
+        path = [graph.index(v) for v in graph.plan(start_v, goal_v, occupied)]
+        distance = bfs_distance(graph, start, goal, occupied)
+        if distance is None or start == goal:
+            assert path == []
+            continue
+        assert len(path) == distance
+        assert_valid_path(graph, start, goal, occupied, path)
+
+def make_agent() -> AStarAgent:
+    return AStarAgent(COLORS_MAP, TARGETS_MAP, num_robots=4, maximum_battery=10)
+
+def test_get_actions_matches_get_action():
+    random.seed(0)
+    env = RoboticBoardGame(**ENV_ARGS)
+    agent = make_agent()
+    graph = agent.graph
+    obs_l, mask_l, actions = [], [], []
+    for seed in range(10):
+        env.reset(seed=seed)
+        while not any(env.last()[2:4]):
+            obs = env.last()[0]
+            obs_l.append(obs['observation'])
+            mask_l.append(obs['action_mask'])
+            actions.append(agent.get_action(obs))
+            env.step(actions[-1])
+    obs_b, mask_b, actions = np.array(obs_l), np.array(mask_l), np.array(actions)
+    actions_b = agent.get_actions(obs_b, mask_b)
+    # a batch is computed like single-row batches
+    assert all(agent.get_actions(obs_b[i:i+1], mask_b[i:i+1])[0] == actions_b[i] for i in range(len(obs_b)))
+
+    differ = np.flatnonzero(actions_b != actions)
+    assert differ.size <= 0.005*len(obs_b)
+    for i in differ:
+        # only first steps of equally short paths may differ
+        agent.get_action({'observation': obs_b[i], 'action_mask': mask_b[i]})
+        robot = agent.robots[0]
+        occupied = {graph.index(r.pos) for r in agent.robots}
+        neighbors = [robot.pos.front, robot.pos.back, robot.pos.left, robot.pos.right]
+        assert actions[i] != 0 and actions_b[i] != 0
+        assert len(graph.a_star_search(neighbors[actions[i] - 1], robot.dest, occupied)) \
+            == len(graph.a_star_search(neighbors[actions_b[i] - 1], robot.dest, occupied))
+
+def test_get_actions_wins_as_often_as_get_action():
+    random.seed(0)
+    env = RoboticBoardGame(**ENV_ARGS)
+    agents = [make_agent() for _ in range(2)]
+    num_games = 100
+    num_batched_wins = 0
+    for game in range(num_games):
+        # every seed is played twice, the player using get_actions swaps
+        env.reset(seed=game // 2)
+        batched = game % 2
+        while not any(env.last()[2:4]):
+            obs = env.last()[0]
+            player = ENV_ARGS['robot_colors'].index(env.agent_selection[0])
+            if player == batched:
+                action = agents[player].get_actions(obs['observation'][None], obs['action_mask'][None])[0]
+            else:
+                action = agents[player].get_action(obs)
+            env.step(action)
+        assert env.winner is not None
+        num_batched_wins += ENV_ARGS['robot_colors'].index(env.winner) == batched
+    assert abs(num_batched_wins - num_games/2) <= 0.05*num_games
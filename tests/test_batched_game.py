@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+from rbgame.game.batched_game import BatchedRoboticBoardGame
+from rbgame.game.game import GameState, RoboticBoardGame
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+
+def env_args(**kwargs) -> dict:
+    args = dict(
+        colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+        targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+        required_mail=2,
+        robot_colors=['r', 'b'],
+        num_robots_per_player=2,
+        with_battery=True,
+        max_step=300,
+    )
+    args.update(kwargs)
+    return args
+
+def state_of(env: BatchedRoboticBoardGame, game: int, rng_state) -> GameState:
+    winner = env.winners[game]
+    return GameState(
+        env.positions[game].copy(),
+        env.mails[game].copy(),
+        env.batteries[game].copy(),
+        env.stand_times[game].copy(),
+        env.count_mails[game].copy(),
+        env.cell_mails[game, env.board.green_cells].copy(),
+        int(env.agent_indices[game]),
+        int(env.steps_to_change_turn[game]),
+        int(env.num_steps[game]),
+        int(env.clocks[game]),
+        None if winner < 0 else env.robot_colors[winner],
+        rng_state,
+    )
+
+@pytest.mark.parametrize('kwargs', [{}, {'with_battery': False, 'robot_colors': ['r', 'b', 'gr']}])
+def test_batched_game_matches_single_game(kwargs):
+    num_envs = 8
+    env = BatchedRoboticBoardGame(num_envs, auto_reset=False, seed=0, **env_args(**kwargs))
+    single = RoboticBoardGame(**env_args(**kwargs))
+    single.reset(seed=0)
+    rng = np.random.default_rng(0)
+    num_checked = 0
+    for _ in range(300):
+        obs, _, terminated, truncated, _ = env.last()
+        ids = np.flatnonzero(~(terminated | truncated))
+        if ids.size == 0:
+            break
+        act = np.array([
+            int(rng.choice(np.flatnonzero(mask))) if mask.any() else 0 for mask in obs.action_mask[ids]
+        ])
+        # drive the single game from the state of each batched game and compare one step
+        expected = []
+        for game, action in zip(ids, act):
+            single.set_state(state_of(env, game, single.rng.getstate()))
+            single_obs = single.observe(single.agent_selection)
+            np.testing.assert_array_equal(single_obs['observation'], obs.observation[game])
+            np.testing.assert_array_equal(single_obs['action_mask'], obs.action_mask[game])
+            expected.append((*single.step(int(action)), single.get_state()))
+        next_obs, rew, terminated, truncated, info = env.step(act, ids)
+        for k, (single_obs, reward, single_terminated, single_truncated, single_info, state) in enumerate(expected):
+            np.testing.assert_array_equal(next_obs.observation[k], single_obs['observation'])
+            np.testing.assert_array_equal(next_obs.action_mask[k], single_obs['action_mask'])
+            assert rew[k] == pytest.approx(reward)
+            assert terminated[k] == single_terminated and truncated[k] == single_truncated
+            assert info.transition_belongs_agent[k] == single_info['transition_belongs_agent']
+            assert info.next_agent[k] == single_info['next_agent']
+            # new mails in green cells are drawn from different random streams, robots don't depend on them
+            game = ids[k]
+            np.testing.assert_array_equal(env.positions[game], state.positions)
+            np.testing.assert_array_equal(env.mails[game], state.mails)
+            np.testing.assert_allclose(env.batteries[game], state.batteries)
+            np.testing.assert_array_equal(env.stand_times[game], state.stand_times)
+            np.testing.assert_array_equal(env.count_mails[game], state.count_mails)
+        num_checked += ids.size
+    assert num_checked > 500
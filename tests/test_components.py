@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from rbgame.game.components import ACTION_MASKS, BATTERY_BUCKETS, NUM_MAILS, Board
+from rbgame.game.consts import MAXIMUM_ROBOT_BATTERY
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+
+def test_action_table_matches_rules():
+    board = Board(os.path.join(CSV_FILES, 'colors_map.csv'), os.path.join(CSV_FILES, 'targets_map.csv'))
+    rng = np.random.default_rng(0)
+    for k, cell in enumerate(board.flat_cells):
+        neighbors = [cell.front, cell.back, cell.left, cell.right]
+        for mail in range(NUM_MAILS):
+            for battery in range(MAXIMUM_ROBOT_BATTERY + 1):
+                can_move = [cell.can_move_to(neighbor, mail, battery) for neighbor in neighbors]
+                for stand_too_long in (False, True):
+                    occupied = int(rng.integers(16))
+                    expected = int(cell.can_stand(mail, battery, stand_too_long))
+                    for direction, movable in enumerate(can_move):
+                        if movable and not occupied >> direction & 1:
+                            expected |= 2 << direction
+                    legal_actions = int(board.action_table[k, mail, BATTERY_BUCKETS[battery], int(stand_too_long), occupied])
+                    assert legal_actions == expected, (cell, mail, battery, stand_too_long, occupied)
+
+def test_action_masks_are_bits_of_legal_actions():
+    for legal_actions, mask in enumerate(ACTION_MASKS):
+        assert sum(int(bit) << action for action, bit in enumerate(mask)) == legal_actions
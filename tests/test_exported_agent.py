@@ -0,0 +1,53 @@
+import gymnasium
+import numpy as np
+import pytest
+import torch
+from tianshou.policy import DQNPolicy, PPOPolicy
+from tianshou.utils.net.common import ActorCritic, Net
+from tianshou.utils.net.discrete import Actor, Critic
+
+from rbgame.agent.exported_agent import ExportedAgent
+from rbgame.agent.rl_agent import OffPolicyAgent, OnPolicyAgent, RLAgent
+
+OBSERVATION_SIZE = 16
+
+def dqn_agent() -> RLAgent:
+    net = Net(
+        state_shape=OBSERVATION_SIZE,
+        action_shape=5,
+        hidden_sizes=[32, 32],
+        dueling_param=({'hidden_sizes': [16]}, {'hidden_sizes': [16]}),
+    )
+    policy = DQNPolicy(model=net, optim=torch.optim.Adam(net.parameters(), 1e-3), action_space=gymnasium.spaces.Discrete(5))
+    return OffPolicyAgent(policy)
+
+def ppo_agent() -> RLAgent:
+    actor = Actor(Net(state_shape=OBSERVATION_SIZE, hidden_sizes=[32]), 5)
+    critic = Critic(Net(state_shape=OBSERVATION_SIZE, hidden_sizes=[32]))
+    policy = PPOPolicy(
+        actor=actor,
+        critic=critic,
+        optim=torch.optim.Adam(ActorCritic(actor, critic).parameters(), 1e-3),
+        dist_fn=torch.distributions.Categorical,
+        action_space=gymnasium.spaces.Discrete(5),
+        deterministic_eval=True,
+        action_scaling=False,
+    )
+    return OnPolicyAgent(policy)
+
+@pytest.mark.parametrize('make_agent', [dqn_agent, ppo_agent])
+def test_exported_agent_chooses_same_actions(make_agent, tmp_path):
+    torch.manual_seed(0)
+    agent = make_agent()
+    path = str(tmp_path/'policy.pt')
+    agent.export(path)
+    exported = ExportedAgent(path)
+
+    rng = np.random.default_rng(0)
+    obs_b_o = rng.random((200, OBSERVATION_SIZE)).astype(np.float32)
+    mask_b = (rng.random((200, 5)) > 0.5).astype(np.int8)
+    mask_b[:, 0] = 1
+    expected = [agent.get_action({'observation': obs, 'action_mask': mask}) for obs, mask in zip(obs_b_o, mask_b)]
+    assert [exported.get_action({'observation': obs, 'action_mask': mask}) for obs, mask in zip(obs_b_o, mask_b)] == expected
+    np.testing.assert_array_equal(exported.infer_act(obs_b_o, mask_b), expected)
+    np.testing.assert_array_equal(exported.get_actions(obs_b_o, mask_b), expected)
@@ -0,0 +1,96 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from rbgame.game.game import RoboticBoardGame
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+
+def make_env(**kwargs) -> RoboticBoardGame:
+    env_args = dict(
+        colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+        targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+        required_mail=2,
+        robot_colors=['r', 'b'],
+        num_robots_per_player=2,
+        with_battery=True,
+        max_step=200,
+    )
+    env_args.update(kwargs)
+    return RoboticBoardGame(**env_args)
+
+def random_action(rng: np.random.Generator, action_mask: np.ndarray) -> int:
+    legal = np.flatnonzero(action_mask)
+    return int(rng.choice(legal)) if legal.size else 0
+
+@pytest.mark.parametrize('kwargs', [{}, {'random_num_steps': True}, {'zero_copy_obs': True}])
+def test_step_info_matches_last(kwargs):
+    env = make_env(**kwargs)
+    rng = np.random.default_rng(0)
+    for seed in range(2):
+        env.reset(seed=seed)
+        while True:
+            obs, _, terminated, truncated, _ = env.last()
+            if terminated or truncated:
+                break
+            info = env.step(random_action(rng, obs['action_mask']))[4]
+            next_obs, _, terminated, truncated, _ = env.last()
+            assert info['next_agent'] == env.agents.index(env.agent_selection)
+            assert info['next_done'] == (terminated or truncated)
+            np.testing.assert_array_equal(info['next_obs']['observation'], next_obs['observation'])
+            np.testing.assert_array_equal(info['next_obs']['action_mask'], next_obs['action_mask'])
+
+def play(env: RoboticBoardGame, rng: np.random.Generator, max_ticks: int) -> list[tuple]:
+    trajectory = []
+    for _ in range(max_ticks):
+        obs, _, terminated, truncated, _ = env.last()
+        if terminated or truncated:
+            break
+        agent = env.agent_selection
+        # mostly legal actions, sometimes illegal ones
+        action = random_action(rng, obs['action_mask']) if rng.random() < 0.95 else int(rng.integers(5))
+        next_obs, reward, terminated, truncated, info = env.step(action)
+        trajectory.append((
+            agent, action, next_obs['observation'].tolist(), next_obs['action_mask'].tolist(), reward,
+            terminated, truncated, info['transition_belongs_agent'], env.winner, env.num_steps,
+        ))
+    return trajectory
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'random_num_steps': True},
+    {'with_battery': False, 'robot_colors': ['r', 'b', 'gr'], 'num_robots_per_player': 1},
+])
+def test_array_backend_matches_object_backend(kwargs):
+    for seed in range(3):
+        object_env = make_env(**kwargs)
+        array_env = make_env(array_backend=True, **kwargs)
+        object_obs = object_env.reset(seed=seed)[0]
+        array_obs = array_env.reset(seed=seed)[0]
+        np.testing.assert_array_equal(object_obs['observation'], array_obs['observation'])
+        expected = play(object_env, np.random.default_rng(seed), 400)
+        assert len(expected) > 100
+        assert play(array_env, np.random.default_rng(seed), 400) == expected
+
+@pytest.mark.parametrize('source_kwargs, target_kwargs', [
+    ({}, {}),
+    ({}, {'array_backend': True}),
+    ({'array_backend': True}, {}),
+    ({'array_backend': True}, {'zero_copy_obs': True}),
+])
+def test_set_state_continues_game(source_kwargs, target_kwargs):
+    for seed in range(3):
+        source = make_env(random_num_steps=True, **source_kwargs)
+        source.reset(seed=seed)
+        play(source, np.random.default_rng(seed), 30 + 20*seed)
+        state = pickle.loads(pickle.dumps(source.get_state()))
+        expected = play(source, np.random.default_rng(100), 400)
+        assert expected
+
+        target = make_env(random_num_steps=True, **target_kwargs)
+        target.reset(seed=1000)
+        play(target, np.random.default_rng(7), 13)
+        target.set_state(state)
+        assert play(target, np.random.default_rng(100), 400) == expected
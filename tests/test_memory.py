@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from tianshou.data import Batch
+
+from rbgame.agent.memory import CompactVectorReplayBuffer, ObservationCodec
+from rbgame.game.consts import MAXIMUM_ROBOT_BATTERY
+
+def robot_observations(rng: np.random.Generator, num_obs: int, num_robots: int, with_battery: bool) -> np.ndarray:
+    highs = [9, 9, 10, MAXIMUM_ROBOT_BATTERY + 1] if with_battery else [9, 9, 10]
+    scales = np.array([8, 8, 9, MAXIMUM_ROBOT_BATTERY] if with_battery else [8, 8, 9], dtype=np.float32)
+    codes = rng.integers(0, highs, size=(num_obs, num_robots, len(highs)))
+    return (codes/scales).astype(np.float32).reshape(num_obs, -1)
+
+@pytest.mark.parametrize('with_battery', [True, False])
+@pytest.mark.parametrize('packed', [True, False])
+@pytest.mark.parametrize('num_robots', [2, 3, 4])
+def test_codec_round_trip_with_seat(with_battery, packed, num_robots):
+    rng = np.random.default_rng(num_robots)
+    obs = robot_observations(rng, 16, num_robots, with_battery)
+    seat = np.eye(num_robots, dtype=np.float32)[rng.integers(0, num_robots, 16)]
+    obs_with_seat = np.concatenate((obs, seat), axis=1)
+    codec = ObservationCodec(with_battery=with_battery, packed=packed, num_robots=num_robots)
+    np.testing.assert_array_equal(codec.decode(codec.encode(obs_with_seat)), obs_with_seat)
+    np.testing.assert_array_equal(codec.decode(codec.encode(obs)), obs)
+
+def test_codec_without_num_robots_rejects_seat():
+    obs = robot_observations(np.random.default_rng(0), 4, 2, False)
+    obs_with_seat = np.concatenate((obs, np.eye(2, dtype=np.float32)[[0, 1, 0, 1]]), axis=1)
+    with pytest.raises(ValueError, match='num_robots'):
+        ObservationCodec(with_battery=False).encode(obs_with_seat)
+
+def test_compact_buffer_stores_seat():
+    num_robots = 2
+    rng = np.random.default_rng(0)
+    obs = np.concatenate((robot_observations(rng, 4, num_robots, True), np.eye(num_robots, dtype=np.float32)[[0, 1, 0, 1]]), axis=1)
+    buffer = CompactVectorReplayBuffer(16, 1, codec=ObservationCodec(with_battery=True, num_robots=num_robots))
+    for i in range(3):
+        buffer.add(Batch(
+            obs=obs[i:i+1], act=np.array([0]), rew=np.array([0.0]), terminated=np.array([False]),
+            truncated=np.array([False]), obs_next=obs[i+1:i+2], info=Batch(),
+        ), buffer_ids=[0])
+    batch = buffer[np.arange(3)]
+    np.testing.assert_array_equal(batch.obs, obs[:3])
+    np.testing.assert_array_equal(batch.obs_next, obs[1:4])
@@ -0,0 +1,37 @@
+import os
+
+import gymnasium
+import numpy as np
+import torch
+from tianshou.policy import DQNPolicy
+from tianshou.utils.net.common import Net
+
+from rbgame.agent.quantization import action_disagreement, quantize_agent, sample_states
+from rbgame.agent.rl_agent import OffPolicyAgent
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+ENV_ARGS = dict(
+    colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+    targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+    required_mail=2,
+    robot_colors=['r', 'b'],
+    num_robots_per_player=2,
+    with_battery=True,
+    max_step=200,
+)
+
+def test_quantized_agent_agrees_with_original():
+    torch.manual_seed(0)
+    net = Net(state_shape=16, action_shape=5, hidden_sizes=[64, 64])
+    policy = DQNPolicy(model=net, optim=torch.optim.Adam(net.parameters(), 1e-3), action_space=gymnasium.spaces.Discrete(5))
+    agent = OffPolicyAgent(policy)
+    quantized = quantize_agent(agent, ENV_ARGS, num_check_states=500, seed=0)
+
+    assert quantized.memory is None
+    assert quantized.disagreement is not None and quantized.disagreement <= 0.05
+    obs_b_o, mask_b = sample_states(ENV_ARGS, 500, seed=1)
+    assert obs_b_o.shape == (500, 16) and mask_b.shape == (500, 5)
+    assert action_disagreement(quantized, agent, obs_b_o, mask_b) <= 0.05
+    # quantized agent still respects action masks
+    act = np.asarray(quantized.infer_act(obs_b_o, mask_b, exploration_noise=False))
+    assert mask_b[np.arange(act.size), act].all()
@@ -0,0 +1,54 @@
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from rbgame.running_stats import RunningStats
+from rbgame.trainer import DecentralizedTrainer
+from rbgame.utils import astar_constructor
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+ENV_ARGS = dict(
+    colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+    targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+    required_mail=1,
+    robot_colors=['r', 'b'],
+    num_robots_per_player=1,
+    with_battery=False,
+    max_step=100,
+)
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(3.0, 2.0, 1000)
+    stats = RunningStats()
+    assert stats.count == 0 and math.isnan(stats.mean) and stats.half_width() == math.inf
+    for batch in np.array_split(values, [1, 2, 10, 300, 301, 700]):
+        stats.update(batch)
+    assert stats.count == values.size
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.var == pytest.approx(values.var(ddof=1))
+    half_width = NormalDist().inv_cdf(0.975)*values.std(ddof=1)/math.sqrt(values.size)
+    assert stats.half_width(0.95) == pytest.approx(half_width)
+    assert stats.interval(0.95) == pytest.approx((values.mean() - half_width, values.mean() + half_width))
+
+def make_trainer(**kwargs) -> DecentralizedTrainer:
+    return DecentralizedTrainer(
+        ENV_ARGS, num_train_envs=1, num_test_envs=4, episodes_per_test=40, env_backend='batched', **kwargs,
+    )
+
+def test_test_stops_early():
+    agents = [astar_constructor(2, False) for _ in range(2)]
+    trainer = make_trainer()
+    assert trainer.test(agents)['num_collected_episodes'] == 40
+    # any interval is precise enough, test stops as soon as it may
+    trainer = make_trainer(test_precision=1e9, min_episodes_per_test=10)
+    stats = trainer.test(agents)
+    # episodes finishing in the same step are counted together
+    assert 10 <= stats['num_collected_episodes'] < 10 + 4
+    assert stats['reward_interval'][0] <= stats['reward'] <= stats['reward_interval'][1]
+    # agents can't reach the baseline
+    trainer = make_trainer(min_episodes_per_test=10)
+    assert 10 <= trainer.test(agents, baseline=1e9)['num_collected_episodes'] < 10 + 4
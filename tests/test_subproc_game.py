@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+
+from rbgame.game.game import RoboticBoardGame
+from rbgame.game.subproc_game import SubprocRoboticBoardGame
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+ENV_ARGS = dict(
+    colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+    targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+    required_mail=2,
+    robot_colors=['r', 'b'],
+    num_robots_per_player=2,
+    with_battery=True,
+    random_num_steps=True,
+    max_step=150,
+)
+
+@pytest.mark.parametrize('context', ['fork', 'spawn'])
+def test_subproc_game_matches_local_games(context):
+    num_envs = 4
+    env = SubprocRoboticBoardGame(num_envs, num_workers=2, auto_reset=False, context=context, **ENV_ARGS)
+    try:
+        games = [RoboticBoardGame(**ENV_ARGS) for _ in range(num_envs)]
+        env.reset(seed=10)
+        for i, game in enumerate(games):
+            game.reset(seed=10 + i)
+        rng = np.random.default_rng(0)
+        for tick in range(200):
+            ids = np.sort(rng.choice(num_envs, size=rng.integers(1, num_envs + 1), replace=False))
+            obs = env.last(ids)[0]
+            act = []
+            for k, i in enumerate(ids):
+                game_obs = games[i].observe(games[i].agent_selection)
+                np.testing.assert_array_equal(game_obs['observation'], obs.observation[k])
+                np.testing.assert_array_equal(game_obs['action_mask'], obs.action_mask[k])
+                legal = np.flatnonzero(game_obs['action_mask'])
+                act.append(int(rng.choice(legal)) if legal.size else 0)
+            next_obs, rew, terminated, truncated, info = env.step(np.array(act), ids)
+            for k, i in enumerate(ids):
+                game_next_obs, reward, game_terminated, game_truncated, game_info = games[i].step(act[k])
+                np.testing.assert_array_equal(game_next_obs['observation'], next_obs.observation[k])
+                assert rew[k] == reward
+                assert terminated[k] == game_terminated and truncated[k] == game_truncated
+                assert info.transition_belongs_agent[k] == game_info['transition_belongs_agent']
+                assert info.next_agent[k] == game_info['next_agent']
+            finished = ids[terminated | truncated]
+            if finished.size:
+                env.reset(finished, seed=1000 + tick)
+                for i in finished:
+                    games[i].reset(seed=1000 + tick + int(i))
+        assert env.get_env_attr('agent_selection') == [game.agent_selection for game in games]
+    finally:
+        env.close()
@@ -0,0 +1,70 @@
+import os
+
+import gymnasium
+import torch
+from tianshou.data import VectorReplayBuffer
+from tianshou.policy import PPOPolicy
+from tianshou.utils.net.common import ActorCritic, Net
+from tianshou.utils.net.discrete import Actor, Critic
+
+from rbgame.agent.memory import make_memory_views
+from rbgame.agent.rl_agent import OnPolicyAgent
+from rbgame.trainer import DecentralizedTrainer
+
+CSV_FILES = os.path.join(os.path.dirname(__file__), os.pardir, 'rbgame', 'assets', 'csv_files')
+ENV_ARGS = dict(
+    colors_map=os.path.join(CSV_FILES, 'colors_map.csv'),
+    targets_map=os.path.join(CSV_FILES, 'targets_map.csv'),
+    required_mail=1,
+    robot_colors=['r', 'b'],
+    num_robots_per_player=1,
+    with_battery=False,
+    max_step=20,
+)
+
+def make_ppo_policy(observation_size: int) -> PPOPolicy:
+    actor = Actor(Net(state_shape=observation_size, hidden_sizes=[16]), 5)
+    critic = Critic(Net(state_shape=observation_size, hidden_sizes=[16]))
+    optim = torch.optim.Adam(ActorCritic(actor, critic).parameters(), lr=1e-3)
+    return PPOPolicy(
+        actor=actor,
+        critic=critic,
+        optim=optim,
+        dist_fn=torch.distributions.Categorical,
+        action_space=gymnasium.spaces.Discrete(5),
+        action_scaling=False,
+    )
+
+def test_on_policy_agents_share_storage(monkeypatch):
+    torch.manual_seed(0)
+    trainer = DecentralizedTrainer(
+        ENV_ARGS,
+        num_train_envs=2,
+        num_test_envs=1,
+        episodes_per_train=2,
+        episodes_per_test=1,
+        test_freq=100,
+        update_freq=10,
+        batch_size=8,
+    )
+    storage = VectorReplayBuffer(1000, 2*2)
+    memories = make_memory_views(storage, 2, own_transitions=False)
+    agents = [OnPolicyAgent(make_ppo_policy(6), memory=memory, repeat_per_collect=1) for memory in memories]
+    lengths = []
+    update_fn = OnPolicyAgent.policy_update_fn
+
+    def recording_update_fn(self, batch_size, num_collected_steps):
+        lengths.append(len(self.memory))
+        return update_fn(self, batch_size, num_collected_steps)
+
+    monkeypatch.setattr(OnPolicyAgent, 'policy_update_fn', recording_update_fn)
+    try:
+        stats = trainer.train(agents, [1, 1], plot=False)
+    finally:
+        trainer.train_env.close()
+        trainer.test_env.close()
+
+    # both agents of each update see the same transitions, which are cleared only after both have updated
+    assert len(lengths) >= 2 and len(lengths) % 2 == 0
+    assert all(first == second > 0 for first, second in zip(lengths[0::2], lengths[1::2]))
+    assert len(storage) < stats['num_collected_steps']